@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 
-from .models import UserProfile, JobSeekerProfile, RecruiterProfile
+from .models import UserProfile, JobSeekerProfile, RecruiterProfile, NotificationCounter
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -22,3 +22,4 @@ admin.site.register(User, CustomUserAdmin)
 
 admin.site.register(JobSeekerProfile)
 admin.site.register(RecruiterProfile)
+admin.site.register(NotificationCounter)
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import get_request_notification_counts
+
+
+def notification_counts(request):
+    """Expose the user's notification counters to templates, read only if a template uses them."""
+    if not request.user.is_authenticated:
+        return {}
+    return {'notification_counts': SimpleLazyObject(lambda: get_request_notification_counts(request))}
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from accounts.notifications import recount_notifications
+from candidates.models import SavedCandidateSearch
+from candidates.utils import get_new_matches
+
+
+class Command(BaseCommand):
+    help = "Recompute the notification counters from messages, applications and saved searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh-matches",
+            action="store_true",
+            help="Re-run every saved candidate search first, to pick up profiles changed without signals",
+        )
+
+    def handle(self, *args, **options):
+        if options["refresh_matches"]:
+            searches = SavedCandidateSearch.objects.select_related("recruiter")
+            for search in searches:
+                get_new_matches(search)
+            self.stdout.write(f"Re-ran {len(searches)} saved search(es).")
+
+        total = recount_notifications()
+        self.stdout.write(self.style.SUCCESS(f"Recounted notifications for {total} user(s)."))
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:44
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copy of jobs.utils.get_spatial_cell as of this migration
+SPATIAL_CELL_DEGREES = 0.5
+_CELL_COLUMNS = int(360 / SPATIAL_CELL_DEGREES)
+_CELL_ROWS = int(180 / SPATIAL_CELL_DEGREES)
+
+
+def get_spatial_cell(lat, lon):
+    if lat is None or lon is None:
+        return None
+    row = min(max(int(math.floor((float(lat) + 90) / SPATIAL_CELL_DEGREES)), 0), _CELL_ROWS - 1)
+    column = int(math.floor((float(lon) + 180) / SPATIAL_CELL_DEGREES)) % _CELL_COLUMNS
+    return row * _CELL_COLUMNS + column
+
+
+def populate_profile_coordinates(apps, schema_editor):
+    """Fill location keys and coordinates from the existing coordinate cache"""
+    LocationCoordinate = apps.get_model('candidates', 'LocationCoordinate')
+    coordinates = {
+        coordinate.normalized_name: coordinate
+        for coordinate in LocationCoordinate.objects.all()
+    }
+
+    for model_name in ('JobSeekerProfile', 'RecruiterProfile'):
+        Profile = apps.get_model('accounts', model_name)
+        for profile in Profile.objects.exclude(location=''):
+            profile.location_key = " ".join(profile.location.strip().lower().split())
+            coordinate = coordinates.get(profile.location_key)
+            if coordinate:
+                profile.latitude = coordinate.latitude
+                profile.longitude = coordinate.longitude
+                profile.geo_cell = get_spatial_cell(coordinate.latitude, coordinate.longitude)
+            profile.save(update_fields=['location_key', 'latitude', 'longitude', 'geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_jobseekerprofile_commute_radius'),
+        ('candidates', '0006_locationcoordinate_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, help_text='Spatial grid cell of the coordinates', null=True),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='location_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized location used for coordinate lookups', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, help_text='Spatial grid cell of the coordinates', null=True),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='location_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized location used for coordinate lookups', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=11, null=True),
+        ),
+        migrations.RunPython(populate_profile_coordinates, migrations.RunPython.noop),
+    ]
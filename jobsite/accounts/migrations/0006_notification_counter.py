@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_notifications(apps, schema_editor):
+    """Start the counters from the current unread threads, new applications and saved search matches"""
+    NotificationCounter = apps.get_model('accounts', 'NotificationCounter')
+    ThreadParticipant = apps.get_model('messaging', 'ThreadParticipant')
+    Application = apps.get_model('jobs', 'Application')
+    SavedCandidateSearch = apps.get_model('candidates', 'SavedCandidateSearch')
+
+    def grouped(queryset, user_field, total):
+        return queryset.values(user_field).annotate(total=total).order_by().values_list(user_field, 'total')
+
+    counts = {}
+    sources = [
+        ('unread_messages', grouped(
+            ThreadParticipant.objects.filter(
+                has_received=True, thread__last_message_id__gt=Coalesce(F('last_read_message_id'), 0)
+            ), 'user_id', Count('id'),
+        )),
+        ('new_applications', grouped(Application.objects.filter(status='applied'), 'job__posted_by_id', Count('id'))),
+        ('new_candidate_matches', grouped(
+            SavedCandidateSearch.objects.all(), 'recruiter__user_id', Sum('new_matches_count')
+        )),
+    ]
+    for field, rows in sources:
+        for user_id, total in rows:
+            if total:
+                counts.setdefault(user_id, {})[field] = total
+
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, **fields) for user_id, fields in counts.items()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_coordinates'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('candidates', '0007_geocodercircuit'),
+        ('jobs', '0008_job_geo_cell'),
+        ('messaging', '0007_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_messages', models.PositiveIntegerField(default=0, help_text='Received message threads with unread messages')),
+                ('new_applications', models.PositiveIntegerField(default=0, help_text="Applications to the user's jobs not reviewed yet")),
+                ('new_candidate_matches', models.PositiveIntegerField(default=0, help_text="New candidates matching the user's saved searches")),
+                ('application_updates', models.PositiveIntegerField(default=0, help_text="Status changes to the user's applications since they last looked")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(count_notifications, migrations.RunPython.noop),
+    ]
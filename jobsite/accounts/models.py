@@ -30,6 +30,13 @@ class JobSeekerProfile(models.Model):
     summary = models.TextField(blank=True, help_text="Professional summary about yourself")
     skills = models.TextField(blank=True, help_text="List your skills (comma-separated)")
     location = models.CharField(max_length=200, blank=True)
+    # Geocoded from location when the profile is saved
+    location_key = models.CharField(max_length=200, blank=True, db_index=True, editable=False,
+                                    help_text="Normalized location used for coordinate lookups")
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True, editable=False)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False,
+                                   help_text="Spatial grid cell of the coordinates")
     phone = models.CharField(max_length=20, blank=True)
     linkedin_url = models.URLField(blank=True)
     github_url = models.URLField(blank=True)
@@ -75,6 +82,10 @@ class JobSeekerProfile(models.Model):
         if self.skills:
             return [skill.strip() for skill in self.skills.split(',') if skill.strip()]
         return []
+    
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
 
 class Education(models.Model):
     job_seeker = models.ForeignKey(JobSeekerProfile, on_delete=models.CASCADE, related_name='education')
@@ -110,8 +121,37 @@ class RecruiterProfile(models.Model):
     company_size = models.CharField(max_length=50, blank=True, help_text="e.g., '10-50 employees'")
     industry = models.CharField(max_length=100, blank=True)
     location = models.CharField(max_length=200, blank=True)
+    # Geocoded from location when the profile is saved
+    location_key = models.CharField(max_length=200, blank=True, db_index=True, editable=False,
+                                    help_text="Normalized location used for coordinate lookups")
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True, editable=False)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False,
+                                   help_text="Spatial grid cell of the coordinates")
     phone = models.CharField(max_length=20, blank=True)
     linkedin_url = models.URLField(blank=True)
     
     def __str__(self):
         return f"{self.user_profile.user.username} - {self.company_name}"
+    
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user notification counts, kept current when the underlying data is written.
+
+    Pages read one row instead of recounting messages, applications and
+    saved search matches. Use ``accounts.notifications`` to change them.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_messages = models.PositiveIntegerField(default=0, help_text="Received message threads with unread messages")
+    new_applications = models.PositiveIntegerField(default=0, help_text="Applications to the user's jobs not reviewed yet")
+    new_candidate_matches = models.PositiveIntegerField(default=0, help_text="New candidates matching the user's saved searches")
+    application_updates = models.PositiveIntegerField(default=0, help_text="Status changes to the user's applications since they last looked")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Notifications for {self.user.username}"
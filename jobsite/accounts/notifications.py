@@ -0,0 +1,130 @@
+"""
+Per-user notification counters.
+
+Writers bump the counters in `NotificationCounter` with single atomic
+UPDATEs as messages, applications and candidate profiles change, so the
+navbar and dashboards read one row per request instead of recounting.
+`recount_notifications` recomputes the derived counters from the source
+tables, for repairs after bulk imports or other writes that skip the hooks.
+"""
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import NotificationCounter
+
+COUNTER_FIELDS = ('unread_messages', 'new_applications', 'new_candidate_matches', 'application_updates')
+RECOUNT_BATCH_SIZE = 500
+
+
+def _user_ids(users):
+    if users is None:
+        return []
+    if isinstance(users, int):
+        return [users]
+    if hasattr(users, 'pk'):
+        return [users.pk]
+    return list({getattr(user, 'pk', user) for user in users})
+
+
+def increment(users, field, amount=1):
+    """
+    Add ``amount`` (which may be negative) to a counter of one or more users.
+
+    ``users`` is a user, a user id or an iterable of either. Counters never
+    drop below zero, and rows are created the first time a user is counted.
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown notification counter: {field}")
+    user_ids = _user_ids(users)
+    if not user_ids or not amount:
+        return
+
+    counters = NotificationCounter.objects.filter(user_id__in=user_ids)
+    changes = {field: Greatest(F(field) + amount, 0), 'updated_at': timezone.now()}
+    if counters.update(**changes) < len(user_ids):
+        existing = set(counters.values_list('user_id', flat=True))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in missing], ignore_conflicts=True
+        )
+        NotificationCounter.objects.filter(user_id__in=missing).update(**changes)
+
+
+def decrement(users, field, amount=1):
+    increment(users, field, -amount)
+
+
+def reset(user, field):
+    """Clear one of a user's counters, e.g. once they have seen what it counts."""
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown notification counter: {field}")
+    NotificationCounter.objects.filter(user_id=getattr(user, 'pk', user)).exclude(**{field: 0}).update(
+        **{field: 0, 'updated_at': timezone.now()}
+    )
+
+
+def get_notification_counts(user):
+    """Return a dict of the user's counters, plus their ``total``, in one query."""
+    counts = (
+        NotificationCounter.objects.filter(user_id=user.pk).values(*COUNTER_FIELDS).first()
+        or dict.fromkeys(COUNTER_FIELDS, 0)
+    )
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def get_request_notification_counts(request):
+    """``get_notification_counts`` for the request's user, read at most once per request."""
+    if not hasattr(request, '_notification_counts'):
+        request._notification_counts = get_notification_counts(request.user)
+    return request._notification_counts
+
+
+def recount_notifications(users=None):
+    """
+    Recompute the counters that can be derived from the data, for all users or just ``users``.
+
+    ``application_updates`` counts changes since the user last looked, which
+    isn't recorded anywhere else, so it is left as is.
+    """
+    from candidates.models import SavedCandidateSearch
+    from django.contrib.auth.models import User
+    from jobs.models import Application
+    from messaging.models import ThreadParticipant
+    from messaging.services import unread_condition
+
+    user_ids = _user_ids(users) if users is not None else None
+
+    def grouped(queryset, user_field, total):
+        if user_ids is not None:
+            queryset = queryset.filter(**{f'{user_field}__in': user_ids})
+        return dict(
+            queryset.values(user_field).annotate(total=total).order_by().values_list(user_field, 'total')
+        )
+
+    derived = {
+        'unread_messages': grouped(
+            ThreadParticipant.objects.filter(unread_condition(), has_received=True), 'user_id', Count('id')
+        ),
+        'new_applications': grouped(Application.objects.filter(status='applied'), 'job__posted_by_id', Count('id')),
+        'new_candidate_matches': grouped(
+            SavedCandidateSearch.objects.all(), 'recruiter__user_id', Sum('new_matches_count')
+        ),
+    }
+
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    user_ids = list(users.values_list('pk', flat=True))
+    now = timezone.now()
+    for start in range(0, len(user_ids), RECOUNT_BATCH_SIZE):
+        batch = user_ids[start:start + RECOUNT_BATCH_SIZE]
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in batch], ignore_conflicts=True
+        )
+        counters = list(NotificationCounter.objects.filter(user_id__in=batch))
+        for counter in counters:
+            for field, totals in derived.items():
+                setattr(counter, field, totals.get(counter.user_id) or 0)
+            counter.updated_at = now
+        NotificationCounter.objects.bulk_update(counters, [*derived, 'updated_at'])
+    return len(user_ids)
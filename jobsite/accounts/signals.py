@@ -0,0 +1,14 @@
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from candidates.location_utils import set_profile_coordinates
+from .models import JobSeekerProfile, RecruiterProfile
+
+
+@receiver(pre_save, sender=JobSeekerProfile)
+@receiver(pre_save, sender=RecruiterProfile)
+def geocode_profile_location(sender, instance, raw=False, **kwargs):
+    """Store coordinates and a spatial cell for the profile's location"""
+    if raw:
+        return
+    set_profile_coordinates(instance)
@@ -1,3 +1,159 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Education, JobSeekerProfile, NotificationCounter, UserProfile
+from accounts.notifications import get_notification_counts, recount_notifications
+from candidates.models import SavedCandidateSearch
+from candidates.utils import mark_saved_search_seen
+from jobs.models import Application, Job
+from messaging.models import Thread
+from messaging.services import send_message
+
+
+def create_user(username, user_type):
+    user = User.objects.create_user(username=username, password="pass1234")
+    UserProfile.objects.create(user=user, user_type=user_type)
+    return user
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.recruiter = create_user("recruiter", "recruiter")
+        self.seeker = create_user("seeker", "job_seeker")
+        with self.captureOnCommitCallbacks(execute=True):
+            JobSeekerProfile.objects.create(user_profile=self.seeker.profile, location="Boston, MA")
+        self.job = Job.objects.create(
+            title="Backend Engineer",
+            company="Acme",
+            location="Atlanta, GA",
+            description="Work on APIs",
+            requirements="3+ years Python",
+            posted_by=self.recruiter,
+        )
+
+    def counts(self, user):
+        return get_notification_counts(user)
+
+    def test_unread_messages_count_threads_not_messages(self):
+        first = send_message(self.recruiter, self.seeker, "Interview", "Are you free Monday?")
+        send_message(self.recruiter, self.seeker, "", "Or Tuesday?", parent_message=first)
+        send_message(self.recruiter, self.seeker, "Offer", "Details attached")
+        self.assertEqual(self.counts(self.seeker)["unread_messages"], 2)
+
+        self.client.login(username="seeker", password="pass1234")
+        self.client.get(reverse('messaging:view_message', args=[first.id]))
+        self.assertEqual(self.counts(self.seeker)["unread_messages"], 1)
+
+        # Replying reads the thread, and makes it unread for the other side
+        send_message(self.seeker, self.recruiter, "", "Tuesday works", parent_message=first)
+        send_message(self.seeker, self.recruiter, "", "See you then", parent_message=first)
+        offer = Thread.objects.get(subject="Offer").last_message
+        send_message(self.seeker, self.recruiter, "", "Thanks!", parent_message=offer)
+        self.assertEqual(self.counts(self.seeker)["unread_messages"], 0)
+        self.assertEqual(self.counts(self.recruiter)["unread_messages"], 2)
+
+        response = self.client.get(reverse('messaging:inbox'))
+        self.assertEqual(response.context['notification_counts']['unread_messages'], 0)
+
+    def test_applications_count_for_poster_and_applicant(self):
+        application = Application.objects.create(job=self.job, applicant=self.seeker, cover_note="Hi")
+        self.assertEqual(self.counts(self.recruiter)["new_applications"], 1)
+
+        self.client.login(username="recruiter", password="pass1234")
+        self.client.post(
+            reverse('jobs.update_application_status', args=[application.id]), {'status': 'review'}
+        )
+        self.assertEqual(self.counts(self.recruiter)["new_applications"], 0)
+        self.assertEqual(self.counts(self.seeker)["application_updates"], 1)
+
+        response = self.client.get(reverse('home.dashboard'))
+        self.assertEqual(response.context['template_data']['new_applications_count'], 0)
+
+        self.client.login(username="seeker", password="pass1234")
+        self.client.get(reverse('jobs.my_applications'))
+        self.assertEqual(self.counts(self.seeker)["application_updates"], 0)
+
+    def test_profile_changes_count_as_saved_search_matches(self):
+        search = SavedCandidateSearch.objects.create(
+            recruiter=self.recruiter.profile, search_input="", location="Atlanta", last_match_results=[]
+        )
+        newcomer = create_user("newcomer", "job_seeker")
+        profile = self.seeker.profile.job_seeker_profile
+        with self.captureOnCommitCallbacks(execute=True):
+            JobSeekerProfile.objects.create(user_profile=newcomer.profile, location="Atlanta, GA")
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.location = "Atlanta, GA"
+            profile.save()
+        # Saving a profile that already counted doesn't count it again
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        search.refresh_from_db()
+        self.assertEqual(search.new_matches_count, 2)
+        self.assertEqual(self.counts(self.recruiter)["new_candidate_matches"], 2)
+
+        self.client.login(username="recruiter", password="pass1234")
+        self.client.get(reverse('candidates.candidate_search'), {'search_input': '', 'location': 'Atlanta'})
+        search.refresh_from_db()
+        self.assertEqual(search.new_matches_count, 0)
+        self.assertEqual(self.counts(self.recruiter)["new_candidate_matches"], 0)
+
+    def test_profile_match_checks_run_once_per_transaction_in_batches(self):
+        searches = [
+            SavedCandidateSearch.objects.create(
+                recruiter=self.recruiter.profile, search_input=search_input, location=location, last_match_results=[]
+            )
+            for search_input, location in [("", "Boston"), ("", "Boston"), ("", "Chicago")]
+            + [(f"Town {number}", "") for number in range(60)]
+        ]
+        profile = self.seeker.profile.job_seeker_profile
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                profile.save()
+                for degree in ["BS", "MS", "PhD"]:
+                    Education.objects.create(
+                        job_seeker=profile, institution="MIT", degree=degree, start_date=date(2015, 9, 1)
+                    )
+        self.assertEqual(len(callbacks), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+        # Chicago is ruled out by location, leaving 61 distinct criteria checked 50 to a query
+        self.assertEqual(sum('EXISTS' in query['sql'] for query in queries.captured_queries), 2)
+        matched = SavedCandidateSearch.objects.filter(new_matches_count=1)
+        self.assertEqual(set(matched.values_list('pk', flat=True)), {searches[0].pk, searches[1].pk})
+        self.assertEqual(matched.first().last_match_results, [profile.pk])
+        self.assertEqual(self.counts(self.recruiter)["new_candidate_matches"], 2)
+
+    def test_seen_search_takes_back_its_current_count(self):
+        search = SavedCandidateSearch.objects.create(
+            recruiter=self.recruiter.profile, search_input="", location="Atlanta", last_match_results=[]
+        )
+        stale = SavedCandidateSearch.objects.get(pk=search.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = self.seeker.profile.job_seeker_profile
+            profile.location = "Atlanta, GA"
+            profile.save()
+        self.assertEqual(self.counts(self.recruiter)["new_candidate_matches"], 1)
+
+        mark_saved_search_seen(stale)
+
+        search.refresh_from_db()
+        self.assertEqual(search.new_matches_count, 0)
+        self.assertEqual(self.counts(self.recruiter)["new_candidate_matches"], 0)
+
+    def test_recount_repairs_drift(self):
+        Application.objects.create(job=self.job, applicant=self.seeker, cover_note="Hi")
+        send_message(self.recruiter, self.seeker, "Interview", "Are you free Monday?")
+        NotificationCounter.objects.update(unread_messages=7, new_applications=0)
+
+        recount_notifications()
 
-# Create your tests here.
+        self.assertEqual(self.counts(self.seeker)["unread_messages"], 1)
+        self.assertEqual(self.counts(self.recruiter)["new_applications"], 1)
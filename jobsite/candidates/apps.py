@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CandidatesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'candidates'
+
+    def ready(self):
+        from candidates import signals  # noqa: F401
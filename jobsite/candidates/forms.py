@@ -1,6 +1,16 @@
 from django import forms
+from jobs.models import Job
+from .location_utils import normalize_location, resolve_coordinates
 
 class CandidateSearchForm(forms.Form):
+    RADIUS_CHOICES = [
+        ('', 'Any distance'),
+        ('10', 'Within 10 miles'),
+        ('25', 'Within 25 miles'),
+        ('50', 'Within 50 miles'),
+        ('100', 'Within 100 miles'),
+    ]
+
     search_input = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Senior Python Developer'}),
@@ -18,7 +28,49 @@ class CandidateSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Agile methodologies, MERN stack'})
     )
+    radius = forms.ChoiceField(
+        required=False,
+        choices=RADIUS_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    near_job = forms.ModelChoiceField(
+        required=False,
+        queryset=Job.objects.none(),
+        empty_label='Location above',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def __init__(self, *args, recruiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the recruiter's own jobs with map coordinates can be a search center
+        if recruiter is not None:
+            self.fields['near_job'].queryset = Job.objects.filter(
+                posted_by=recruiter, latitude__isnull=False, longitude__isnull=False
+            ).order_by('-created_at')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        radius = cleaned_data.get('radius')
+        near_job = cleaned_data.get('near_job')
+        location = cleaned_data.get('location')
+        cleaned_data['center'] = None
+
+        if not radius:
+            return cleaned_data
+
+        if near_job:
+            cleaned_data['center'] = (near_job.latitude, near_job.longitude)
+        elif location:
+            coordinates = resolve_coordinates([location]).get(normalize_location(location))
+            if not coordinates:
+                raise forms.ValidationError(
+                    "We couldn't place that location on the map yet. Try a nearby city or search near one of your jobs."
+                )
+            cleaned_data['center'] = (coordinates['latitude'], coordinates['longitude'])
+        else:
+            raise forms.ValidationError('Enter a location or choose one of your jobs to search by distance.')
+        return cleaned_data
 
     def cleaned_skills_list(self):
         raw = self.cleaned_data.get('skills') or ''
-        return [s.strip() for s in raw.split(',') if s.strip()]
\ No newline at end of file
+        return [s.strip() for s in raw.split(',') if s.strip()]
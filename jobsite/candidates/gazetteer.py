@@ -0,0 +1,218 @@
+"""
+Offline gazetteer for resolving common city strings without a network call.
+
+`build_gazetteer_index` turns a CSV of places into a binary index sorted by
+normalized name, and `lookup` binary-searches a memory-mapped copy of it. The
+index layout is::
+
+    header   magic (4 bytes) + record count (uint32)
+    offsets  one uint32 per record, pointing at the record in the data section
+    records  key length (uint16), key, latitude (float64), longitude (float64),
+             display name length (uint16), display name
+
+All integers and floats are little-endian and keys are UTF-8 encoded
+normalized names, sorted bytewise.
+"""
+import csv
+import logging
+import mmap
+import os
+import struct
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+# Module import, as location_utils imports this module while it loads
+from . import location_utils
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GAZ1"
+HEADER = struct.Struct("<4sI")
+OFFSET = struct.Struct("<I")
+LENGTH = struct.Struct("<H")
+COORDINATES = struct.Struct("<dd")
+
+BUNDLED_GAZETTEER_CSV = os.path.join(os.path.dirname(__file__), "data", "us_cities.csv")
+
+
+def get_gazetteer_path() -> str:
+    return str(getattr(settings, "GAZETTEER_PATH", os.path.join(os.path.dirname(__file__), "data", "gazetteer.idx")))
+
+
+def read_gazetteer_csv(path: str) -> Iterable[Tuple[str, float, float, Iterable[str]]]:
+    """Yield (name, latitude, longitude, aliases) rows from a gazetteer CSV.
+
+    The file needs ``name``, ``latitude`` and ``longitude`` columns and may
+    have an ``aliases`` column of ``|``-separated alternative names.
+    """
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        for row in csv.DictReader(csv_file):
+            name = (row.get("name") or "").strip()
+            if not name:
+                continue
+            try:
+                latitude = float(row["latitude"])
+                longitude = float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Skipping gazetteer row with invalid coordinates: %s", name)
+                continue
+            aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+            yield name, latitude, longitude, aliases
+
+
+def build_gazetteer_index(rows: Iterable[Tuple[str, float, float, Iterable[str]]], output_path: str) -> int:
+    """Write a sorted gazetteer index and return the number of keys in it.
+
+    When two places share a name or alias the earlier row wins, so sources
+    should list the more prominent place first.
+    """
+    entries: Dict[bytes, Tuple[float, float, bytes]] = {}
+    for name, latitude, longitude, aliases in rows:
+        display_name = name.encode("utf-8")[:0xFFFF]
+        for key in [name, *aliases]:
+            encoded_key = location_utils.normalize_location(key).encode("utf-8")
+            if encoded_key and len(encoded_key) <= 0xFFFF and encoded_key not in entries:
+                entries[encoded_key] = (latitude, longitude, display_name)
+
+    records = []
+    offset = 0
+    offsets = []
+    for key in sorted(entries):
+        latitude, longitude, display_name = entries[key]
+        record = b"".join([
+            LENGTH.pack(len(key)), key,
+            COORDINATES.pack(latitude, longitude),
+            LENGTH.pack(len(display_name)), display_name,
+        ])
+        offsets.append(offset)
+        records.append(record)
+        offset += len(record)
+
+    data_start = HEADER.size + OFFSET.size * len(offsets)
+    temp_path = f"{output_path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(temp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(MAGIC, len(offsets)))
+        for record_offset in offsets:
+            index_file.write(OFFSET.pack(data_start + record_offset))
+        for record in records:
+            index_file.write(record)
+    # Swap the file in atomically so running processes never map a partial index
+    os.replace(temp_path, output_path)
+    return len(offsets)
+
+
+class GazetteerIndex:
+    """Read-only view of a memory-mapped gazetteer index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as index_file:
+            self.version = _file_version(os.fstat(index_file.fileno()))
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a gazetteer index")
+
+    def _key_at(self, index: int) -> Tuple[bytes, int]:
+        (record_offset,) = OFFSET.unpack_from(self._map, HEADER.size + OFFSET.size * index)
+        (key_length,) = LENGTH.unpack_from(self._map, record_offset)
+        key_start = record_offset + LENGTH.size
+        return self._map[key_start:key_start + key_length], key_start + key_length
+
+    def get(self, normalized_name: str) -> Optional[Dict[str, object]]:
+        key = normalized_name.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, value_offset = self._key_at(middle)
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                latitude, longitude = COORDINATES.unpack_from(self._map, value_offset)
+                name_offset = value_offset + COORDINATES.size
+                (name_length,) = LENGTH.unpack_from(self._map, name_offset)
+                name_start = name_offset + LENGTH.size
+                return {
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "display_name": self._map[name_start:name_start + name_length].decode("utf-8"),
+                }
+        return None
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def _file_version(stat_result: os.stat_result) -> Tuple[int, int]:
+    # A rebuild replaces the file, so the inode changes even within one mtime tick
+    return stat_result.st_ino, stat_result.st_mtime_ns
+
+
+_index: Optional[GazetteerIndex] = None
+_index_lock = threading.Lock()
+
+
+def _current_index() -> Optional[GazetteerIndex]:
+    """The mapped index, remapped if the file was rebuilt. Call with ``_index_lock`` held."""
+    global _index
+    path = get_gazetteer_path()
+    try:
+        version = _file_version(os.stat(path))
+    except OSError:
+        return None
+
+    if _index is None or _index.path != path or _index.version != version:
+        try:
+            new_index = GazetteerIndex(path)
+        except (OSError, ValueError, struct.error) as exc:
+            logger.warning("Unable to load gazetteer index '%s': %s", path, exc)
+            return None
+        # Release the replaced file's mapping instead of leaving it to the garbage collector
+        if _index is not None:
+            _index.close()
+        _index = new_index
+    return _index
+
+
+def get_gazetteer() -> Optional[GazetteerIndex]:
+    """Return the mapped gazetteer index, remapping it if the file was rebuilt.
+
+    The returned index is closed by the next remap, so long-lived callers
+    should use `lookup` instead.
+    """
+    with _index_lock:
+        return _current_index()
+
+
+def _quantize(value: float) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal("0.000001"), rounding=ROUND_HALF_UP)
+
+
+def lookup(location: str) -> Optional[Dict[str, object]]:
+    """Geocode a location from the offline gazetteer.
+
+    Returns the same shape as the remote geocoder, so this can also be used
+    directly as ``GEOCODING_BACKEND`` where there is no network access.
+    """
+    normalized = location_utils.normalize_location(location)
+    if not normalized:
+        return None
+
+    # Held while reading too, so a remap can't close the map mid-lookup
+    with _index_lock:
+        index = _current_index()
+        place = index.get(normalized) if index is not None else None
+    if not place:
+        return None
+    return {
+        "latitude": _quantize(place["latitude"]),
+        "longitude": _quantize(place["longitude"]),
+        "display_name": place["display_name"],
+    }
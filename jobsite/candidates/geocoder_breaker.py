@@ -0,0 +1,170 @@
+"""
+Circuit breaker and time budget for calls to the remote geocoder.
+
+The breaker is closed while the geocoder works. After
+GEOCODER_BREAKER_THRESHOLD consecutive failures it opens and every call is
+short-circuited for GEOCODER_BREAKER_COOLDOWN seconds. The first call after
+the cooldown becomes a half-open probe: success closes the breaker again and
+failure reopens it. State lives in the database so all workers share it.
+
+`geocoding_budget` caps the total time geocoding calls may take inside a
+block, such as a request; once it is spent calls are short-circuited too.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GeocoderCircuit
+
+CIRCUIT_NAME = "geocoder"
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 60
+DEFAULT_GEOCODING_TIMEOUT = 10
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("geocoding_deadline", default=None)
+
+
+class GeocodingUnavailable(Exception):
+    """The remote geocoder failed (network error, bad status or unreadable response)."""
+
+
+class GeocodingShortCircuited(GeocodingUnavailable):
+    """The call was skipped because the breaker is open or the time budget is spent."""
+
+
+@contextmanager
+def geocoding_budget(seconds: float):
+    """Limit the time geocoding calls may take within the block to ``seconds``."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current geocoding budget, or None when there is no budget."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def get_call_timeout() -> float:
+    """Network timeout for one geocoding call: GEOCODING_TIMEOUT capped by the remaining budget."""
+    timeout = float(getattr(settings, "GEOCODING_TIMEOUT", DEFAULT_GEOCODING_TIMEOUT))
+    remaining = remaining_budget()
+    if remaining is not None:
+        timeout = min(timeout, max(remaining, 0.0))
+    return timeout
+
+
+def _get_circuit() -> GeocoderCircuit:
+    circuit, _ = GeocoderCircuit.objects.get_or_create(name=CIRCUIT_NAME)
+    return circuit
+
+
+def _circuits():
+    return GeocoderCircuit.objects.filter(name=CIRCUIT_NAME)
+
+
+def _cooldown() -> timedelta:
+    return timedelta(seconds=getattr(settings, "GEOCODER_BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN))
+
+
+def _allow_call() -> bool:
+    """Return whether a call may go out, claiming the half-open probe if one is due."""
+    circuit = _get_circuit()
+    if circuit.state == "closed":
+        return True
+
+    now = timezone.now()
+    started = circuit.opened_at if circuit.state == "open" else circuit.probe_started_at
+    if started and started > now - _cooldown():
+        return False
+
+    # Only the worker whose update wins gets to send the probe
+    claimed = _circuits().filter(
+        state=circuit.state,
+        opened_at=circuit.opened_at,
+        probe_started_at=circuit.probe_started_at,
+    ).update(state="half_open", probe_started_at=now)
+    return claimed == 1
+
+
+def _record_success() -> None:
+    _circuits().update(
+        state="closed",
+        failure_count=0,
+        opened_at=None,
+        probe_started_at=None,
+        total_calls=F("total_calls") + 1,
+    )
+
+
+def _record_failure(error: str) -> None:
+    now = timezone.now()
+    _circuits().update(
+        failure_count=F("failure_count") + 1,
+        total_calls=F("total_calls") + 1,
+        total_failures=F("total_failures") + 1,
+        last_failure_at=now,
+        last_error=error[:255],
+    )
+    threshold = getattr(settings, "GEOCODER_BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)
+    (_circuits().filter(state="half_open") | _circuits().filter(failure_count__gte=threshold)).update(
+        state="open", opened_at=now, probe_started_at=None
+    )
+
+
+def call_geocoder(geocoder: Callable[[str], Optional[Dict[str, object]]], location: str) -> Optional[Dict[str, object]]:
+    """Call ``geocoder`` through the circuit breaker and the current time budget.
+
+    Raises:
+        GeocodingShortCircuited: the breaker is open or the budget is spent.
+        GeocodingUnavailable: the geocoder raised an error.
+    """
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        _get_circuit()
+        _circuits().update(total_budget_exhausted=F("total_budget_exhausted") + 1)
+        raise GeocodingShortCircuited("Geocoding time budget spent")
+
+    if not _allow_call():
+        _circuits().update(total_short_circuited=F("total_short_circuited") + 1)
+        raise GeocodingShortCircuited("Geocoder circuit is open")
+
+    try:
+        result = geocoder(location)
+    except Exception as exc:
+        _record_failure(str(exc) or exc.__class__.__name__)
+        if isinstance(exc, GeocodingUnavailable):
+            raise
+        raise GeocodingUnavailable(str(exc)) from exc
+
+    _record_success()
+    return result
+
+
+def get_breaker_metrics() -> Dict[str, object]:
+    """Return the breaker state and call counters."""
+    circuit = _get_circuit()
+    return {
+        "state": circuit.state,
+        "consecutive_failures": circuit.failure_count,
+        "opened_at": circuit.opened_at.isoformat() if circuit.opened_at else None,
+        "last_failure_at": circuit.last_failure_at.isoformat() if circuit.last_failure_at else None,
+        "last_error": circuit.last_error,
+        "calls_total": circuit.total_calls,
+        "failures_total": circuit.total_failures,
+        "short_circuited_total": circuit.total_short_circuited,
+        "budget_exhausted_total": circuit.total_budget_exhausted,
+    }
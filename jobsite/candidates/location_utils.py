@@ -1,20 +1,39 @@
 import json
 import logging
+import statistics
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Iterable, List, Dict, Optional, TYPE_CHECKING
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
 from urllib import error as urlerror
 from urllib import parse, request
 
+from django.conf import settings
+from django.db.models import Count, QuerySet
+from django.db.models.functions import Lower
 from django.urls import reverse
-from .models import LocationCoordinate
-
-if TYPE_CHECKING:  # pragma: no cover - imports used only for typing
-    from accounts.models import JobSeekerProfile
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import gazetteer
+from .geocoder_breaker import GeocodingShortCircuited, GeocodingUnavailable, call_geocoder, get_call_timeout
+from accounts.models import JobSeekerProfile, RecruiterProfile
+from jobs.models import Job
+from jobs.utils import get_spatial_cell
+from .models import GeocodingTask, LocationCoordinate
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_GEOCODING_BACKEND = "candidates.location_utils._fetch_coordinates_from_api"
+DEFAULT_GEOCODING_RATE_LIMIT = 1.0
+DEFAULT_GEOCODING_MAX_ATTEMPTS = 5
+DEFAULT_GEOCODING_CACHE_SIZE = 2048
+DEFAULT_GEOCODING_CACHE_TTL = 600
+DEFAULT_GEOCODING_NEGATIVE_CACHE_TTL = 120
+
 
-def _normalize_location(value: str) -> str:
+def normalize_location(value: str) -> str:
     if not value:
         return ""
     return " ".join(value.strip().lower().split())
@@ -33,17 +52,17 @@ def _fetch_coordinates_from_api(location: str) -> Optional[Dict[str, str]]:
     req = request.Request(url, headers=headers)
 
     try:
-        with request.urlopen(req, timeout=10) as response:
+        with request.urlopen(req, timeout=get_call_timeout()) as response:
             payload = response.read().decode("utf-8")
     except (urlerror.URLError, urlerror.HTTPError, TimeoutError) as exc:
         logger.warning("Failed to fetch coordinates for '%s': %s", location, exc)
-        return None
+        raise GeocodingUnavailable(str(exc)) from exc
 
     try:
         data = json.loads(payload)
     except json.JSONDecodeError as exc:
         logger.warning("Unable to decode geocoding response for '%s': %s", location, exc)
-        return None
+        raise GeocodingUnavailable(str(exc)) from exc
 
     if not data:
         return None
@@ -59,17 +78,222 @@ def _fetch_coordinates_from_api(location: str) -> Optional[Dict[str, str]]:
     }
 
 
+def get_geocoder() -> Callable[[str], Optional[Dict[str, object]]]:
+    """Return the geocoding callable configured by the ``GEOCODING_BACKEND`` setting."""
+
+    return import_string(getattr(settings, "GEOCODING_BACKEND", DEFAULT_GEOCODING_BACKEND))
+
+
+def _coordinate_to_dict(cached: LocationCoordinate) -> Dict[str, object]:
+    return {
+        "location": cached.display_name or cached.search_term,
+        "search_term": cached.search_term,
+        "normalized_name": cached.normalized_name,
+        "latitude": float(cached.latitude),
+        "longitude": float(cached.longitude),
+    }
+
+
+class CoordinateCache:
+    """Bounded, thread-safe LRU of normalized location -> coordinates with expiry.
+
+    A value of ``None`` is a negative entry: the location is not geocoded yet
+    or failed to geocode, so callers skip it without touching the database.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, object]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[Dict[str, object]]]:
+        now = time.monotonic()
+        found: Dict[str, Optional[Dict[str, object]]] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: Optional[Dict[str, object]]) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_coordinate_cache: Optional[CoordinateCache] = None
+
+
+def get_coordinate_cache() -> CoordinateCache:
+    """Return this process's coordinate cache, sized by the GEOCODING_CACHE_* settings."""
+
+    global _coordinate_cache
+    if _coordinate_cache is None:
+        _coordinate_cache = CoordinateCache(
+            max_size=getattr(settings, "GEOCODING_CACHE_SIZE", DEFAULT_GEOCODING_CACHE_SIZE),
+            ttl=getattr(settings, "GEOCODING_CACHE_TTL", DEFAULT_GEOCODING_CACHE_TTL),
+            negative_ttl=getattr(settings, "GEOCODING_NEGATIVE_CACHE_TTL", DEFAULT_GEOCODING_NEGATIVE_CACHE_TTL),
+        )
+    return _coordinate_cache
+
+
+def clear_coordinate_cache() -> None:
+    global _coordinate_cache
+    _coordinate_cache = None
+
+
+def resolve_coordinates(
+    locations: Iterable[str], enqueue_missing: bool = True
+) -> Dict[str, Optional[Dict[str, object]]]:
+    """Resolve many locations to cached coordinates, keyed by normalized name.
+
+    Locations are answered from the in-process cache first, then with a
+    single ``normalized_name__in`` query. Locations that are still unknown are
+    queued for the geocoding worker (unless ``enqueue_missing`` is False) and
+    negatively cached, so repeated page views do not look them up again.
+    """
+
+    search_terms: Dict[str, str] = {}
+    for location in locations:
+        normalized = normalize_location(location)
+        if normalized and normalized not in search_terms:
+            search_terms[normalized] = location.strip()
+
+    cache = get_coordinate_cache()
+    resolved = cache.get_many(search_terms)
+
+    missing = [normalized for normalized in search_terms if normalized not in resolved]
+    if missing:
+        for cached in LocationCoordinate.objects.filter(normalized_name__in=missing):
+            resolved[cached.normalized_name] = _coordinate_to_dict(cached)
+            cache.set(cached.normalized_name, resolved[cached.normalized_name])
+
+        unresolved = [normalized for normalized in missing if normalized not in resolved]
+        unresolved = _resolve_from_gazetteer(unresolved, search_terms, resolved)
+        for normalized in unresolved:
+            resolved[normalized] = None
+            cache.set(normalized, None)
+        if enqueue_missing:
+            enqueue_geocoding(search_terms[normalized] for normalized in unresolved)
+
+    return resolved
+
+
+def _resolve_from_gazetteer(
+    normalized_names: List[str],
+    search_terms: Dict[str, str],
+    resolved: Dict[str, Optional[Dict[str, object]]],
+) -> List[str]:
+    """Store gazetteer hits in the coordinate cache and return the names still unresolved."""
+
+    new_coordinates = []
+    unresolved = []
+    for normalized in normalized_names:
+        place = gazetteer.lookup(normalized)
+        if not place:
+            unresolved.append(normalized)
+            continue
+        new_coordinates.append(LocationCoordinate(
+            search_term=search_terms[normalized],
+            normalized_name=normalized,
+            latitude=place["latitude"],
+            longitude=place["longitude"],
+            display_name=place["display_name"],
+            source="gazetteer",
+        ))
+
+    if new_coordinates:
+        LocationCoordinate.objects.bulk_create(new_coordinates, ignore_conflicts=True)
+        _store_new_coordinates(new_coordinates)
+        for coordinate in new_coordinates:
+            resolved[coordinate.normalized_name] = _coordinate_to_dict(coordinate)
+    return unresolved
+
+
+def _store_new_coordinates(coordinates: Iterable[LocationCoordinate]) -> None:
+    """Cache newly resolved coordinates and copy them onto profiles at those locations."""
+
+    cache = get_coordinate_cache()
+    for coordinate in coordinates:
+        cache.set(coordinate.normalized_name, _coordinate_to_dict(coordinate))
+        for profile_model in (JobSeekerProfile, RecruiterProfile):
+            profile_model.objects.filter(location_key=coordinate.normalized_name).update(
+                latitude=coordinate.latitude,
+                longitude=coordinate.longitude,
+                geo_cell=get_spatial_cell(coordinate.latitude, coordinate.longitude),
+            )
+
+
+def set_profile_coordinates(profile) -> None:
+    """Geocode a job seeker or recruiter profile's location from the coordinate cache.
+
+    Only recomputes when the location changed or is not geocoded yet. Unknown
+    locations are queued, and the profile is updated once the worker resolves them.
+    """
+
+    location_key = normalize_location(profile.location)
+    if location_key == profile.location_key and (profile.has_coordinates or not location_key):
+        return
+
+    profile.location_key = location_key
+    coordinates = resolve_coordinates([profile.location]).get(location_key) if location_key else None
+    if coordinates:
+        profile.latitude = _quantize_coordinate(str(coordinates["latitude"]))
+        profile.longitude = _quantize_coordinate(str(coordinates["longitude"]))
+        profile.geo_cell = get_spatial_cell(profile.latitude, profile.longitude)
+    else:
+        profile.latitude = profile.longitude = profile.geo_cell = None
+
+
+def get_cached_coordinates(location: str) -> Optional[Dict[str, object]]:
+    """Return cached coordinates for a location without calling the geocoder."""
+
+    normalized = normalize_location(location)
+    if not normalized:
+        return None
+    return resolve_coordinates([location], enqueue_missing=False).get(normalized)
+
+
 def get_or_fetch_coordinates(location: str) -> Optional[Dict[str, object]]:
-    """Return cached coordinates for a location or fetch them if needed."""
+    """Return cached coordinates for a location or fetch them if needed.
+
+    The offline gazetteer is tried before the configured geocoder. The
+    geocoder is called synchronously, so this is meant for the geocoding
+    worker; request handlers should use `resolve_coordinates` instead.
+
+    Raises:
+        GeocodingUnavailable: the geocoder failed, its circuit breaker is
+            open or the current geocoding budget is spent.
+    """
 
-    normalized = _normalize_location(location)
+    normalized = normalize_location(location)
     if not normalized:
         return None
 
     try:
         cached = LocationCoordinate.objects.get(normalized_name=normalized)
     except LocationCoordinate.DoesNotExist:
-        fetched = _fetch_coordinates_from_api(location)
+        fetched, source = gazetteer.lookup(location), "gazetteer"
+        if not fetched:
+            fetched, source = call_geocoder(get_geocoder(), location), "geocoder"
         if not fetched:
             return None
 
@@ -80,75 +304,246 @@ def get_or_fetch_coordinates(location: str) -> Optional[Dict[str, object]]:
                 "latitude": fetched["latitude"],
                 "longitude": fetched["longitude"],
                 "display_name": fetched["display_name"],
+                "source": source,
             },
         )
+        _store_new_coordinates([cached])
 
-    return {
-        "location": cached.display_name or cached.search_term,
-        "search_term": cached.search_term,
-        "normalized_name": cached.normalized_name,
-        "latitude": float(cached.latitude),
-        "longitude": float(cached.longitude),
-    }
+    return _coordinate_to_dict(cached)
+
+
+def enqueue_geocoding(locations: Iterable[str]) -> None:
+    """Queue locations that are missing from the coordinate cache."""
+
+    tasks: Dict[str, GeocodingTask] = {}
+    for location in locations:
+        normalized = normalize_location(location)
+        if normalized and normalized not in tasks:
+            tasks[normalized] = GeocodingTask(search_term=location.strip(), normalized_name=normalized)
+
+    if tasks:
+        GeocodingTask.objects.bulk_create(tasks.values(), ignore_conflicts=True)
+
+
+class RateLimiter:
+    """Spaces geocoder calls at least ``1 / rate_limit`` seconds apart.
+
+    Reuse one limiter across queue passes to keep the spacing between the
+    last call of a pass and the first call of the next.
+    """
 
+    def __init__(self, rate_limit: Optional[float] = None, sleep: Callable[[float], None] = time.sleep):
+        if rate_limit is None:
+            rate_limit = getattr(settings, "GEOCODING_RATE_LIMIT", DEFAULT_GEOCODING_RATE_LIMIT)
+        self.interval = 1.0 / rate_limit if rate_limit else 0.0
+        self.sleep = sleep
+        self.last_call: Optional[float] = None
 
-def build_location_clusters(profiles: Iterable['JobSeekerProfile']) -> List[Dict[str, object]]:
-    """Return a list of candidate clusters grouped by location."""
+    def wait(self) -> None:
+        """Sleep until the next call is allowed, then record it."""
+        if self.last_call is not None and self.interval:
+            wait = self.interval - (time.monotonic() - self.last_call)
+            if wait > 0:
+                self.sleep(wait)
+        self.last_call = time.monotonic()
 
-    clusters: Dict[str, Dict[str, object]] = {}
-    coordinates_cache: Dict[str, Optional[Dict[str, object]]] = {}
 
-    for profile in profiles:
-        location = (profile.location or "").strip()
-        if not location:
+def process_geocoding_queue(
+    limit: Optional[int] = None,
+    rate_limit: Optional[float] = None,
+    max_attempts: Optional[int] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Dict[str, int]:
+    """Geocode pending queue entries, at most ``rate_limit`` lookups per second.
+
+    Successful lookups are written to `LocationCoordinate` and removed from the
+    queue. Failed lookups are retried with exponential backoff until
+    ``max_attempts`` is reached, after which the entry is marked failed.
+    When the geocoder's circuit breaker is open the pass stops early and the
+    remaining entries are left untouched as ``deferred``. Pass a
+    ``rate_limiter`` to share the rate limit across passes; it then replaces
+    ``rate_limit`` and ``sleep``.
+    """
+
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(rate_limit, sleep)
+    if max_attempts is None:
+        max_attempts = getattr(settings, "GEOCODING_MAX_ATTEMPTS", DEFAULT_GEOCODING_MAX_ATTEMPTS)
+
+    now = timezone.now()
+    due_tasks = GeocodingTask.objects.filter(status="pending").exclude(next_attempt_at__gt=now)
+    if limit:
+        due_tasks = due_tasks[:limit]
+
+    stats = {"geocoded": 0, "retried": 0, "failed": 0, "deferred": 0}
+    due_tasks = list(due_tasks)
+    for position, task in enumerate(due_tasks):
+        if LocationCoordinate.objects.filter(normalized_name=task.normalized_name).exists():
+            task.delete()
+            stats["geocoded"] += 1
+            continue
+
+        rate_limiter.wait()
+
+        try:
+            coordinates = get_or_fetch_coordinates(task.search_term)
+            error_message = "" if coordinates else "No geocoding result"
+        except GeocodingShortCircuited as exc:
+            # The geocoder is down; don't burn retry attempts until it recovers
+            logger.warning("Geocoding paused: %s", exc)
+            stats["deferred"] = len(due_tasks) - position
+            break
+        except Exception as exc:  # keep draining the queue if one lookup blows up
+            logger.exception("Geocoding worker failed for '%s'", task.search_term)
+            coordinates = None
+            error_message = str(exc)[:255]
+
+        if coordinates:
+            task.delete()
+            stats["geocoded"] += 1
             continue
 
-        normalized = _normalize_location(location)
-        if normalized in coordinates_cache:
-            coordinates = coordinates_cache[normalized]
+        task.attempts += 1
+        task.last_error = error_message
+        if task.attempts >= max_attempts:
+            task.status = "failed"
+            task.next_attempt_at = None
+            stats["failed"] += 1
         else:
-            coordinates = get_or_fetch_coordinates(location)
-            coordinates_cache[normalized] = coordinates
+            task.next_attempt_at = timezone.now() + timedelta(minutes=2 ** task.attempts)
+            stats["retried"] += 1
+        task.save(update_fields=["attempts", "last_error", "status", "next_attempt_at", "updated_at"])
+
+    return stats
+
+
+def seed_coordinates_from_jobs(locations: Optional[Iterable[str]] = None) -> int:
+    """Seed the coordinate cache from the coordinates recruiters picked for jobs.
+
+    Every job that has coordinates votes for its normalized location, and the
+    component-wise median of the votes becomes the cached position, so one
+    misplaced pin cannot drag a city away. Only rows that came from jobs are
+    updated; coordinates from the gazetteer or geocoder are left alone.
+
+    Args:
+        locations: Job locations to reseed. Reseeds every location when omitted.
+
+    Returns:
+        The number of locations created or updated.
+    """
+
+    jobs = Job.objects.filter(latitude__isnull=False, longitude__isnull=False).exclude(location_key="")
+    if locations is not None:
+        targets = {normalize_location(location) for location in locations} - {""}
+        if not targets:
+            return 0
+        # The same normalized key the full reseed groups by
+        jobs = jobs.filter(location_key__in=targets)
 
+    votes: Dict[str, List[Tuple[Decimal, Decimal]]] = defaultdict(list)
+    search_terms: Dict[str, str] = {}
+    rows = jobs.values_list("location_key", "location", "latitude", "longitude")
+    for normalized, location, latitude, longitude in rows.iterator():
+        votes[normalized].append((latitude, longitude))
+        search_terms.setdefault(normalized, location.strip())
+
+    if not votes:
+        return 0
+
+    existing = {
+        coordinate.normalized_name: coordinate
+        for coordinate in LocationCoordinate.objects.filter(normalized_name__in=votes)
+    }
+    to_create = []
+    to_update = []
+    for normalized, points in votes.items():
+        latitude = _quantize_coordinate(statistics.median(point[0] for point in points))
+        longitude = _quantize_coordinate(statistics.median(point[1] for point in points))
+        coordinate = existing.get(normalized)
+        if coordinate is None:
+            to_create.append(LocationCoordinate(
+                search_term=search_terms[normalized],
+                normalized_name=normalized,
+                latitude=latitude,
+                longitude=longitude,
+                display_name=search_terms[normalized],
+                source="jobs",
+            ))
+        elif coordinate.source == "jobs" and (coordinate.latitude, coordinate.longitude) != (latitude, longitude):
+            coordinate.latitude = latitude
+            coordinate.longitude = longitude
+            coordinate.updated_at = timezone.now()
+            to_update.append(coordinate)
+
+    LocationCoordinate.objects.bulk_create(to_create, ignore_conflicts=True)
+    LocationCoordinate.objects.bulk_update(to_update, ["latitude", "longitude", "updated_at"])
+
+    seeded = to_create + to_update
+    GeocodingTask.objects.filter(normalized_name__in=[coordinate.normalized_name for coordinate in seeded]).delete()
+    _store_new_coordinates(seeded)
+    return len(seeded)
+
+
+def build_location_clusters(profiles: QuerySet) -> List[Dict[str, object]]:
+    """Return candidate counts per location for a JobSeekerProfile QuerySet.
+
+    Profiles are counted with one grouped query on ``location_key``, and only
+    the counts and positions are returned; `get_cluster_members` loads the
+    candidates in a cluster page by page.
+    """
+
+    rows = (
+        profiles.exclude(location_key="")
+        .order_by()
+        .values("location_key")
+        .annotate(count=Count("id", distinct=True))
+    )
+    counts = {row["location_key"]: row["count"] for row in rows}
+    coordinates_by_location = resolve_coordinates(counts)
+
+    cluster_list: List[Dict[str, object]] = []
+    for location_key, count in counts.items():
+        coordinates = coordinates_by_location.get(location_key)
         if not coordinates:
             continue
-
-        cluster = clusters.setdefault(
-            coordinates["normalized_name"],
+        cluster_list.append(
             {
+                "key": location_key,
                 "location": coordinates["location"],
                 "latitude": coordinates["latitude"],
                 "longitude": coordinates["longitude"],
-                "candidates": [],
-            },
+                "count": count,
+            }
         )
 
-        full_name = f"{profile.user_profile.user.first_name} {profile.user_profile.user.last_name}".strip()
-        if not full_name:
-            full_name = profile.user_profile.user.username
+    cluster_list.sort(key=lambda c: (-c["count"], c["location"].lower()))
+    return cluster_list
 
-        cluster["candidates"].append(
-            {
-                "name": full_name,
-                "headline": profile.headline,
-                "profile_url": reverse("accounts.profile", args=[profile.user_profile.user.username]),
-                "location": location,
-            }
-        )
 
-    cluster_list: List[Dict[str, object]] = []
-    for cluster in clusters.values():
-        candidates = cluster["candidates"]
-        candidates.sort(key=lambda c: c["name"].lower())
-        cluster_list.append(
-            {
-                "location": cluster["location"],
-                "latitude": cluster["latitude"],
-                "longitude": cluster["longitude"],
-                "count": len(candidates),
-                "candidates": candidates,
-            }
+def get_cluster_members(profiles: QuerySet, location_key: str) -> QuerySet:
+    """Return the profiles in one location cluster, ordered by name."""
+
+    return (
+        profiles.filter(location_key=normalize_location(location_key))
+        .select_related("user_profile__user")
+        .order_by(
+            Lower("user_profile__user__first_name"),
+            Lower("user_profile__user__last_name"),
+            "user_profile__user__username",
+            "id",
         )
+    )
 
-    cluster_list.sort(key=lambda c: c["count"], reverse=True)
-    return cluster_list
+
+def serialize_cluster_member(profile: JobSeekerProfile) -> Dict[str, object]:
+    """Return the map popup fields for one candidate."""
+
+    user = profile.user_profile.user
+    full_name = f"{user.first_name} {user.last_name}".strip() or user.username
+    return {
+        "name": full_name,
+        "headline": profile.headline,
+        "profile_url": reverse("accounts.profile", args=[user.username]),
+        "location": profile.location.strip(),
+    }
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from candidates.gazetteer import (
+    BUNDLED_GAZETTEER_CSV,
+    build_gazetteer_index,
+    get_gazetteer_path,
+    read_gazetteer_csv,
+)
+
+
+class Command(BaseCommand):
+    help = "Import a gazetteer CSV (name, latitude, longitude, aliases) into the memory-mapped index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default=BUNDLED_GAZETTEER_CSV,
+                            help="Gazetteer CSV to import (defaults to the bundled US city list)")
+        parser.add_argument('--output', default=None,
+                            help="Index file to write (defaults to GAZETTEER_PATH)")
+
+    def handle(self, *args, **options):
+        output_path = options['output'] or get_gazetteer_path()
+        try:
+            key_count = build_gazetteer_index(read_gazetteer_csv(options['csv_path']), output_path)
+        except OSError as exc:
+            raise CommandError(f"Unable to build gazetteer index: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {key_count} gazetteer key(s) to {output_path}."))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from candidates.location_utils import RateLimiter, process_geocoding_queue
+
+
+class Command(BaseCommand):
+    help = "Geocode queued candidate locations into the LocationCoordinate cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Maximum number of queue entries to process per pass")
+        parser.add_argument('--rate-limit', type=float, default=None,
+                            help="Maximum geocoder requests per second (defaults to GEOCODING_RATE_LIMIT)")
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help="Attempts before an entry is marked failed (defaults to GEOCODING_MAX_ATTEMPTS)")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the queue instead of exiting once it is drained")
+        parser.add_argument('--idle-sleep', type=float, default=30.0,
+                            help="Seconds to wait between polls when --loop is set and the queue is empty")
+
+    def handle(self, *args, **options):
+        # One limiter for every pass, so back-to-back passes don't restart the rate limit
+        rate_limiter = RateLimiter(options['rate_limit'])
+        while True:
+            stats = process_geocoding_queue(
+                limit=options['limit'],
+                max_attempts=options['max_attempts'],
+                rate_limiter=rate_limiter,
+            )
+            processed = stats['geocoded'] + stats['retried'] + stats['failed']
+            if processed:
+                self.stdout.write(
+                    f"Geocoded {stats['geocoded']}, will retry {stats['retried']}, failed {stats['failed']}."
+                )
+            if stats['deferred']:
+                self.stdout.write(self.style.WARNING(
+                    f"Geocoder unavailable; deferred {stats['deferred']} entries."
+                ))
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS("Geocoding queue processed."))
+                return
+            if not processed:
+                time.sleep(options['idle_sleep'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from candidates.location_utils import seed_coordinates_from_jobs
+
+
+class Command(BaseCommand):
+    help = "Backfill the location coordinate cache from the coordinates on job postings"
+
+    def handle(self, *args, **options):
+        seeded = seed_coordinates_from_jobs()
+        self.stdout.write(self.style.SUCCESS(f"Seeded coordinates for {seeded} location(s) from job postings."))
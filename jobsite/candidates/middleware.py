@@ -0,0 +1,16 @@
+from django.conf import settings
+
+from .geocoder_breaker import geocoding_budget
+
+DEFAULT_GEOCODING_REQUEST_BUDGET = 2.0
+
+
+class GeocodingBudgetMiddleware:
+    """Cap the total time any geocoding calls made while serving a request may take."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with geocoding_budget(getattr(settings, 'GEOCODING_REQUEST_BUDGET', DEFAULT_GEOCODING_REQUEST_BUDGET)):
+            return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0005_geocodingtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationcoordinate',
+            name='source',
+            field=models.CharField(choices=[('geocoder', 'Geocoding service'), ('gazetteer', 'Offline gazetteer'), ('jobs', 'Job posting coordinates')], default='geocoder', max_length=20),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0006_locationcoordinate_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocoderCircuit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('state', models.CharField(choices=[('closed', 'Closed'), ('open', 'Open'), ('half_open', 'Half-open')], default='closed', max_length=20)),
+                ('failure_count', models.PositiveIntegerField(default=0, help_text='Consecutive failures')),
+                ('opened_at', models.DateTimeField(blank=True, null=True)),
+                ('probe_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=255)),
+                ('total_calls', models.PositiveBigIntegerField(default=0)),
+                ('total_failures', models.PositiveBigIntegerField(default=0)),
+                ('total_short_circuited', models.PositiveBigIntegerField(default=0)),
+                ('total_budget_exhausted', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -21,13 +21,72 @@ class SavedCandidateSearch(models.Model):
 class LocationCoordinate(models.Model):
     """Stores latitude and longitude for candidate-provided locations."""
 
+    SOURCE_CHOICES = [
+        ('geocoder', 'Geocoding service'),
+        ('gazetteer', 'Offline gazetteer'),
+        ('jobs', 'Job posting coordinates'),
+    ]
+
     search_term = models.CharField(max_length=255)
     normalized_name = models.CharField(max_length=255, unique=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=8)
     longitude = models.DecimalField(max_digits=11, decimal_places=8)
     display_name = models.CharField(max_length=255, blank=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='geocoder')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.display_name or self.search_term
+
+class GeocodingTask(models.Model):
+    """A location waiting to be geocoded by the `process_geocoding_queue` worker."""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ]
+
+    search_term = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.CharField(max_length=255, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='candidates_geotask_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.search_term} ({self.status})"
+
+
+class GeocoderCircuit(models.Model):
+    """Circuit breaker state and call counters for the remote geocoder, shared by all workers."""
+
+    STATE_CHOICES = [
+        ('closed', 'Closed'),
+        ('open', 'Open'),
+        ('half_open', 'Half-open'),
+    ]
+
+    name = models.CharField(max_length=50, unique=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='closed')
+    failure_count = models.PositiveIntegerField(default=0, help_text="Consecutive failures")
+    opened_at = models.DateTimeField(null=True, blank=True)
+    probe_started_at = models.DateTimeField(null=True, blank=True)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    total_calls = models.PositiveBigIntegerField(default=0)
+    total_failures = models.PositiveBigIntegerField(default=0)
+    total_short_circuited = models.PositiveBigIntegerField(default=0)
+    total_budget_exhausted = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return self.display_name or self.search_term
\ No newline at end of file
+        return f"{self.name} ({self.get_state_display()})"
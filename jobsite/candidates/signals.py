@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts.models import Education, JobSeekerProfile, WorkExperience
+from .utils import schedule_new_match_check
+
+
+@receiver(post_save, sender=JobSeekerProfile)
+def count_profile_matches(sender, instance, raw=False, **kwargs):
+    """Count the profile as a new match for saved searches it now meets, once the save commits"""
+    if raw:
+        return
+    schedule_new_match_check(instance)
+
+
+@receiver(post_save, sender=Education)
+@receiver(post_save, sender=WorkExperience)
+def count_profile_history_matches(sender, instance, raw=False, **kwargs):
+    """Education and work history are searchable too, so re-check their profile"""
+    if raw:
+        return
+    schedule_new_match_check(instance.job_seeker_id)
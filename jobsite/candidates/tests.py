@@ -0,0 +1,433 @@
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile, JobSeekerProfile
+from jobs.models import Job
+from candidates.location_utils import (
+    build_location_clusters,
+    clear_coordinate_cache,
+    process_geocoding_queue,
+    RateLimiter,
+    resolve_coordinates,
+    seed_coordinates_from_jobs,
+)
+from candidates.geocoder_breaker import (
+    GeocodingShortCircuited,
+    call_geocoder,
+    geocoding_budget,
+    get_breaker_metrics,
+)
+from candidates.gazetteer import (
+    BUNDLED_GAZETTEER_CSV,
+    build_gazetteer_index,
+    get_gazetteer,
+    lookup as gazetteer_lookup,
+    read_gazetteer_csv,
+)
+from candidates.models import GeocoderCircuit, GeocodingTask, LocationCoordinate
+from candidates.utils import perform_candidate_search
+
+LOCAL_GEOCODER_RESULTS = {
+    "atlanta, ga": {"latitude": Decimal("33.748995"), "longitude": Decimal("-84.387982"), "display_name": "Atlanta, GA"},
+}
+local_geocoder_calls = []
+
+
+def local_geocoder(location):
+    """Stand-in for Nominatim that answers from LOCAL_GEOCODER_RESULTS."""
+    local_geocoder_calls.append(location)
+    return LOCAL_GEOCODER_RESULTS.get(" ".join(location.lower().split()))
+
+
+def failing_geocoder(location):
+    """Stand-in for a geocoder that is down."""
+    local_geocoder_calls.append(location)
+    raise TimeoutError("timed out")
+
+
+def create_candidate(username, location):
+    user = User.objects.create_user(username=username, password="pass1234")
+    user_profile = UserProfile.objects.create(user=user, user_type='job_seeker')
+    return JobSeekerProfile.objects.create(user_profile=user_profile, location=location)
+
+
+NO_GAZETTEER = os.path.join(tempfile.gettempdir(), 'missing-gazetteer.idx')
+
+
+@override_settings(
+    GEOCODING_BACKEND='candidates.tests.local_geocoder', GEOCODING_RATE_LIMIT=0, GAZETTEER_PATH=NO_GAZETTEER
+)
+class GeocodingQueueTests(TestCase):
+    def setUp(self):
+        local_geocoder_calls.clear()
+        clear_coordinate_cache()
+        self.profiles = [
+            create_candidate("alice", "Atlanta, GA"),
+            create_candidate("bob", " atlanta,  GA "),
+            create_candidate("carol", "Nowhere Town"),
+        ]
+
+    def test_clustering_only_reads_cache_and_enqueues_misses(self):
+        clusters = build_location_clusters(JobSeekerProfile.objects.all())
+
+        self.assertEqual(clusters, [])
+        self.assertEqual(local_geocoder_calls, [])
+        self.assertEqual(
+            set(GeocodingTask.objects.values_list('normalized_name', flat=True)),
+            {"atlanta, ga", "nowhere town"},
+        )
+
+    def test_worker_drains_queue_into_cache(self):
+        build_location_clusters(JobSeekerProfile.objects.all())
+
+        stats = process_geocoding_queue(max_attempts=1)
+
+        self.assertEqual(stats, {"geocoded": 1, "retried": 0, "failed": 1, "deferred": 0})
+        self.assertTrue(LocationCoordinate.objects.filter(normalized_name="atlanta, ga").exists())
+        self.assertEqual(GeocodingTask.objects.get().status, "failed")
+
+        # Profiles at the geocoded location pick up its coordinates
+        self.profiles[1].refresh_from_db()
+        self.assertEqual(self.profiles[1].latitude, Decimal("33.748995"))
+        self.assertIsNotNone(self.profiles[1].geo_cell)
+
+        clusters = build_location_clusters(JobSeekerProfile.objects.all())
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]["count"], 2)
+
+    def test_failed_lookup_is_retried_later(self):
+        build_location_clusters(JobSeekerProfile.objects.filter(pk=self.profiles[2].pk))
+
+        stats = process_geocoding_queue(max_attempts=3)
+        self.assertEqual(stats["retried"], 1)
+        self.assertEqual(local_geocoder_calls.count("Nowhere Town"), 1)
+
+        # Not due yet, so a second pass leaves it alone
+        self.assertEqual(process_geocoding_queue(max_attempts=3), {"geocoded": 0, "retried": 0, "failed": 0, "deferred": 0})
+        self.assertEqual(local_geocoder_calls.count("Nowhere Town"), 1)
+
+    def test_worker_respects_rate_limit(self):
+        build_location_clusters(JobSeekerProfile.objects.all())
+        waits = []
+
+        process_geocoding_queue(rate_limit=0.5, sleep=waits.append)
+
+        self.assertEqual(len(waits), 1)
+        self.assertGreater(waits[0], 1.5)
+
+    def test_rate_limit_carries_across_passes(self):
+        waits = []
+        rate_limiter = RateLimiter(0.5, sleep=waits.append)
+        build_location_clusters(JobSeekerProfile.objects.filter(pk=self.profiles[0].pk))
+        process_geocoding_queue(rate_limiter=rate_limiter)
+        build_location_clusters(JobSeekerProfile.objects.filter(pk=self.profiles[2].pk))
+        process_geocoding_queue(rate_limiter=rate_limiter)
+
+        self.assertEqual(len(waits), 1)
+        self.assertGreater(waits[0], 1.5)
+
+
+@override_settings(
+    GEOCODING_BACKEND='candidates.tests.failing_geocoder', GEOCODING_RATE_LIMIT=0, GAZETTEER_PATH=NO_GAZETTEER,
+    GEOCODER_BREAKER_THRESHOLD=2, GEOCODER_BREAKER_COOLDOWN=60,
+)
+class GeocoderCircuitBreakerTests(TestCase):
+    def setUp(self):
+        local_geocoder_calls.clear()
+        clear_coordinate_cache()
+        for username, location in [("alice", "Atlanta, GA"), ("bob", "Boston, MA"), ("carol", "Chicago, IL")]:
+            create_candidate(username, location)
+
+    def test_breaker_opens_and_defers_the_rest_of_the_queue(self):
+        stats = process_geocoding_queue(max_attempts=5)
+
+        self.assertEqual(stats, {"geocoded": 0, "retried": 2, "failed": 0, "deferred": 1})
+        self.assertEqual(len(local_geocoder_calls), 2)
+        self.assertEqual(GeocodingTask.objects.filter(attempts=0).count(), 1)
+
+        metrics = get_breaker_metrics()
+        self.assertEqual(metrics["state"], "open")
+        self.assertEqual(metrics["failures_total"], 2)
+        self.assertEqual(metrics["short_circuited_total"], 1)
+
+    def test_half_open_probe_closes_breaker_on_success(self):
+        GeocoderCircuit.objects.create(
+            name="geocoder", state="open", failure_count=2,
+            opened_at=timezone.now() - timedelta(seconds=120),
+        )
+
+        result = call_geocoder(local_geocoder, "Atlanta, GA")
+
+        self.assertEqual(result["display_name"], "Atlanta, GA")
+        circuit = GeocoderCircuit.objects.get()
+        self.assertEqual(circuit.state, "closed")
+        self.assertEqual(circuit.failure_count, 0)
+
+    def test_half_open_probe_is_claimed_once(self):
+        GeocoderCircuit.objects.create(
+            name="geocoder", state="half_open", probe_started_at=timezone.now(),
+        )
+
+        with self.assertRaises(GeocodingShortCircuited):
+            call_geocoder(local_geocoder, "Atlanta, GA")
+        self.assertEqual(local_geocoder_calls, [])
+
+    def test_spent_budget_skips_the_call(self):
+        with geocoding_budget(0):
+            with self.assertRaises(GeocodingShortCircuited):
+                call_geocoder(local_geocoder, "Atlanta, GA")
+
+        self.assertEqual(local_geocoder_calls, [])
+        self.assertEqual(get_breaker_metrics()["budget_exhausted_total"], 1)
+
+    def test_metrics_view_is_superuser_only(self):
+        User.objects.create_superuser(username="admin", password="pass1234")
+        url = reverse('candidates.geocoder_metrics')
+
+        self.client.login(username="alice", password="pass1234")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username="admin", password="pass1234")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "closed")
+
+
+@override_settings(GAZETTEER_PATH=NO_GAZETTEER)
+class CoordinateResolverTests(TestCase):
+    def setUp(self):
+        clear_coordinate_cache()
+        for name, lat, lon in [("atlanta, ga", "33.75", "-84.39"), ("austin, tx", "30.27", "-97.74")]:
+            LocationCoordinate.objects.create(
+                search_term=name, normalized_name=name, latitude=Decimal(lat), longitude=Decimal(lon)
+            )
+
+    def test_resolves_many_locations_with_one_query(self):
+        with self.assertNumQueries(1):
+            resolved = resolve_coordinates(["Atlanta, GA", "AUSTIN, TX", "atlanta,  ga"], enqueue_missing=False)
+
+        self.assertEqual(set(resolved), {"atlanta, ga", "austin, tx"})
+        self.assertEqual(resolved["austin, tx"]["latitude"], 30.27)
+
+    def test_repeat_lookups_are_served_from_lru(self):
+        resolve_coordinates(["Atlanta, GA", "Unknown Place"])
+
+        with self.assertNumQueries(0):
+            resolved = resolve_coordinates(["Atlanta, GA", "Unknown Place"])
+
+        self.assertIsNotNone(resolved["atlanta, ga"])
+        self.assertIsNone(resolved["unknown place"])
+        self.assertTrue(GeocodingTask.objects.filter(normalized_name="unknown place").exists())
+
+    @override_settings(GEOCODING_CACHE_SIZE=1)
+    def test_lru_is_bounded(self):
+        clear_coordinate_cache()
+        resolve_coordinates(["Atlanta, GA"])
+        resolve_coordinates(["Austin, TX"])
+
+        with self.assertNumQueries(1):
+            resolve_coordinates(["Atlanta, GA"], enqueue_missing=False)
+
+
+class GazetteerTests(TestCase):
+    def setUp(self):
+        clear_coordinate_cache()
+        local_geocoder_calls.clear()
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.index_path = os.path.join(index_dir.name, 'gazetteer.idx')
+        build_gazetteer_index(read_gazetteer_csv(BUNDLED_GAZETTEER_CSV), self.index_path)
+
+    def test_lookup_by_name_and_alias(self):
+        with override_settings(GAZETTEER_PATH=self.index_path):
+            by_name = resolve_coordinates(["Atlanta, GA"], enqueue_missing=False)["atlanta, ga"]
+            by_alias = resolve_coordinates([" atlanta,  Georgia "], enqueue_missing=False)["atlanta, georgia"]
+
+        self.assertEqual(by_name["location"], "Atlanta, GA")
+        self.assertEqual(by_alias["latitude"], by_name["latitude"])
+        self.assertTrue(LocationCoordinate.objects.filter(normalized_name="atlanta, georgia").exists())
+
+    def test_gazetteer_is_consulted_before_remote_geocoder(self):
+        with override_settings(GAZETTEER_PATH=self.index_path, GEOCODING_BACKEND='candidates.tests.local_geocoder'):
+            create_candidate("dave", "Chicago, IL")
+            create_candidate("erin", "Nowhere Town")
+            clusters = build_location_clusters(JobSeekerProfile.objects.all())
+            process_geocoding_queue(rate_limit=0)
+
+        self.assertEqual([cluster["location"] for cluster in clusters], ["Chicago, IL"])
+        self.assertEqual(local_geocoder_calls, ["Nowhere Town"])
+
+    def test_earlier_rows_win_duplicate_keys(self):
+        rows = [("Portland, OR", 45.5, -122.6, ["Portland"]), ("Portland, ME", 43.6, -70.2, ["Portland"])]
+        build_gazetteer_index(rows, self.index_path)
+
+        with override_settings(GAZETTEER_PATH=self.index_path):
+            place = resolve_coordinates(["Portland"], enqueue_missing=False)["portland"]
+
+        self.assertEqual(place["location"], "Portland, OR")
+
+    def test_rebuilt_index_is_remapped_and_old_map_closed(self):
+        with override_settings(GAZETTEER_PATH=self.index_path):
+            old_index = get_gazetteer()
+            build_gazetteer_index([("Springfield, IL", 39.8, -89.6, [])], self.index_path)
+
+            self.assertEqual(gazetteer_lookup("Springfield, IL")["display_name"], "Springfield, IL")
+            self.assertIsNone(gazetteer_lookup("Atlanta, GA"))
+        self.assertTrue(old_index._map.closed)
+
+
+@override_settings(GAZETTEER_PATH=NO_GAZETTEER)
+class JobCoordinateSeedingTests(TestCase):
+    def setUp(self):
+        clear_coordinate_cache()
+        self.poster = User.objects.create_user(username="poster", password="pass1234")
+
+    def create_job(self, location, latitude=None, longitude=None):
+        return Job.objects.create(
+            title="Engineer", company="SeedCo", location=location,
+            latitude=latitude, longitude=longitude,
+            description="Description", requirements="Requirements", posted_by=self.poster,
+        )
+
+    def test_job_save_seeds_cache_with_median_of_pins(self):
+        GeocodingTask.objects.create(search_term="Atlanta, GA", normalized_name="atlanta, ga")
+        self.create_job("Atlanta, GA", Decimal("33.70"), Decimal("-84.40"))
+        self.create_job("atlanta, ga", Decimal("33.80"), Decimal("-84.30"))
+        self.create_job("Atlanta, GA", Decimal("47.60"), Decimal("-122.30"))  # misplaced pin
+
+        coordinate = LocationCoordinate.objects.get(normalized_name="atlanta, ga")
+        self.assertEqual(coordinate.source, "jobs")
+        self.assertEqual((coordinate.latitude, coordinate.longitude), (Decimal("33.8"), Decimal("-84.4")))
+        self.assertFalse(GeocodingTask.objects.exists())
+
+    def test_job_save_counts_pins_of_every_spelling(self):
+        self.create_job("Atlanta,  GA", Decimal("33.70"), Decimal("-84.40"))
+        self.create_job(" atlanta, ga", Decimal("33.80"), Decimal("-84.30"))
+        self.create_job("ATLANTA, GA", Decimal("33.90"), Decimal("-84.20"))
+        incremental = LocationCoordinate.objects.get(normalized_name="atlanta, ga")
+
+        seed_coordinates_from_jobs()
+        full = LocationCoordinate.objects.get(normalized_name="atlanta, ga")
+        self.assertEqual((incremental.latitude, incremental.longitude), (full.latitude, full.longitude))
+        self.assertEqual((full.latitude, full.longitude), (Decimal("33.8"), Decimal("-84.3")))
+
+    def test_geocoded_locations_are_not_overwritten(self):
+        LocationCoordinate.objects.create(
+            search_term="Austin, TX", normalized_name="austin, tx",
+            latitude=Decimal("30.27"), longitude=Decimal("-97.74"),
+        )
+        self.create_job("Austin, TX", Decimal("31.00"), Decimal("-98.00"))
+
+        self.assertEqual(LocationCoordinate.objects.get(normalized_name="austin, tx").latitude, Decimal("30.27"))
+
+    def test_backfill_covers_existing_jobs(self):
+        job = self.create_job("Denver, CO")
+        Job.objects.filter(pk=job.pk).update(latitude=Decimal("39.74"), longitude=Decimal("-104.99"))
+
+        self.assertEqual(seed_coordinates_from_jobs(), 1)
+        self.assertEqual(resolve_coordinates(["Denver, CO"])["denver, co"]["latitude"], 39.74)
+
+
+@override_settings(GAZETTEER_PATH=NO_GAZETTEER)
+class RadiusCandidateSearchTests(TestCase):
+    def setUp(self):
+        clear_coordinate_cache()
+        places = [
+            ("atlanta, ga", "33.7490", "-84.3880"),
+            ("marietta, ga", "33.9526", "-84.5499"),
+            ("athens, ga", "33.9519", "-83.3576"),
+            ("savannah, ga", "32.0809", "-81.0912"),
+        ]
+        for name, lat, lon in places:
+            LocationCoordinate.objects.create(
+                search_term=name, normalized_name=name, latitude=Decimal(lat), longitude=Decimal(lon)
+            )
+
+        self.atlanta = create_candidate("atl", "Atlanta, GA")
+        self.marietta = create_candidate("mar", "Marietta, GA")
+        self.athens = create_candidate("ath", "Athens, GA")
+        self.savannah = create_candidate("sav", "Savannah, GA")
+        self.marietta.skills = "Python, Django"
+        self.marietta.save()
+        self.athens.skills = "Python"
+        self.athens.save()
+
+    def test_radius_search_orders_by_distance(self):
+        results = perform_candidate_search("", "", "Atlanta, GA", "", center=(33.7490, -84.3880), radius="75")
+
+        self.assertEqual([profile.pk for profile in results], [self.atlanta.pk, self.marietta.pk, self.athens.pk])
+        self.assertLess(results[0].distance, 1)
+
+    def test_radius_combines_with_skills_filter(self):
+        results = perform_candidate_search("", "Python", "", "", center=(33.7490, -84.3880), radius="25")
+
+        self.assertEqual([profile.pk for profile in results], [self.marietta.pk])
+
+    def test_search_near_recruiter_job(self):
+        recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=recruiter, user_type='recruiter')
+        job = Job.objects.create(
+            title="Engineer", company="Peach", location="Athens, GA",
+            latitude=Decimal("33.9519"), longitude=Decimal("-83.3576"),
+            description="Description", requirements="Requirements", posted_by=recruiter,
+        )
+
+        self.client.login(username="recruiter", password="pass1234")
+        response = self.client.get(reverse('candidates.candidate_search'), {'radius': '10', 'near_job': job.pk})
+
+        results = list(response.context['template_data']['results'])
+        self.assertEqual([profile.pk for profile in results], [self.athens.pk])
+
+    def test_clusters_are_counted_for_radius_search(self):
+        create_candidate("atl2", " atlanta,  GA ")
+        results = perform_candidate_search("", "", "Atlanta, GA", "", center=(33.7490, -84.3880), radius="75")
+
+        clusters = build_location_clusters(results)
+
+        self.assertEqual([(cluster["key"], cluster["count"]) for cluster in clusters],
+                         [("atlanta, ga", 2), ("athens, ga", 1), ("marietta, ga", 1)])
+        self.assertNotIn("candidates", clusters[0])
+
+    def test_cluster_members_are_paginated_within_search(self):
+        for index in range(22):
+            create_candidate(f"atl{index:02d}", "Atlanta, GA")
+        python_dev = create_candidate("pyatl", "Atlanta, GA")
+        python_dev.skills = "Python"
+        python_dev.save()
+        recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=recruiter, user_type='recruiter')
+        self.client.login(username="recruiter", password="pass1234")
+        url = reverse('candidates.cluster_members')
+
+        first = self.client.get(url, {'cluster': 'atlanta, ga'}).json()
+        second = self.client.get(url, {'cluster': 'atlanta, ga', 'page': 2}).json()
+        filtered = self.client.get(url, {'cluster': 'atlanta, ga', 'skills': 'Python'}).json()
+
+        self.assertEqual(first["count"], 24)
+        self.assertEqual(len(first["candidates"]), 20)
+        self.assertTrue(first["has_next"])
+        self.assertEqual(len(second["candidates"]), 4)
+        self.assertFalse(second["has_next"])
+        self.assertEqual([candidate["name"] for candidate in filtered["candidates"]], ["pyatl"])
+
+    def test_invalid_radius_search_shows_no_candidates(self):
+        recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=recruiter, user_type='recruiter')
+        self.client.login(username="recruiter", password="pass1234")
+
+        # A radius needs a location or one of the recruiter's jobs to measure from
+        response = self.client.get(reverse('candidates.candidate_search'), {'radius': '25'})
+        self.assertTrue(response.context['template_data']['form'].errors)
+        self.assertEqual(list(response.context['template_data']['results']), [])
+        self.assertEqual(response.context['template_data']['location_clusters'], [])
+
+        response = self.client.get(reverse('candidates.cluster_members'), {'cluster': 'atlanta, ga', 'radius': '25'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('__all__', response.json()['errors'])
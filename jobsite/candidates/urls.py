@@ -3,6 +3,8 @@ from . import views
 
 urlpatterns = [
     path('search/', views.candidate_search, name='candidates.candidate_search'),
+    path('search/clusters/', views.cluster_members, name='candidates.cluster_members'),
     path('search/saved/', views.saved_candidate_searches, name='candidates.saved_candidate_searches'),
     path('search/delete/<int:search_id>/', views.delete_saved_search, name='candidates.delete_saved_search'),
+    path('geocoder/metrics/', views.geocoder_metrics, name='candidates.geocoder_metrics'),
 ]
\ No newline at end of file
@@ -1,14 +1,22 @@
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
+from accounts import notifications
 from accounts.models import JobSeekerProfile
 from .models import SavedCandidateSearch
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import CharField, Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Trim
+from jobs.utils import filter_queryset_by_radius
 
-def perform_candidate_search(search_input, skills_str, location, projects):
+def perform_candidate_search(search_input, skills_str, location, projects, center=None, radius=None):
     """
     Helper function to perform candidate search based on provided parameters.
     Returns a QuerySet of matching JobSeekerProfile objects.
+
+    When a (latitude, longitude) center and a radius in miles are given,
+    the location text is used as the center instead of a substring filter,
+    and results are limited to that radius and ordered by distance.
     """
 
     results = JobSeekerProfile.objects.filter(profile_visibility='public')
@@ -40,13 +48,17 @@ def perform_candidate_search(search_input, skills_str, location, projects):
             results = results.filter(skills__icontains=skill)
 
     # Apply location filter
-    if location:
+    if location and not (center and radius):
         results = results.filter(location__icontains=location)
 
     # Apply projects filter
     if projects:
         project_query = Q(summary__icontains=projects) | Q(work_experience__description__icontains=projects)
         results = results.filter(project_query).distinct()
+
+    # Apply radius filter using the geocoded profile coordinates
+    if center and radius:
+        results = filter_queryset_by_radius(results, center[0], center[1], radius, cell_field='geo_cell')
     
     return results
 
@@ -74,9 +86,123 @@ def get_new_matches(search):
     search.last_match_results = current_matches_ids
     search.new_matches_count += new_matches_count
     search.save()
+    notifications.increment(search.recruiter.user_id, 'new_candidate_matches', new_matches_count)
     
     return search.new_matches_count
 
+# Saved searches checked against a changed profile per query
+MATCH_CHECK_BATCH_SIZE = 50
+
+
+class _MatchCheck:
+    """on_commit callback checking one profile against the saved searches."""
+
+    def __init__(self, profile_id):
+        self.profile_id = profile_id
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        record_new_matches(self.profile_id)
+
+
+def schedule_new_match_check(profile):
+    """
+    Run `record_new_matches` for ``profile`` (or its id) once the current transaction commits.
+
+    A profile saved together with several education or work history rows
+    in one transaction is checked once, after the last of them.
+    """
+    profile_id = getattr(profile, 'pk', profile)
+    connection = transaction.get_connection()
+    if any(
+        isinstance(callback, _MatchCheck) and callback.profile_id == profile_id and not callback.done
+        for _, callback, *_ in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(_MatchCheck(profile_id))
+
+
+def record_new_matches(profile):
+    """
+    Count a saved or edited candidate profile as a new match for the saved searches it now meets.
+
+    Runs when profiles change, so recruiters' match counts are ready to read
+    instead of every saved search being re-run on each page load. The
+    profile is tested against up to MATCH_CHECK_BATCH_SIZE distinct search
+    criteria per query, and the searches it newly matches are updated under
+    a row lock so concurrent profile saves don't drop each other's matches.
+
+    Searches whose location, or single skill, can't occur in the profile's
+    own location or skills are ruled out in SQL before any are re-run.
+    """
+    profile_id = getattr(profile, 'pk', profile)
+    profile_fields = (
+        JobSeekerProfile.objects.filter(pk=profile_id, profile_visibility='public')
+        .values('location', 'skills')
+        .first()
+    )
+    if profile_fields is None:
+        return
+
+    searches_by_criteria = {}
+    searches = (
+        SavedCandidateSearch.objects.annotate(
+            profile_location=Value(profile_fields['location'], output_field=CharField()),
+            profile_skills=Value(profile_fields['skills'], output_field=CharField()),
+        )
+        .filter(Q(location='') | Q(profile_location__icontains=F('location')))
+        .filter(Q(skills__contains=',') | Q(profile_skills__icontains=Trim('skills')))
+        .values_list('pk', 'search_input', 'skills', 'location', 'projects', 'last_match_results')
+    )
+    for pk, search_input, skills, location, projects, last_match_results in searches.iterator():
+        if profile_id not in last_match_results:
+            searches_by_criteria.setdefault((search_input, skills, location, projects), []).append(pk)
+
+    matched_ids = []
+    criteria = list(searches_by_criteria)
+    for start in range(0, len(criteria), MATCH_CHECK_BATCH_SIZE):
+        batch = criteria[start:start + MATCH_CHECK_BATCH_SIZE]
+        checks = {
+            f'matches_{index}': Exists(perform_candidate_search(*terms).filter(pk=OuterRef('pk')))
+            for index, terms in enumerate(batch)
+        }
+        row = JobSeekerProfile.objects.filter(pk=profile_id).annotate(**checks).values(*checks).first() or {}
+        for index, terms in enumerate(batch):
+            if row.get(f'matches_{index}'):
+                matched_ids.extend(searches_by_criteria[terms])
+    if not matched_ids:
+        return
+
+    new_matches = {}
+    with transaction.atomic():
+        searches = SavedCandidateSearch.objects.select_for_update(of=('self',)).select_related('recruiter')
+        for search in searches.filter(pk__in=matched_ids):
+            if profile_id in search.last_match_results:
+                continue
+            search.last_match_results = sorted([*search.last_match_results, profile_id])
+            search.new_matches_count = F('new_matches_count') + 1
+            search.save(update_fields=['last_match_results', 'new_matches_count'])
+            recruiter_id = search.recruiter.user_id
+            new_matches[recruiter_id] = new_matches.get(recruiter_id, 0) + 1
+        for recruiter_id, count in new_matches.items():
+            notifications.increment(recruiter_id, 'new_candidate_matches', count)
+
+def mark_saved_search_seen(search):
+    """Clear a saved search's new matches once the recruiter has looked at its results."""
+    with transaction.atomic():
+        # Take back the count that is cleared, not the one ``search`` was loaded with
+        cleared = (
+            SavedCandidateSearch.objects.select_for_update()
+            .filter(pk=search.pk, new_matches_count__gt=0)
+            .values_list('new_matches_count', flat=True)
+            .first()
+        )
+        if cleared:
+            SavedCandidateSearch.objects.filter(pk=search.pk).update(new_matches_count=0)
+            notifications.decrement(search.recruiter.user_id, 'new_candidate_matches', cleared)
+    search.new_matches_count = 0
+
 def update_saved_searches_with_new_matches(recruiter):
     """
     Loop through all saved searches for a recruiter and update new matches count.
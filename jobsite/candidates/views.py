@@ -3,17 +3,21 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from .forms import CandidateSearchForm
 from accounts.models import JobSeekerProfile
+from accounts.notifications import get_request_notification_counts
 from .models import SavedCandidateSearch
 from .recommendations import get_recommended_candidates_for_recruiter
 
 from .utils import (
-    update_saved_searches_with_new_matches,
+    mark_saved_search_seen,
     save_candidate_search,
     perform_candidate_search
 )
-from .location_utils import build_location_clusters
+from .location_utils import build_location_clusters, get_cluster_members, serialize_cluster_member
+from .geocoder_breaker import get_breaker_metrics
 
 @login_required
 def candidate_search(request):
@@ -21,15 +25,12 @@ def candidate_search(request):
         messages.error(request, 'Access denied.')
         return redirect('home.index')
 
-    # Update all saved searches with new matches
-    total_new_candidate_matches = update_saved_searches_with_new_matches(request.user.profile)
-
-    form = CandidateSearchForm(request.GET or None)
+    form = CandidateSearchForm(request.GET or None, recruiter=request.user)
     results = JobSeekerProfile.objects.filter(profile_visibility='public')
     
     # Get recommended candidates for this recruiter
     recommended_candidates = []
-    is_searching = bool(request.GET and any(request.GET.get(field) for field in ['search_input', 'skills', 'location', 'projects']))
+    is_searching = bool(request.GET and any(request.GET.get(field) for field in ['search_input', 'skills', 'location', 'projects', 'radius']))
     
     if not is_searching:
         # Only show recommendations when not actively searching
@@ -51,12 +52,15 @@ def candidate_search(request):
         ).first()
 
         if existing_search:
-            total_new_candidate_matches -= existing_search.new_matches_count
-            existing_search.new_matches_count = 0
-            existing_search.save(update_fields=["new_matches_count"])
+            mark_saved_search_seen(existing_search)
 
-        results = perform_candidate_search(search_input, skills_str, location, projects)
+        results = _get_search_results(form)
+    elif is_searching:
+        # Don't list everyone next to the form's errors
+        results = JobSeekerProfile.objects.none()
 
+    # Kept current as profiles change, see candidates.signals
+    total_new_candidate_matches = get_request_notification_counts(request)['new_candidate_matches']
     if total_new_candidate_matches > 0:
         saved_url = reverse('candidates.saved_candidate_searches')
         messages.info(request, mark_safe(
@@ -69,13 +73,17 @@ def candidate_search(request):
         save_candidate_search(request, request.user.profile)
 
     results_qs = results.select_related('user_profile__user')
-    results_list = list(results_qs)
-    location_clusters = build_location_clusters(results_list)
+    if not results_qs.ordered:
+        results_qs = results_qs.order_by('id')
+    location_clusters = build_location_clusters(results)
+
+    page_obj = Paginator(results_qs, 50).get_page(request.GET.get('page'))
 
     template_data = {
         'title': 'Find Talent',
         'form': form,
-        'results': results_list[:50],
+        'results': page_obj,
+        'page_obj': page_obj,
         'recommended_candidates': recommended_candidates,
         'is_searching': is_searching,
         'location_clusters': location_clusters,
@@ -83,6 +91,42 @@ def candidate_search(request):
 
     return render(request, 'candidates/candidate_search.html', {'template_data': template_data})
 
+def _get_search_results(form):
+    """Return the public profiles matching a validated CandidateSearchForm."""
+    return perform_candidate_search(
+        form.cleaned_data.get('search_input'),
+        form.cleaned_data.get('skills'),
+        form.cleaned_data.get('location'),
+        form.cleaned_data.get('projects'),
+        center=form.cleaned_data.get('center'),
+        radius=form.cleaned_data.get('radius'),
+    )
+
+@login_required
+def cluster_members(request):
+    """Return one page of the candidates in a map cluster for the current search as JSON."""
+    if not request.user.profile.is_recruiter:
+        return JsonResponse({'error': 'Only recruiters can view candidate clusters.'}, status=403)
+
+    cluster = request.GET.get('cluster', '')
+    if not cluster.strip():
+        return JsonResponse({'error': 'Missing cluster.'}, status=400)
+
+    form = CandidateSearchForm(request.GET, recruiter=request.user)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid search.', 'errors': form.errors}, status=400)
+    results = _get_search_results(form)
+
+    page_obj = Paginator(get_cluster_members(results, cluster), 20).get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'cluster': cluster,
+        'count': page_obj.paginator.count,
+        'page': page_obj.number,
+        'has_next': page_obj.has_next(),
+        'candidates': [serialize_cluster_member(profile) for profile in page_obj],
+    })
+
 @login_required
 def saved_candidate_searches(request):
     if not request.user.profile.is_recruiter:
@@ -93,9 +137,6 @@ def saved_candidate_searches(request):
         recruiter=request.user.profile
     ).order_by('-created_at')
 
-    # Update all searches with new matches
-    update_saved_searches_with_new_matches(request.user.profile)
-
     template_data = {
         'title': 'Saved Candidate Searches',
         'saved_searches': saved_searches,
@@ -117,4 +158,10 @@ def delete_saved_search(request, search_id):
     else:
         messages.error(request, 'Invalid request method.')
     
-    return redirect('candidates.saved_candidate_searches')
\ No newline at end of file
+    return redirect('candidates.saved_candidate_searches')
+
+@login_required
+def geocoder_metrics(request):
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Administrator privileges required.'}, status=403)
+    return JsonResponse(get_breaker_metrics())
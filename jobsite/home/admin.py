@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from home.models import DataExport
+
+
+@admin.register(DataExport)
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ('dataset', 'mode', 'status', 'rows_written', 'created_at', 'finished_at', 'requested_by')
+    list_filter = ('status', 'dataset', 'mode')
+    readonly_fields = (
+        'snapshot_at', 'changed_since', 'total_rows', 'rows_written', 'file_size', 'started_at', 'finished_at',
+    )
@@ -0,0 +1,193 @@
+"""
+Background data exports.
+
+The admin dashboard queues a `DataExport` and the `run_data_exports` worker
+claims it, streams the rows into a temporary file and saves that to the
+export store (``DATA_EXPORT_ROOT``), so no export is generated inside a web
+request. Progress is written back to the row every chunk, and finished
+exports stay listed on the dashboard with a download link.
+
+Incremental exports contain only rows created or changed since the snapshot
+of the previous finished export of the same dataset and format, so a
+sequence of them forms a gapless change feed.
+
+CSV exports are the human-readable reports; NDJSON, Parquet and Arrow
+exports carry typed columns for analytics (see `home.typed_exports`).
+"""
+import logging
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_QUERYSETS, EXPORTS, stream_csv, stream_zip
+from .models import DataExport
+from .typed_exports import (
+    FILE_EXTENSIONS, TABLES, available_formats, changed_messages, stream_typed, typed_batches,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_LAG = 60  # seconds
+DEFAULT_STALE_AFTER = 6 * 60 * 60  # seconds
+
+# The rows each table export would write, for counting them up front
+ROW_QUERYSETS = {**EXPORT_QUERYSETS, 'messages': changed_messages}
+
+
+def export_formats():
+    """The export formats this installation can write; Parquet and Arrow need pyarrow."""
+    return ('csv', *available_formats())
+
+
+def export_tables(dataset, file_format):
+    """The tables an export of ``dataset`` in ``file_format`` contains."""
+    tables = list(EXPORTS) if file_format == 'csv' else list(TABLES)
+    return tables if dataset == 'all' else [dataset]
+
+
+def queue_export(dataset, mode='full', requested_by=None, file_format='csv'):
+    """Queue an export of ``dataset`` ('all' or a single table) for the worker."""
+    if dataset not in dict(DataExport.DATASET_CHOICES):
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    if mode not in dict(DataExport.MODE_CHOICES):
+        raise ValueError(f"Unknown export mode: {mode}")
+    if file_format not in export_formats():
+        raise ValueError(f"Unsupported export format: {file_format}")
+    if file_format == 'csv' and dataset != 'all' and dataset not in EXPORTS:
+        raise ValueError(f"{dataset.title()} can only be exported as NDJSON, Parquet or Arrow")
+    return DataExport.objects.create(dataset=dataset, mode=mode, format=file_format, requested_by=requested_by)
+
+
+def claim_next_export():
+    """Mark the oldest queued export as running and return it, or None if the queue is empty."""
+    while True:
+        export = DataExport.objects.filter(status='queued').order_by('created_at', 'pk').first()
+        if export is None:
+            return None
+        now = timezone.now()
+        # Another worker may claim the same row between the read and the update
+        if DataExport.objects.filter(pk=export.pk, status='queued').update(status='running', started_at=now):
+            export.status = 'running'
+            export.started_at = now
+            return export
+
+
+def _previous_snapshot(export):
+    return (
+        DataExport.objects.filter(
+            dataset=export.dataset, format=export.format, status='finished', snapshot_at__isnull=False
+        )
+        .exclude(pk=export.pk)
+        .order_by('-snapshot_at')
+        .values_list('snapshot_at', flat=True)
+        .first()
+    )
+
+
+class _Progress:
+    """Counts rows as they are written and saves the count on the export every chunk."""
+
+    def __init__(self, export):
+        self.export = export
+        self.written = 0
+
+    def track(self, rows):
+        rows = iter(rows)
+        yield next(rows)  # header
+        for row in rows:
+            yield row
+            self.written += 1
+            if self.written % EXPORT_CHUNK_SIZE == 0:
+                self.save()
+
+    def track_batches(self, batches):
+        for batch in batches:
+            yield batch
+            self.written += len(batch)
+            self.save()
+
+    def save(self):
+        DataExport.objects.filter(pk=self.export.pk).update(rows_written=self.written)
+
+
+def run_export(export):
+    """Write a claimed export to the export store and record the outcome on it."""
+    # Rows saved just before the snapshot may not be committed yet; leaving
+    # them to the next export keeps consecutive deltas from skipping them
+    lag = getattr(settings, 'DATA_EXPORT_SNAPSHOT_LAG', DEFAULT_SNAPSHOT_LAG)
+    export.snapshot_at = timezone.now() - timedelta(seconds=lag)
+    export.changed_since = _previous_snapshot(export) if export.mode == 'incremental' else None
+    until = export.snapshot_at if export.changed_since else None
+
+    names = export_tables(export.dataset, export.format)
+    stamp = export.snapshot_at.strftime('%Y-%m-%d_%H%M%S')
+    label = 'all_data' if export.dataset == 'all' else export.dataset
+    if export.mode == 'incremental':
+        label += '_changes'
+    extension = '.csv' if export.format == 'csv' else FILE_EXTENSIONS[export.format]
+    progress = _Progress(export)
+
+    def table_blocks(name):
+        if export.format == 'csv':
+            return stream_csv(progress.track(EXPORTS[name](export.changed_since, until)))
+        batches = progress.track_batches(typed_batches(name, export.changed_since, until))
+        return stream_typed(name, export.format, batches)
+
+    try:
+        export.total_rows = sum(ROW_QUERYSETS[name](export.changed_since, until).count() for name in names)
+        export.save(update_fields=['snapshot_at', 'changed_since', 'total_rows'])
+
+        with tempfile.TemporaryFile() as output:
+            if export.dataset == 'all':
+                # Gzip and Parquet members are compressed already
+                compression = zipfile.ZIP_STORED if export.format in ('ndjson', 'parquet') else zipfile.ZIP_DEFLATED
+                members = ((f"jobsite_{name}_{stamp}{extension}", table_blocks(name)) for name in names)
+                blocks = stream_zip(members, compression)
+                filename = f"jobsite_{label}_{stamp}.zip"
+            else:
+                blocks = table_blocks(export.dataset)
+                filename = f"jobsite_{label}_{stamp}{extension}"
+            for block in blocks:
+                output.write(block)
+            output.seek(0)
+            export.file.save(filename, File(output), save=False)
+    except Exception as exc:
+        logger.exception("Data export %s failed", export.pk)
+        export.status = 'failed'
+        export.error = str(exc) or exc.__class__.__name__
+    else:
+        export.status = 'finished'
+        export.file_size = export.file.size
+    export.rows_written = progress.written
+    export.finished_at = timezone.now()
+    export.save(update_fields=[
+        'snapshot_at', 'changed_since', 'total_rows', 'status', 'error', 'file', 'file_size',
+        'rows_written', 'finished_at',
+    ])
+    return export
+
+
+def fail_stale_exports(stale_after=None):
+    """Mark exports whose worker died mid-run as failed, so they don't show as running forever."""
+    if stale_after is None:
+        stale_after = getattr(settings, 'DATA_EXPORT_STALE_AFTER', DEFAULT_STALE_AFTER)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return DataExport.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='failed', error="The export worker stopped before the export finished.", finished_at=timezone.now()
+    )
+
+
+def process_export_queue(limit=None):
+    """Run queued exports oldest first, at most ``limit`` of them, and count the outcomes."""
+    stats = {'finished': 0, 'failed': 0, 'abandoned': fail_stale_exports()}
+    while limit is None or stats['finished'] + stats['failed'] < limit:
+        export = claim_next_export()
+        if export is None:
+            break
+        run_export(export)
+        stats[export.status] += 1
+    return stats
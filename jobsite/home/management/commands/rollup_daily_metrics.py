@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from home.rollups import rebuild_daily_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily metric rollups from jobs, applications, signups and messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Only rebuild the last N days (by default every day is rebuilt)")
+        parser.add_argument("--since", default=None,
+                            help="Only rebuild from this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        start = None
+        if options["since"]:
+            try:
+                start = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a date like 2024-01-31")
+        elif options["days"]:
+            start = timezone.localdate() - timedelta(days=options["days"] - 1)
+
+        total = rebuild_daily_metrics(start)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} daily metric row(s)."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.export_queue import process_export_queue
+
+
+class Command(BaseCommand):
+    help = "Run data exports queued from the admin dashboard and write them to the export store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Maximum number of exports to run per pass")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the queue instead of exiting once it is drained")
+        parser.add_argument('--idle-sleep', type=float, default=10.0,
+                            help="Seconds to wait between polls when --loop is set and the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = process_export_queue(limit=options['limit'])
+            processed = stats['finished'] + stats['failed']
+            if processed:
+                self.stdout.write(f"Finished {stats['finished']} exports, {stats['failed']} failed.")
+            if stats['abandoned']:
+                self.stdout.write(self.style.WARNING(
+                    f"Marked {stats['abandoned']} exports whose worker stopped as failed."
+                ))
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS("Export queue processed."))
+                return
+            if not processed:
+                time.sleep(options['idle_sleep'])
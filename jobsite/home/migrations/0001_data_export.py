@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:32
+
+import django.db.models.deletion
+import home.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(choices=[('all', 'All data'), ('users', 'Users'), ('jobs', 'Jobs'), ('applications', 'Applications')], max_length=20)),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('incremental', 'Changed since last export')], default='full', max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('changed_since', models.DateTimeField(blank=True, help_text='Rows changed after this time are included; empty for full exports', null=True)),
+                ('snapshot_at', models.DateTimeField(blank=True, help_text='Rows changed up to this time are included', null=True)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, storage=home.models.get_export_storage, upload_to='')),
+                ('file_size', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='data_exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='home_export_status_idx'), models.Index(fields=['dataset', 'status', 'snapshot_at'], name='home_export_latest_idx')],
+            },
+        ),
+    ]
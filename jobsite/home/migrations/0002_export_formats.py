@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_data_export'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataexport',
+            name='format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON (gzip)'), ('parquet', 'Parquet'), ('arrow', 'Arrow')], default='csv', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='dataexport',
+            name='dataset',
+            field=models.CharField(choices=[('all', 'All data'), ('users', 'Users'), ('jobs', 'Jobs'), ('applications', 'Applications'), ('messages', 'Messages')], max_length=20),
+        ),
+    ]
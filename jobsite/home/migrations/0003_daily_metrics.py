@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:44
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_metrics(apps, schema_editor):
+    """Roll up the existing jobs, signups, messages and applications per day"""
+    DailyMetric = apps.get_model('home', 'DailyMetric')
+    Job = apps.get_model('jobs', 'Job')
+    Application = apps.get_model('jobs', 'Application')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Message = apps.get_model('messaging', 'Message')
+
+    def grouped(queryset, time_field, dimension=None):
+        fields = ['day'] if dimension is None else ['day', dimension]
+        rows = queryset.annotate(day=TruncDate(time_field)).values(*fields).annotate(total=Count('pk')).order_by()
+        return [(row['day'], (row[dimension] or '') if dimension else '', row['total']) for row in rows]
+
+    sources = [
+        ('jobs_posted', grouped(Job.objects.all(), 'created_at')),
+        ('signups', grouped(UserProfile.objects.all(), 'user__date_joined', 'user_type')),
+        ('messages_sent', grouped(Message.objects.all(), 'timestamp')),
+        ('applications', [(day, 'applied', total) for day, _, total in grouped(Application.objects.all(), 'applied_at')]),
+        ('applications', grouped(
+            Application.objects.exclude(status='applied'), Coalesce('reviewed_at', 'updated_at'), 'status'
+        )),
+    ]
+    totals = {}
+    for metric, rows in sources:
+        for day, dimension, total in rows:
+            key = (metric, dimension, day)
+            totals[key] = totals.get(key, 0) + total
+
+    DailyMetric.objects.bulk_create(
+        [
+            DailyMetric(metric=metric, dimension=dimension, date=day, value=total)
+            for (metric, dimension, day), total in totals.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_export_formats'),
+        ('accounts', '0006_notification_counter'),
+        ('jobs', '0009_application_updated_at'),
+        ('messaging', '0008_message_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('metric', models.CharField(choices=[('jobs_posted', 'Jobs posted'), ('applications', 'Applications by status'), ('signups', 'Signups by user type'), ('messages_sent', 'Messages sent')], max_length=30)),
+                ('dimension', models.CharField(blank=True, default='', max_length=30)),
+                ('value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'metric', 'dimension'],
+                'indexes': [models.Index(fields=['date'], name='home_dailymetric_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('metric', 'date', 'dimension'), name='home_dailymetric_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_metrics, migrations.RunPython.noop),
+    ]
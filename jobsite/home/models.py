@@ -1,3 +1,138 @@
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 
-# Create your models here.
+
+class ExportStorage(FileSystemStorage):
+    """
+    File store for finished data exports, outside the public media tree.
+
+    The directory is read from DATA_EXPORT_ROOT on every access rather than
+    when the model class is defined, so settings overrides take effect.
+    """
+
+    @property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, getattr(settings, 'DATA_EXPORT_ROOT', os.path.join(settings.BASE_DIR, 'exports'))
+        )
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def get_export_storage():
+    return ExportStorage()
+
+
+class DataExport(models.Model):
+    """An admin data export, produced in the background by the `run_data_exports` worker."""
+
+    DATASET_CHOICES = [
+        ('all', 'All data'),
+        ('users', 'Users'),
+        ('jobs', 'Jobs'),
+        ('applications', 'Applications'),
+        ('messages', 'Messages'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON (gzip)'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow'),
+    ]
+
+    MODE_CHOICES = [
+        ('full', 'Full'),
+        ('incremental', 'Changed since last export'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+
+    dataset = models.CharField(max_length=20, choices=DATASET_CHOICES)
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full')
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES, default='csv')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    changed_since = models.DateTimeField(
+        null=True, blank=True, help_text="Rows changed after this time are included; empty for full exports"
+    )
+    snapshot_at = models.DateTimeField(
+        null=True, blank=True, help_text="Rows changed up to this time are included"
+    )
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(storage=get_export_storage, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='data_exports'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='home_export_status_idx'),
+            models.Index(fields=['dataset', 'status', 'snapshot_at'], name='home_export_latest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dataset_display()} {self.get_format_display()} export ({self.get_mode_display()}, {self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def filename(self):
+        return os.path.basename(self.file.name) if self.file else ''
+
+    @property
+    def progress_percent(self):
+        if self.status == 'finished':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.rows_written * 100 // self.total_rows)
+
+
+class DailyMetric(models.Model):
+    """One day's count of a site event, for the admin metrics page (see `home.rollups`)."""
+
+    METRIC_CHOICES = [
+        ('jobs_posted', 'Jobs posted'),
+        ('applications', 'Applications by status'),
+        ('signups', 'Signups by user type'),
+        ('messages_sent', 'Messages sent'),
+    ]
+
+    date = models.DateField()
+    metric = models.CharField(max_length=30, choices=METRIC_CHOICES)
+    # The application status or user type counted, blank for metrics without one
+    dimension = models.CharField(max_length=30, blank=True, default='')
+    value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'metric', 'dimension']
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'date', 'dimension'], name='home_dailymetric_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='home_dailymetric_date_idx'),
+        ]
+
+    def __str__(self):
+        label = f"{self.get_metric_display()} ({self.dimension})" if self.dimension else self.get_metric_display()
+        return f"{self.date}: {label} = {self.value}"
@@ -0,0 +1,133 @@
+"""
+Daily rollups behind the admin metrics page.
+
+`DailyMetric` holds one count per day, metric and dimension (an application
+status or a user type). Signals and the messaging services add to today's
+row as events happen with a single upsert, so the metrics page reads a few
+hundred small rows instead of grouping the source tables.
+
+`rebuild_daily_metrics` recomputes a date range from the source tables, to
+backfill history or repair rows after writes that skipped the hooks. Since
+it can only see what is still there, rebuilt days no longer count deleted
+jobs, applications or messages.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyMetric
+
+REBUILD_BATCH_SIZE = 500
+
+
+def record(metric, dimension='', amount=1, day=None):
+    """Add ``amount`` to the ``metric``/``dimension`` count of ``day`` (today by default)."""
+    if metric not in dict(DailyMetric.METRIC_CHOICES):
+        raise ValueError(f"Unknown daily metric: {metric}")
+    if not amount:
+        return
+    day = day or timezone.localdate()
+    table = connection.ops.quote_name(DailyMetric._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (date, metric, dimension, value) VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT (metric, date, dimension) DO UPDATE SET value = {table}.value + excluded.value",
+            [connection.ops.adapt_datefield_value(day), metric, dimension, amount],
+        )
+
+
+def event_day(timestamp):
+    """The local date an event timestamp falls on."""
+    return timezone.localdate(timestamp) if timestamp else timezone.localdate()
+
+
+def _daily_counts(start, end):
+    """Yield ``(metric, dimension, date, count)`` for the days up to ``end`` (and from ``start``, if given)."""
+    from accounts.models import UserProfile
+    from jobs.models import ApplicationStatusEvent, Job
+    from messaging.models import Message
+
+    def grouped(queryset, time_field, dimension=None):
+        day = TruncDate(time_field)
+        queryset = queryset.annotate(day=day).filter(day__lte=end)
+        if start is not None:
+            queryset = queryset.filter(day__gte=start)
+        fields = ['day'] if dimension is None else ['day', dimension]
+        for row in queryset.values(*fields).annotate(total=Count('pk')).order_by():
+            yield row['day'], (row[dimension] or '') if dimension else '', row['total']
+
+    for day, dimension, total in grouped(Job.objects.all(), 'created_at'):
+        yield 'jobs_posted', dimension, day, total
+    for day, dimension, total in grouped(UserProfile.objects.all(), 'user__date_joined', 'user_type'):
+        yield 'signups', dimension, day, total
+    for day, dimension, total in grouped(Message.objects.all(), 'timestamp'):
+        yield 'messages_sent', dimension, day, total
+    # New applications and every later move are in the status event log
+    for day, dimension, total in grouped(ApplicationStatusEvent.objects.all(), 'created_at', 'to_status'):
+        yield 'applications', dimension, day, total
+
+
+def rebuild_daily_metrics(start=None, end=None):
+    """
+    Recompute the rollups for the days ``start`` to ``end`` (inclusive) from the source tables.
+
+    Without ``start`` every day up to ``end`` is rebuilt, and ``end``
+    defaults to today. Returns the number of rows written.
+    """
+    end = end or timezone.localdate()
+    totals = {}
+    for metric, dimension, day, total in _daily_counts(start, end):
+        key = (metric, dimension, day)
+        totals[key] = totals.get(key, 0) + total
+
+    with transaction.atomic():
+        stale = DailyMetric.objects.filter(date__lte=end)
+        if start is not None:
+            stale = stale.filter(date__gte=start)
+        stale.delete()
+        DailyMetric.objects.bulk_create(
+            [
+                DailyMetric(metric=metric, dimension=dimension, date=day, value=total)
+                for (metric, dimension, day), total in totals.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return len(totals)
+
+
+def get_daily_series(days):
+    """
+    Return the last ``days`` days of every metric as chart series.
+
+    The result has ``labels`` (ISO dates, oldest first), and ``metrics``
+    mapping each metric to ``{dimension: [count per day]}`` with missing
+    days as zero, plus ``totals`` per metric over the whole period (for
+    applications, the number received).
+    """
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    positions = {day: index for index, day in enumerate(dates)}
+
+    metrics = {metric: {} for metric, _ in DailyMetric.METRIC_CHOICES}
+    totals = dict.fromkeys(metrics, 0)
+    rows = DailyMetric.objects.filter(date__gte=start, date__lte=end).order_by().values_list(
+        'metric', 'dimension', 'date', 'value'
+    )
+    for metric, dimension, day, value in rows:
+        if metric not in metrics:
+            continue
+        series = metrics[metric].setdefault(dimension, [0] * days)
+        series[positions[day]] += value
+        # An application counts once as received, however often it moved on
+        if metric != 'applications' or dimension == 'applied':
+            totals[metric] += value
+
+    return {
+        'labels': [day.isoformat() for day in dates],
+        'metrics': metrics,
+        'totals': totals,
+    }
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from jobs.models import Application, Job
+
+from . import rollups
+
+
+@receiver(post_save, sender=Job)
+def count_job_posted(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record('jobs_posted', day=rollups.event_day(instance.created_at))
+
+
+@receiver(post_save, sender=UserProfile)
+def count_signup(sender, instance, created, raw=False, **kwargs):
+    """Signups are counted once the user has picked a type, when their profile is created"""
+    if created and not raw:
+        rollups.record('signups', instance.user_type)
+
+
+@receiver(post_save, sender=Application)
+def count_application_status(sender, instance, created, raw=False, **kwargs):
+    """Count new applications, and applications moving into each status, on the day it happens"""
+    if raw:
+        return
+    if created:
+        rollups.record('applications', instance.status, day=rollups.event_day(instance.applied_at))
+    elif getattr(instance, '_previous_status', None) not in (None, instance.status):
+        rollups.record('applications', instance.status)
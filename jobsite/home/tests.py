@@ -1,3 +1,330 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from home.export_queue import process_export_queue, queue_export
+from home.exports import stream_zip
+from home.models import DailyMetric, DataExport
+from home.rollups import rebuild_daily_metrics
+from home.typed_exports import pyarrow
+from jobs.models import Application, Job
+from messaging.services import send_bulk_messages, send_message
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="pass1234")
+        self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+        self.seekers = [User.objects.create_user(username=f"seeker{number}", password="pass1234") for number in range(3)]
+        self.jobs = [
+            Job.objects.create(
+                title=f"Engineer {number}", company="Acme", location="Atlanta, GA",
+                description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+            )
+            for number in range(3)
+        ]
+        for seeker in self.seekers:
+            Application.objects.create(job=self.jobs[0], applicant=seeker, cover_note="Hi")
+        Application.objects.create(job=self.jobs[1], applicant=self.seekers[0], cover_note="Hi")
+        self.client.login(username="admin", password="pass1234")
+
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+
+    def test_jobs_csv_streams_with_annotated_counts(self):
+        response = self.client.get(reverse('home.export_jobs_csv'))
+        # One query for all the jobs and their application counts
+        with self.assertNumQueries(1):
+            rows = self.read_csv(response)
+
+        self.assertEqual(rows[0], ['Title', 'Company', 'Posted By', 'Created At', 'Status', 'Applications'])
+        self.assertEqual([(row[0], row[5]) for row in rows[1:]], [("Engineer 0", "3"), ("Engineer 1", "1"), ("Engineer 2", "0")])
+
+    def test_all_data_zip_streams_every_csv(self):
+        response = self.client.get(reverse('home.export_all_data'))
+        self.assertTrue(response.streaming)
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        names = archive.namelist()
+        self.assertEqual([name.split("_")[1] for name in names], ["users", "jobs", "applications"])
+        applications = list(csv.reader(io.StringIO(archive.read(names[2]).decode("utf-8"))))
+        self.assertEqual(len(applications), 1 + 4)
+        users = list(csv.reader(io.StringIO(archive.read(names[0]).decode("utf-8"))))
+        recruiter = next(row for row in users if row[0] == "recruiter")
+        self.assertEqual(recruiter[3:], ["Recruiter", "True"])
+
+    def test_stream_zip_handles_large_members(self):
+        chunk = bytes(range(256)) * 512
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([("big.bin", [chunk] * 40)]))))
+        self.assertEqual(archive.read("big.bin"), chunk * 40)
+
+    def test_exports_require_superuser(self):
+        self.client.login(username="recruiter", password="pass1234")
+        self.assertEqual(self.client.get(reverse('home.export_all_data')).status_code, 401)
+
+
+class DataExportTests(TestCase):
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        settings_override = override_settings(DATA_EXPORT_ROOT=self.export_root, DATA_EXPORT_SNAPSHOT_LAG=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser(username="admin", password="pass1234")
+        self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+        self.seekers = [User.objects.create_user(username=f"seeker{number}", password="pass1234") for number in range(2)]
+        self.job = Job.objects.create(
+            title="Engineer", company="Acme", location="Atlanta, GA",
+            description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+        )
+        self.applications = [
+            Application.objects.create(job=self.job, applicant=seeker, cover_note="Hi") for seeker in self.seekers
+        ]
+        self.client.login(username="admin", password="pass1234")
+
+    def backdate_everything(self):
+        earlier = timezone.now() - timedelta(hours=1)
+        User.objects.update(date_joined=earlier)
+        UserProfile.objects.update(updated_at=earlier)
+        Job.objects.update(updated_at=earlier)
+        Application.objects.update(updated_at=earlier)
+
+    def read_export(self, export):
+        with export.file.open('rb') as file:
+            return list(csv.reader(io.StringIO(file.read().decode("utf-8"))))
+
+    def test_dashboard_queues_exports_for_the_worker(self):
+        response = self.client.post(reverse('home.queue_data_export'), {'dataset': 'all', 'mode': 'full'})
+        self.assertRedirects(response, reverse('home.admin_dashboard'))
+        export = DataExport.objects.get()
+        self.assertEqual((export.status, export.requested_by), ('queued', self.admin))
+        self.assertFalse(export.file)
+
+        self.assertEqual(process_export_queue(), {'finished': 1, 'failed': 0, 'abandoned': 0})
+        export.refresh_from_db()
+        self.assertEqual(export.status, 'finished')
+        self.assertEqual((export.total_rows, export.rows_written), (4 + 1 + 2, 4 + 1 + 2))
+        self.assertTrue(export.filename.startswith("jobsite_all_data_"))
+        self.assertTrue(export.file.path.startswith(os.path.join(self.export_root, "")))
+        self.assertTrue(os.path.exists(export.file.path))
+
+        response = self.client.get(reverse('home.admin_dashboard'))
+        self.assertContains(response, reverse('home.download_data_export', args=[export.id]))
+        response = self.client.get(reverse('home.download_data_export', args=[export.id]))
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual([name.split("_")[1] for name in archive.namelist()], ["users", "jobs", "applications"])
+
+        self.client.login(username="recruiter", password="pass1234")
+        response = self.client.get(reverse('home.download_data_export', args=[export.id]))
+        self.assertEqual(response.status_code, 401)
+
+    def test_incremental_exports_contain_only_changes_since_the_last_one(self):
+        self.backdate_everything()
+        first = queue_export('applications', 'incremental')
+        process_export_queue()
+        first.refresh_from_db()
+        # Nothing was exported before, so the first delta has every row
+        self.assertIsNone(first.changed_since)
+        self.assertEqual(len(self.read_export(first)), 1 + 2)
+
+        application = self.applications[1]
+        application.status = 'review'
+        application.save()
+        second = queue_export('applications', 'incremental')
+        process_export_queue()
+        second.refresh_from_db()
+        self.assertEqual(second.changed_since, first.snapshot_at)
+        rows = self.read_export(second)
+        self.assertEqual([(row[0], row[3]) for row in rows[1:]], [("seeker1", "Under Review")])
+
+        third = queue_export('applications', 'incremental')
+        process_export_queue()
+        third.refresh_from_db()
+        self.assertEqual((third.status, third.rows_written), ('finished', 0))
+        self.assertEqual(len(self.read_export(third)), 1)
+
+    def test_incremental_job_exports_carry_application_counter_changes(self):
+        self.backdate_everything()
+        first = queue_export('jobs', 'incremental')
+        process_export_queue()
+        first.refresh_from_db()
+        self.assertEqual([row[5] for row in self.read_export(first)[1:]], ["2"])
+
+        newcomer = User.objects.create_user(username="newcomer", password="pass1234")
+        Application.objects.create(job=self.job, applicant=newcomer, cover_note="Hi")
+        second = queue_export('jobs', 'incremental')
+        process_export_queue()
+        second.refresh_from_db()
+        # Only the job's counters changed, and the delta still has its new count
+        self.assertEqual([(row[0], row[5]) for row in self.read_export(second)[1:]], [("Engineer", "3")])
+
+    def test_worker_fails_exports_abandoned_mid_run(self):
+        export = queue_export('jobs')
+        DataExport.objects.filter(pk=export.pk).update(
+            status='running', started_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(process_export_queue()['abandoned'], 1)
+        export.refresh_from_db()
+        self.assertEqual(export.status, 'failed')
+        self.assertTrue(export.error)
+
+
+class TypedExportTests(TestCase):
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        settings_override = override_settings(DATA_EXPORT_ROOT=self.export_root, DATA_EXPORT_SNAPSHOT_LAG=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+        self.seeker = User.objects.create_user(username="seeker", password="pass1234")
+        self.job = Job.objects.create(
+            title="Engineer", company="Acme", location="Atlanta, GA", salary_min="85000.50",
+            description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+        )
+        Application.objects.create(job=self.job, applicant=self.seeker, cover_note="Hi")
+        send_message(self.recruiter, self.seeker, "Interview", "Are you free Monday?")
+
+    def run_export(self, dataset, file_format, mode='full'):
+        export = queue_export(dataset, mode, file_format=file_format)
+        process_export_queue()
+        export.refresh_from_db()
+        self.assertEqual(export.status, 'finished', export.error)
+        self.assertTrue(export.file.path.startswith(os.path.join(self.export_root, "")))
+        with export.file.open('rb') as file:
+            return export, file.read()
+
+    def test_ndjson_export_keeps_column_types(self):
+        export, data = self.run_export('jobs', 'ndjson')
+        self.assertTrue(export.filename.endswith(".ndjson.gz"))
+        [job] = [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines()]
+        self.assertEqual(job["salary_min"], 85000.5)
+        self.assertIsNone(job["salary_max"])
+        self.assertIs(job["is_active"], True)
+        self.assertEqual((job["posted_by_id"], job["application_count"]), (self.recruiter.id, 1))
+        self.assertTrue(job["created_at"].startswith(str(self.job.created_at.year)))
+
+    def test_all_data_ndjson_includes_messages_without_bodies(self):
+        export, data = self.run_export('all', 'ndjson')
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        names = archive.namelist()
+        self.assertEqual([name.split("_")[1] for name in names], ["users", "jobs", "applications", "messages"])
+        [message] = [json.loads(line) for line in gzip.decompress(archive.read(names[3])).splitlines()]
+        self.assertEqual(message["body_length"], len("Are you free Monday?"))
+        self.assertNotIn("body", message)
+        self.assertEqual(export.rows_written, 2 + 1 + 1 + 1)
+
+    def test_messages_are_not_offered_as_csv(self):
+        with self.assertRaises(ValueError):
+            queue_export('messages', file_format='csv')
+        if pyarrow is None:
+            with self.assertRaises(ValueError):
+                queue_export('jobs', file_format='parquet')
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_and_arrow_exports(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        _, data = self.run_export('applications', 'parquet')
+        table = pyarrow.parquet.read_table(io.BytesIO(data))
+        self.assertEqual(table.column("job_id").to_pylist(), [self.job.id])
+        self.assertEqual(str(table.schema.field("applied_at").type), "timestamp[us, tz=UTC]")
+
+        _, data = self.run_export('messages', 'arrow')
+        table = pyarrow.ipc.open_file(io.BytesIO(data)).read_all()
+        self.assertEqual(table.column("sender_id").to_pylist(), [self.recruiter.id])
+
+
+class DailyMetricTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="pass1234")
+        self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+        self.seekers = []
+        for number in range(2):
+            seeker = User.objects.create_user(username=f"seeker{number}", password="pass1234")
+            UserProfile.objects.create(user=seeker, user_type='job_seeker')
+            self.seekers.append(seeker)
+        self.job = Job.objects.create(
+            title="Engineer", company="Acme", location="Atlanta, GA",
+            description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+        )
+        self.applications = [
+            Application.objects.create(job=self.job, applicant=seeker, cover_note="Hi") for seeker in self.seekers
+        ]
+        application = self.applications[0]
+        application.status = 'review'
+        application.save()
+        # Saving without a status change isn't a move
+        application.save()
+        send_message(self.recruiter, self.seekers[0], "Interview", "Are you free Monday?")
+        send_bulk_messages(self.recruiter, self.seekers, "Hello", "We're hiring")
+
+    def today(self):
+        return {
+            (metric, dimension): value
+            for metric, dimension, value in DailyMetric.objects.filter(date=timezone.localdate())
+            .values_list('metric', 'dimension', 'value')
+        }
+
+    def test_events_are_counted_as_they_happen(self):
+        self.assertEqual(self.today(), {
+            ('signups', 'recruiter'): 1,
+            ('signups', 'job_seeker'): 2,
+            ('jobs_posted', ''): 1,
+            ('applications', 'applied'): 2,
+            ('applications', 'review'): 1,
+            ('messages_sent', ''): 3,
+        })
+
+    def test_rebuild_matches_live_counts(self):
+        live = self.today()
+        DailyMetric.objects.update(value=0)
+        Job.objects.update(created_at=timezone.now() - timedelta(days=3))
+
+        rebuild_daily_metrics()
+
+        moved = dict(live)
+        del moved[('jobs_posted', '')]
+        self.assertEqual(self.today(), moved)
+        self.assertEqual(
+            DailyMetric.objects.get(metric='jobs_posted').date, timezone.localdate() - timedelta(days=3)
+        )
+
+    def test_metrics_page_charts_rollups(self):
+        self.client.login(username="admin", password="pass1234")
+        # Session, user, the navbar's profile and counters, and one query for the rollup rows
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('home.admin_metrics'), {'days': 7})
+        charts = {chart['id']: chart for chart in response.context['template_data']['charts']}
+        self.assertEqual(charts['applications']['total'], 2)
+        self.assertEqual(
+            [dataset['label'] for dataset in charts['applications']['datasets']], ['Applied', 'Under Review']
+        )
+        self.assertEqual(charts['messages_sent']['datasets'][0]['data'][-1], 3)
+        self.assertEqual(len(response.context['template_data']['chart_data']['labels']), 7)
+
+        self.client.login(username="recruiter", password="pass1234")
+        self.assertRedirects(
+            self.client.get(reverse('home.admin_metrics')), reverse('home.index'), fetch_redirect_response=False
+        )
@@ -5,8 +5,11 @@ urlpatterns = [
     path('', views.index, name='home.index'),
     path('dashboard/', views.dashboard, name='home.dashboard'),
     path('admin-dashboard/', views.admin_dashboard, name='home.admin_dashboard'),
+    path('admin-dashboard/metrics/', views.admin_metrics, name='home.admin_metrics'),
     path('export/users/', views.export_users_csv, name='home.export_users_csv'),
     path('export/jobs/', views.export_jobs_csv, name='home.export_jobs_csv'),
     path('export/applications/', views.export_applications_csv, name='home.export_applications_csv'),
     path('export/all/', views.export_all_data, name='home.export_all_data'),
+    path('exports/queue/', views.queue_data_export, name='home.queue_data_export'),
+    path('exports/<int:export_id>/download/', views.download_data_export, name='home.download_data_export'),
 ]
\ No newline at end of file
@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Count, Sum
+from jobs.application_board import get_applicant_stats
 from jobs.models import Job, Application
 from jobs.recommendations import get_recommended_jobs
-from candidates.utils import update_saved_searches_with_new_matches
+from accounts.models import UserProfile
+from accounts.notifications import get_request_notification_counts
 
 def index(request):
     if request.user.is_authenticated:
@@ -43,16 +46,8 @@ def dashboard(request):
     
     if request.user.profile.is_job_seeker:
         """Job seeker dashboard"""
-        # Get application statistics
-        applications = Application.objects.filter(applicant=request.user)
-        application_stats = {
-            'total': applications.count(),
-            'applied': applications.filter(status='applied').count(),
-            'review': applications.filter(status='review').count(),
-            'interview': applications.filter(status='interview').count(),
-            'offer': applications.filter(status='offer').count(),
-            'closed': applications.filter(status='closed').count(),
-        }
+        # Application counts per status, in one query
+        application_stats = get_applicant_stats(request.user)
         
         template_data = {
             'title': 'Job Seeker Dashboard',
@@ -68,21 +63,21 @@ def dashboard(request):
     
     else:
         """Recruiter dashboard"""
-        # Get jobs posted by the recruiter
-        recruiter_jobs = Job.objects.filter(posted_by=request.user)
-        jobs_posted_count = recruiter_jobs.count()
-
-        # Get applications for jobs posted by the recruiter
-        new_applications_count = Application.objects.filter(job__in=recruiter_jobs, status='applied').count()
+        # Jobs posted and the applications they received, from the jobs' counter columns
+        job_totals = Job.objects.filter(posted_by=request.user).aggregate(
+            jobs_posted=Count('pk'), applications=Sum('application_count')
+        )
 
-        total_new_candidate_matches = update_saved_searches_with_new_matches(request.user.profile)
+        # New applications and saved search matches are counted as they happen
+        notification_counts = get_request_notification_counts(request)
         
         template_data = {
             'title': 'Recruiter Dashboard',
             'new_user': new_user,
-            'jobs_posted_count': jobs_posted_count,
-            'new_applications_count': new_applications_count,
-            'total_new_candidate_matches': total_new_candidate_matches,
+            'jobs_posted_count': job_totals['jobs_posted'],
+            'total_applications_count': job_totals['applications'] or 0,
+            'new_applications_count': notification_counts['new_applications'],
+            'total_new_candidate_matches': notification_counts['new_candidate_matches'],
         }
         
         return render(request, 'home/recruiter_dashboard.html', {'template_data': template_data})
@@ -90,105 +85,91 @@ def dashboard(request):
 def is_superuser(user):
     return user.is_superuser
 
+# Most recent exports listed on the admin dashboard
+EXPORT_HISTORY_SIZE = 20
+
 @login_required
 def admin_dashboard(request):
     if not request.user.is_superuser:
         messages.error(request, "Access denied. Administrator privileges required.")
         return redirect('home.index')
         
+    exports = list(DataExport.objects.select_related('requested_by')[:EXPORT_HISTORY_SIZE])
+    formats = dict(DataExport.FORMAT_CHOICES)
     template_data = {
         'title': 'Administrator Dashboard',
+        'export_formats': [(value, formats[value]) for value in export_formats()],
+        'exports': exports,
+        'has_active_exports': any(export.is_active for export in exports),
     }
     return render(request, 'home/admin_dashboard.html', {'template_data': template_data})
 
-import csv
-import zipfile
-import io
-from django.http import HttpResponse
-from django.contrib.auth.models import User
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 
-def _write_users_csv(writer):
-    writer.writerow(['Username', 'Email', 'Date Joined', 'User Type', 'Is Active'])
-    users = User.objects.select_related('profile').all()
-    for user in users:
-        user_type = 'Unknown'
-        if hasattr(user, 'profile'):
-            user_type = user.profile.get_user_type_display()
-        elif user.is_superuser:
-            user_type = 'Administrator'
-            
-        writer.writerow([
-            user.username,
-            user.email,
-            user.date_joined.strftime('%Y-%m-%d'),
-            user_type,
-            user.is_active
-        ])
-
-def _write_jobs_csv(writer):
-    writer.writerow(['Title', 'Company', 'Posted By', 'Created At', 'Status', 'Applications'])
-    jobs = Job.objects.select_related('posted_by').all()
-    for job in jobs:
-        writer.writerow([
-            job.title,
-            job.company,
-            job.posted_by.username,
-            job.created_at.strftime('%Y-%m-%d'),
-            'Active' if job.is_active else 'Inactive',
-            job.applications.count()
-        ])
-
-def _write_applications_csv(writer):
-    writer.writerow(['Applicant', 'Job Title', 'Company', 'Status', 'Applied At'])
-    applications = Application.objects.select_related('applicant', 'job').all()
-    for app in applications:
-        writer.writerow([
-            app.applicant.username,
-            app.job.title,
-            app.job.company,
-            app.get_status_display(),
-            app.applied_at.strftime('%Y-%m-%d')
-        ])
+from .export_queue import export_formats, queue_export
+from .rollups import get_daily_series
+from .exports import EXPORTS, stream_csv, stream_zip
+from .models import DailyMetric, DataExport
 
 @login_required
-def export_users_csv(request):
+@require_POST
+def queue_data_export(request):
     if not request.user.is_superuser:
         return HttpResponse("Unauthorized", status=401)
 
-    timestamp = timezone.now().strftime('%Y-%m-%d')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="jobsite_users_{timestamp}.csv"'
-
-    writer = csv.writer(response)
-    _write_users_csv(writer)
-    return response
+    dataset = request.POST.get('dataset')
+    mode = request.POST.get('mode', 'full')
+    file_format = request.POST.get('format', 'csv')
+    try:
+        export = queue_export(dataset, mode, requested_by=request.user, file_format=file_format)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(
+            request,
+            f"{export.get_dataset_display()} {export.get_format_display()} export queued. "
+            "It will be listed below when it is ready.",
+        )
+    return redirect('home.admin_dashboard')
 
 @login_required
-def export_jobs_csv(request):
+def download_data_export(request, export_id):
     if not request.user.is_superuser:
         return HttpResponse("Unauthorized", status=401)
 
-    timestamp = timezone.now().strftime('%Y-%m-%d')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="jobsite_jobs_{timestamp}.csv"'
+    export = get_object_or_404(DataExport, id=export_id, status='finished')
+    try:
+        file = export.file.open('rb')
+    except FileNotFoundError:
+        raise Http404("The export file is no longer in the export store.")
+    return FileResponse(file, as_attachment=True, filename=export.filename)
 
-    writer = csv.writer(response)
-    _write_jobs_csv(writer)
+def _stream_export_csv(name):
+    timestamp = timezone.now().strftime('%Y-%m-%d')
+    response = StreamingHttpResponse(stream_csv(EXPORTS[name]()), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="jobsite_{name}_{timestamp}.csv"'
     return response
 
 @login_required
-def export_applications_csv(request):
+def export_users_csv(request):
     if not request.user.is_superuser:
         return HttpResponse("Unauthorized", status=401)
+    return _stream_export_csv('users')
 
-    timestamp = timezone.now().strftime('%Y-%m-%d')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="jobsite_applications_{timestamp}.csv"'
+@login_required
+def export_jobs_csv(request):
+    if not request.user.is_superuser:
+        return HttpResponse("Unauthorized", status=401)
+    return _stream_export_csv('jobs')
 
-    writer = csv.writer(response)
-    _write_applications_csv(writer)
-    return response
+@login_required
+def export_applications_csv(request):
+    if not request.user.is_superuser:
+        return HttpResponse("Unauthorized", status=401)
+    return _stream_export_csv('applications')
 
 @login_required
 def export_all_data(request):
@@ -197,26 +178,57 @@ def export_all_data(request):
 
     timestamp = timezone.now().strftime('%Y-%m-%d')
     zip_filename = f"jobsite_all_data_{timestamp}.zip"
-    
-    # Create an in-memory ZIP file
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Users CSV
-        users_buffer = io.StringIO()
-        _write_users_csv(csv.writer(users_buffer))
-        zip_file.writestr(f"jobsite_users_{timestamp}.csv", users_buffer.getvalue())
-        
-        # Jobs CSV
-        jobs_buffer = io.StringIO()
-        _write_jobs_csv(csv.writer(jobs_buffer))
-        zip_file.writestr(f"jobsite_jobs_{timestamp}.csv", jobs_buffer.getvalue())
-        
-        # Applications CSV
-        apps_buffer = io.StringIO()
-        _write_applications_csv(csv.writer(apps_buffer))
-        zip_file.writestr(f"jobsite_applications_{timestamp}.csv", apps_buffer.getvalue())
 
-    # Prepare response
-    response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
+    # Each CSV is compressed into the archive while it streams to the client
+    members = (
+        (f"jobsite_{name}_{timestamp}.csv", stream_csv(rows()))
+        for name, rows in EXPORTS.items()
+    )
+    response = StreamingHttpResponse(stream_zip(members), content_type='application/zip')
     response['Content-Disposition'] = f'attachment; filename="{zip_filename}"'
-    return response
\ No newline at end of file
+    return response
+
+# Periods the metrics page can chart, in days
+METRICS_PERIODS = (7, 30, 90, 365)
+
+@login_required
+def admin_metrics(request):
+    if not request.user.is_superuser:
+        messages.error(request, "Access denied. Administrator privileges required.")
+        return redirect('home.index')
+
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in METRICS_PERIODS:
+        days = 30
+
+    series = get_daily_series(days)
+    # Chart application statuses in pipeline order and user types in their declared order
+    dimension_labels = {
+        'applications': dict(Application.APPLICATION_STATUS),
+        'signups': dict(UserProfile.USER_TYPES),
+    }
+    charts = []
+    for metric, title in DailyMetric.METRIC_CHOICES:
+        labels = dimension_labels.get(metric, {'': title})
+        by_dimension = series['metrics'][metric]
+        names = [name for name in labels if name in by_dimension] + sorted(set(by_dimension) - set(labels))
+        charts.append({
+            'id': metric,
+            'title': title,
+            'total': series['totals'][metric],
+            'datasets': [
+                {'label': labels.get(name, name or title), 'data': by_dimension[name]} for name in names
+            ],
+        })
+
+    template_data = {
+        'title': 'Site Metrics',
+        'days': days,
+        'periods': METRICS_PERIODS,
+        'charts': charts,
+        'chart_data': {'labels': series['labels'], 'charts': charts},
+    }
+    return render(request, 'home/admin_metrics.html', {'template_data': template_data})
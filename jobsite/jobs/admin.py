@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import Job, Application
+from .models import Job, Application, ApplicationStatusEvent
 
 @admin.register(Job)
 class JobAdmin(admin.ModelAdmin):
-    list_display = ('title', 'company', 'location', 'job_type', 'experience_level', 'posted_by', 'is_active', 'created_at')
+    list_display = ('title', 'company', 'location', 'job_type', 'experience_level', 'posted_by', 'is_active', 'application_count', 'created_at')
     list_filter = ('job_type', 'experience_level', 'is_active', 'created_at')
     search_fields = ('title', 'company', 'location', 'description')
     date_hierarchy = 'created_at'
@@ -24,3 +24,12 @@ class ApplicationAdmin(admin.ModelAdmin):
     def job_company(self, obj):
         return obj.job.company
     job_company.short_description = 'Company'
+
+@admin.register(ApplicationStatusEvent)
+class ApplicationStatusEventAdmin(admin.ModelAdmin):
+    list_display = ('application', 'from_status', 'to_status', 'created_at')
+    list_filter = ('to_status', 'created_at')
+    
+    # The log is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,71 @@
+"""
+Application boards: applications grouped by status for the recruiter's
+per-job board, the seeker's "My Applications" board and the seeker dashboard.
+
+A board fetches its applications in one query and sorts them into status
+columns in a single pass, so the column counts come for free. Pages that
+only need the counts use `count_applications_by_status`, one conditional
+aggregation in place of a COUNT per status.
+"""
+from django.db.models import Count, Q
+
+from jobs.models import Application
+
+
+def count_applications_by_status(applications):
+    """Return ``{'total': n, <status>: n, ...}`` for a queryset of applications, in one query."""
+    per_status = {
+        status: Count('pk', filter=Q(status=status)) for status, _ in Application.APPLICATION_STATUS
+    }
+    return applications.order_by().aggregate(total=Count('pk'), **per_status)
+
+
+class ApplicationBoard:
+    """Applications in one list and split into status columns, in ``APPLICATION_STATUS`` order."""
+
+    def __init__(self, applications):
+        self.applications = list(applications)
+        grouped = {status: [] for status, _ in Application.APPLICATION_STATUS}
+        for application in self.applications:
+            grouped.setdefault(application.status, []).append(application)
+
+        self.status_groups = [
+            {
+                'code': status,
+                'name': name,
+                'applications': grouped[status],
+                'color': Application.STATUS_COLORS.get(status, 'secondary'),
+                'count': len(grouped[status]),
+            }
+            for status, name in Application.APPLICATION_STATUS
+        ]
+
+    @property
+    def total(self):
+        return len(self.applications)
+
+    @property
+    def counts(self):
+        """The same shape as `count_applications_by_status`, without a query."""
+        counts = {group['code']: group['count'] for group in self.status_groups}
+        counts['total'] = self.total
+        return counts
+
+
+def get_job_board(job):
+    """The recruiter's board for one job, with each applicant's profile loaded."""
+    return ApplicationBoard(
+        Application.objects.filter(job=job).select_related(
+            'applicant', 'applicant__profile', 'applicant__profile__job_seeker_profile'
+        )
+    )
+
+
+def get_applicant_board(user):
+    """A job seeker's board of their own applications, with the jobs loaded."""
+    return ApplicationBoard(Application.objects.filter(applicant=user).select_related('job'))
+
+
+def get_applicant_stats(user):
+    """Counts of a job seeker's applications per status, for their dashboard."""
+    return count_applications_by_status(Application.objects.filter(applicant=user))
@@ -0,0 +1,82 @@
+"""
+Application counters on `Job`.
+
+Each job carries its total number of applications and the number currently
+in each status. Signals adjust them with single atomic UPDATEs as
+applications are created, change status or are deleted, so pages listing a
+recruiter's jobs read plain columns instead of counting per job. Those
+UPDATEs also bump the job's ``updated_at``, so incremental data exports pick
+up the new counts.
+`recount_job_applications` recomputes them from the applications table, for
+repairs after bulk imports or other writes that skip the hooks.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from jobs.models import Application, Job
+
+STATUS_COUNT_FIELDS = {status: f'{status}_count' for status, _ in Application.APPLICATION_STATUS}
+COUNTER_FIELDS = ('application_count', *STATUS_COUNT_FIELDS.values())
+RECOUNT_BATCH_SIZE = 500
+
+
+def _adjust(changes):
+    return {field: Greatest(F(field) + amount, 0) for field, amount in changes.items() if amount}
+
+
+def count_application(job_id, status, amount=1):
+    """Add an application in ``status`` to its job's counters, or take it away with ``amount=-1``."""
+    changes = {'application_count': amount}
+    if status in STATUS_COUNT_FIELDS:
+        changes[STATUS_COUNT_FIELDS[status]] = amount
+    # update() leaves the job's save signals alone
+    Job.objects.filter(pk=job_id).update(**_adjust(changes), updated_at=timezone.now())
+
+
+def move_application(job_id, from_status, to_status):
+    """Move an application from one status column of its job's counters to another."""
+    changes = {}
+    if from_status in STATUS_COUNT_FIELDS:
+        changes[STATUS_COUNT_FIELDS[from_status]] = -1
+    if to_status in STATUS_COUNT_FIELDS:
+        changes[STATUS_COUNT_FIELDS[to_status]] = changes.get(STATUS_COUNT_FIELDS[to_status], 0) + 1
+    changes = _adjust(changes)
+    if changes:
+        Job.objects.filter(pk=job_id).update(**changes, updated_at=timezone.now())
+
+
+def recount_job_applications(jobs=None):
+    """Recompute the application counters of ``jobs`` (all jobs by default). Returns the number of jobs."""
+    job_ids = None if jobs is None else [getattr(job, 'pk', job) for job in jobs]
+    applications = Application.objects.all()
+    if job_ids is not None:
+        applications = applications.filter(job_id__in=job_ids)
+    per_status = {
+        field: Count('pk', filter=Q(status=status)) for status, field in STATUS_COUNT_FIELDS.items()
+    }
+    totals = {
+        row['job_id']: row
+        for row in applications.values('job_id').annotate(application_count=Count('pk'), **per_status).order_by()
+    }
+
+    targets = Job.objects.all() if job_ids is None else Job.objects.filter(pk__in=job_ids)
+    job_ids = list(targets.order_by('pk').values_list('pk', flat=True))
+    now = timezone.now()
+    for start in range(0, len(job_ids), RECOUNT_BATCH_SIZE):
+        batch = Job.objects.filter(pk__in=job_ids[start:start + RECOUNT_BATCH_SIZE]).only('pk', *COUNTER_FIELDS)
+        with transaction.atomic():
+            changed = []
+            for job in batch.select_for_update():
+                row = totals.get(job.pk, {})
+                counts = {field: row.get(field, 0) for field in COUNTER_FIELDS}
+                if counts == {field: getattr(job, field) for field in COUNTER_FIELDS}:
+                    continue
+                for field, count in counts.items():
+                    setattr(job, field, count)
+                # Repaired counts are a change the incremental exports should carry
+                job.updated_at = now
+                changed.append(job)
+            Job.objects.bulk_update(changed, [*COUNTER_FIELDS, 'updated_at'])
+    return len(job_ids)
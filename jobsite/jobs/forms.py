@@ -1,5 +1,6 @@
 from django import forms
 from .models import Job, Application
+from .utils import MAX_POLYGON_VERTICES, MAX_SEARCH_CENTERS, parse_coordinate_list
 
 class JobForm(forms.ModelForm):
     class Meta:
@@ -226,3 +227,48 @@ class JobSearchForm(forms.Form):
             'step': '0.00000001'
         })
     )
+    
+    # Map search areas (hidden, populated by the map's drawing tools as "lat,lng;lat,lng;...")
+    search_polygon = forms.CharField(
+        required=False,
+        widget=forms.HiddenInput(attrs={'id': 'search-polygon-input'})
+    )
+    
+    search_centers = forms.CharField(
+        required=False,
+        widget=forms.HiddenInput(attrs={'id': 'search-centers-input'})
+    )
+    
+    center_radius = forms.ChoiceField(
+        required=False,
+        choices=[
+            ('5', 'Within 5 miles'),
+            ('10', 'Within 10 miles'),
+            ('20', 'Within 20 miles'),
+            ('25', 'Within 25 miles'),
+            ('50', 'Within 50 miles'),
+            ('100', 'Within 100 miles'),
+        ],
+        initial='20',
+        widget=forms.Select(attrs={'class': 'form-control', 'id': 'center-radius-select'})
+    )
+    
+    def clean_search_polygon(self):
+        try:
+            polygon = parse_coordinate_list(self.cleaned_data.get('search_polygon'))
+        except ValueError:
+            raise forms.ValidationError('The drawn search area is not valid.')
+        if polygon and not 3 <= len(polygon) <= MAX_POLYGON_VERTICES:
+            raise forms.ValidationError(
+                f'A search area needs between 3 and {MAX_POLYGON_VERTICES} points.'
+            )
+        return polygon
+    
+    def clean_search_centers(self):
+        try:
+            centers = parse_coordinate_list(self.cleaned_data.get('search_centers'))
+        except ValueError:
+            raise forms.ValidationError('The selected search centers are not valid.')
+        if len(centers) > MAX_SEARCH_CENTERS:
+            raise forms.ValidationError(f'Choose at most {MAX_SEARCH_CENTERS} search centers.')
+        return centers
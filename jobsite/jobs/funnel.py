@@ -0,0 +1,204 @@
+"""
+Per-job hiring funnels.
+
+Every status change of an application is appended to `ApplicationStatusEvent`,
+and the job's `JobFunnel` row is updated in the same transaction. It records
+how many applications reached each stage, and a histogram of how long
+applications stayed in each stage before moving on. The funnel page then
+reads one row. Medians come from the histogram, so they are estimates
+accurate to within a bucket. Exact medians would need every duration kept.
+
+Deleting an application takes its replayed history back out of the funnel
+before its events are deleted with it. `rebuild_job_funnels` replays the
+event log to recompute funnels, for repairs.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.models import Application, ApplicationStatusEvent, JobFunnel
+
+# Stages in hiring order; reaching one counts as passing through the ones before it
+PIPELINE = ['applied', 'review', 'interview', 'offer']
+COUNT_FIELDS = {status: f'{status}_count' for status in [*PIPELINE, 'closed']}
+# Upper bounds, in hours, of the time-in-stage histogram buckets; a last bucket holds anything longer
+DURATION_BUCKETS = [1, 4, 12, 24, 48, 96, 168, 336, 720, 1440, 2160]
+REBUILD_BATCH_SIZE = 500
+
+
+def duration_bucket(duration):
+    hours = duration.total_seconds() / 3600
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if hours < bound:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def median_duration(histogram):
+    """Estimate the median of a time-in-stage histogram by interpolating inside its middle bucket."""
+    total = sum(histogram or [])
+    if not total:
+        return None
+    middle = total / 2
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= middle:
+            lower = DURATION_BUCKETS[index - 1] if index else 0
+            if index >= len(DURATION_BUCKETS):
+                return timedelta(hours=lower)
+            upper = DURATION_BUCKETS[index]
+            return timedelta(hours=lower + (upper - lower) * (middle - seen) / count)
+        seen += count
+    return None
+
+
+def stages_reached(statuses):
+    """The stages an application has been counted in, given the statuses it has had."""
+    reached = set()
+    for status in statuses:
+        if status in PIPELINE:
+            reached.update(PIPELINE[:PIPELINE.index(status) + 1])
+        elif status:
+            reached.add(status)
+    return reached
+
+
+def apply_transition(funnel, reached, from_status, to_status, entered_at, at):
+    """
+    Add one status change to ``funnel`` (a JobFunnel or anything with its fields).
+
+    ``reached`` is the set of stages the application was already counted in
+    and is updated in place; ``entered_at`` is when it entered ``from_status``.
+    """
+    for status in stages_reached([to_status]) - reached:
+        field = COUNT_FIELDS[status]
+        setattr(funnel, field, getattr(funnel, field) + 1)
+        reached.add(status)
+
+    if from_status and entered_at is not None and at >= entered_at:
+        histogram = funnel.stage_durations.setdefault(from_status, [0] * (len(DURATION_BUCKETS) + 1))
+        histogram[duration_bucket(at - entered_at)] += 1
+
+
+@transaction.atomic
+def record_status_change(application, previous_status, at=None):
+    """Log that ``application`` moved from ``previous_status`` (None when new) and update its funnel."""
+    at = at or timezone.now()
+    # Lock the funnel before reading the history, so concurrent changes to one
+    # application each see the events the other wrote
+    funnel, _ = JobFunnel.objects.select_for_update().get_or_create(job_id=application.job_id)
+    history = list(
+        ApplicationStatusEvent.objects.filter(application=application)
+        .order_by('created_at', 'id')
+        .values_list('to_status', 'created_at')
+    )
+    reached = stages_reached(status for status, _ in history)
+    entered_at = history[-1][1] if history else None
+
+    ApplicationStatusEvent.objects.create(
+        application=application,
+        job_id=application.job_id,
+        from_status=previous_status or '',
+        to_status=application.status,
+        created_at=at,
+    )
+    apply_transition(funnel, reached, previous_status, application.status, entered_at, at)
+    funnel.save()
+
+
+@transaction.atomic
+def remove_application(application):
+    """Take ``application``'s status history back out of its job's funnel, before the application is deleted."""
+    funnel = JobFunnel.objects.select_for_update().filter(job_id=application.job_id).first()
+    if funnel is None:
+        return
+    events = (
+        ApplicationStatusEvent.objects.filter(application=application)
+        .order_by('created_at', 'id')
+        .values_list('from_status', 'to_status', 'created_at')
+    )
+    removed = JobFunnel(job_id=application.job_id, stage_durations={})
+    reached, entered_at = set(), None
+    for from_status, to_status, created_at in events:
+        apply_transition(removed, reached, from_status, to_status, entered_at, created_at)
+        entered_at = created_at
+
+    for field in COUNT_FIELDS.values():
+        setattr(funnel, field, max(getattr(funnel, field) - getattr(removed, field), 0))
+    for status, removed_histogram in removed.stage_durations.items():
+        histogram = [
+            max(count - gone, 0) for count, gone in zip(funnel.stage_durations.get(status, []), removed_histogram)
+        ]
+        if any(histogram):
+            funnel.stage_durations[status] = histogram
+        else:
+            funnel.stage_durations.pop(status, None)
+    funnel.save()
+
+
+def rebuild_job_funnels(jobs=None):
+    """Recompute the funnels of ``jobs`` (all jobs by default) by replaying their status events."""
+    events = ApplicationStatusEvent.objects.order_by('job_id', 'application_id', 'created_at', 'id')
+    funnels = JobFunnel.objects.all()
+    if jobs is not None:
+        job_ids = [getattr(job, 'pk', job) for job in jobs]
+        events = events.filter(job_id__in=job_ids)
+        funnels = funnels.filter(job_id__in=job_ids)
+
+    rebuilt = {}
+    application_id = None
+    for event in events.values('job_id', 'application_id', 'from_status', 'to_status', 'created_at').iterator():
+        if event['application_id'] != application_id:
+            application_id = event['application_id']
+            reached, entered_at = set(), None
+        funnel = rebuilt.setdefault(event['job_id'], JobFunnel(job_id=event['job_id'], stage_durations={}))
+        apply_transition(
+            funnel, reached, event['from_status'], event['to_status'], entered_at, event['created_at']
+        )
+        entered_at = event['created_at']
+
+    with transaction.atomic():
+        funnels.delete()
+        JobFunnel.objects.bulk_create(rebuilt.values(), batch_size=REBUILD_BATCH_SIZE)
+    return len(rebuilt)
+
+
+def format_duration(duration):
+    if duration is None:
+        return None
+    hours = duration.total_seconds() / 3600
+    if hours < 1:
+        return f"{max(1, round(hours * 60))} min"
+    if hours < 48:
+        return f"{hours:.1f} hours"
+    return f"{hours / 24:.1f} days"
+
+
+def get_funnel_stages(funnel):
+    """
+    Rows for the funnel page: each stage with the applications that reached
+    it, the share of the previous stage that got there, and the median time
+    applications spent in it before moving on.
+    """
+    stages = []
+    status_names = dict(Application.APPLICATION_STATUS)
+    applied = funnel.applied_count if funnel else 0
+    previous = None
+    for status in [*PIPELINE, 'closed']:
+        reached = getattr(funnel, COUNT_FIELDS[status]) if funnel else 0
+        # Closed applications can leave from any stage, so compare them with everyone who applied
+        base = applied if status == 'closed' else previous
+        median = median_duration(funnel.stage_durations.get(status)) if funnel else None
+        stages.append({
+            'code': status,
+            'name': status_names[status],
+            'color': Application.STATUS_COLORS.get(status, 'secondary'),
+            'reached': reached,
+            'conversion': round(100 * reached / base) if base else None,
+            'share': round(100 * reached / applied) if applied else 0,
+            'median_time': format_duration(median),
+        })
+        if status in PIPELINE:
+            previous = reached
+    return stages
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from jobs.funnel import rebuild_job_funnels
+
+
+class Command(BaseCommand):
+    help = "Recompute every job's hiring funnel from the application status event log"
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_ids", nargs="*", type=int, help="Only rebuild the funnels of these jobs")
+
+    def handle(self, *args, **options):
+        total = rebuild_job_funnels(options["job_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the hiring funnel of {total} job(s)."))
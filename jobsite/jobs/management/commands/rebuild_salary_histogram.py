@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.salary_histogram import get_salary_buckets, rebuild_salary_histogram
+
+
+class Command(BaseCommand):
+    help = "Recompute job salary buckets and the salary histogram (run after changing SALARY_BUCKET_WIDTH)"
+
+    def handle(self, *args, **options):
+        updated = []
+        for job in Job.objects.only('id', 'salary_min', 'salary_max', 'salary_low_bucket', 'salary_high_bucket').iterator():
+            buckets = get_salary_buckets(job.salary_min, job.salary_max)
+            if buckets != (job.salary_low_bucket, job.salary_high_bucket):
+                job.salary_low_bucket, job.salary_high_bucket = buckets
+                updated.append(job)
+        Job.objects.bulk_update(updated, ['salary_low_bucket', 'salary_high_bucket'], batch_size=500)
+
+        rebuild_salary_histogram()
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated salary buckets for {len(updated)} job(s) and rebuilt the salary histogram."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from jobs.application_counters import recount_job_applications
+
+
+class Command(BaseCommand):
+    help = "Recompute the total and per-status application counters of jobs from their applications"
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_ids", nargs="*", type=int, help="Only recount these jobs")
+
+    def handle(self, *args, **options):
+        total = recount_job_applications(options["job_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Recounted the applications of {total} job(s)."))
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:37
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of jobs.salary_histogram's bucketing as of this migration
+DEFAULT_SALARY_BUCKET_WIDTH = 10000
+
+
+def get_salary_buckets(salary_min, salary_max):
+    width = int(getattr(settings, 'SALARY_BUCKET_WIDTH', DEFAULT_SALARY_BUCKET_WIDTH))
+    low = salary_min if salary_min is not None else salary_max
+    high = salary_max if salary_max is not None else salary_min
+    return tuple(None if value is None else int(Decimal(value) // width) for value in (low, high))
+
+
+def populate_salary_histogram(apps, schema_editor):
+    """Fill the salary bucket columns and histogram for existing jobs"""
+    Job = apps.get_model('jobs', 'Job')
+    SalaryBucket = apps.get_model('jobs', 'SalaryBucket')
+
+    counts = {}
+    for job in Job.objects.all():
+        job.salary_low_bucket, job.salary_high_bucket = get_salary_buckets(job.salary_min, job.salary_max)
+        job.save(update_fields=['salary_low_bucket', 'salary_high_bucket'])
+        if not job.is_active:
+            continue
+        for bucket, counter in ((job.salary_low_bucket, 'low_count'), (job.salary_high_bucket, 'high_count')):
+            if bucket is None:
+                continue
+            key = (job.job_type, job.experience_level, bucket)
+            counts.setdefault(key, {'low_count': 0, 'high_count': 0})[counter] += 1
+
+    SalaryBucket.objects.bulk_create([
+        SalaryBucket(job_type=job_type, experience_level=experience_level, bucket=bucket, **values)
+        for (job_type, experience_level, bucket), values in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_job_latitude_job_longitude'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('full-time', 'Full Time'), ('part-time', 'Part Time'), ('contract', 'Contract'), ('internship', 'Internship'), ('freelance', 'Freelance')], max_length=20)),
+                ('experience_level', models.CharField(choices=[('entry', 'Entry Level'), ('mid', 'Mid Level'), ('senior', 'Senior Level'), ('executive', 'Executive')], max_length=20)),
+                ('bucket', models.IntegerField()),
+                ('low_count', models.PositiveIntegerField(default=0)),
+                ('high_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_high_bucket',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_low_bucket',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['is_active', 'salary_low_bucket'], name='jobs_job_salary_low_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['is_active', 'salary_high_bucket'], name='jobs_job_salary_high_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salarybucket',
+            unique_together={('job_type', 'experience_level', 'bucket')},
+        ),
+        migrations.RunPython(populate_salary_histogram, migrations.RunPython.noop),
+    ]
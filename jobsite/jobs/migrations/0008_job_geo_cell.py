@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:54
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copy of jobs.utils.get_spatial_cell as of this migration
+SPATIAL_CELL_DEGREES = 0.5
+_CELL_COLUMNS = int(360 / SPATIAL_CELL_DEGREES)
+_CELL_ROWS = int(180 / SPATIAL_CELL_DEGREES)
+
+
+def get_spatial_cell(lat, lon):
+    if lat is None or lon is None:
+        return None
+    row = min(max(int(math.floor((float(lat) + 90) / SPATIAL_CELL_DEGREES)), 0), _CELL_ROWS - 1)
+    column = int(math.floor((float(lon) + 180) / SPATIAL_CELL_DEGREES)) % _CELL_COLUMNS
+    return row * _CELL_COLUMNS + column
+
+
+def populate_geo_cells(apps, schema_editor):
+    """Fill the spatial cell column for existing jobs with coordinates"""
+    Job = apps.get_model('jobs', 'Job')
+    jobs = list(Job.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for job in jobs:
+        job.geo_cell = get_spatial_cell(job.latitude, job.longitude)
+    Job.objects.bulk_update(jobs, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_salary_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_geo_cells, migrations.RunPython.noop),
+    ]
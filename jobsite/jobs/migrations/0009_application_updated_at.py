@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Date existing applications by their last known change rather than by the migration"""
+    Application = apps.get_model('jobs', 'Application')
+    Application.objects.update(updated_at=Greatest(F('applied_at'), Coalesce(F('reviewed_at'), F('applied_at'))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_job_geo_cell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['updated_at'], name='jobs_job_updated_idx'),
+        ),
+    ]
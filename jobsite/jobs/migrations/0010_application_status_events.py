@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Frozen copies of jobs.funnel as of this migration, so later changes to the
+# live pipeline or buckets don't change what this backfill produces
+PIPELINE = ['applied', 'review', 'interview', 'offer']
+COUNT_FIELDS = {status: f'{status}_count' for status in [*PIPELINE, 'closed']}
+DURATION_BUCKETS = [1, 4, 12, 24, 48, 96, 168, 336, 720, 1440, 2160]
+
+
+def duration_bucket(duration):
+    hours = duration.total_seconds() / 3600
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if hours < bound:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def stages_reached(statuses):
+    reached = set()
+    for status in statuses:
+        if status in PIPELINE:
+            reached.update(PIPELINE[:PIPELINE.index(status) + 1])
+        elif status:
+            reached.add(status)
+    return reached
+
+
+def apply_transition(funnel, reached, from_status, to_status, entered_at, at):
+    for status in stages_reached([to_status]) - reached:
+        field = COUNT_FIELDS[status]
+        setattr(funnel, field, getattr(funnel, field) + 1)
+        reached.add(status)
+
+    if from_status and entered_at is not None and at >= entered_at:
+        histogram = funnel.stage_durations.setdefault(from_status, [0] * (len(DURATION_BUCKETS) + 1))
+        histogram[duration_bucket(at - entered_at)] += 1
+
+
+def backfill_status_events(apps, schema_editor):
+    """
+    Log each existing application's creation and, if it has moved on, its
+    move to its current status (the steps in between weren't recorded),
+    then build the funnels from those events
+    """
+    Application = apps.get_model('jobs', 'Application')
+    ApplicationStatusEvent = apps.get_model('jobs', 'ApplicationStatusEvent')
+    JobFunnel = apps.get_model('jobs', 'JobFunnel')
+
+    events = []
+    funnels = {}
+    applications = Application.objects.order_by('pk').values(
+        'pk', 'job_id', 'status', 'applied_at', 'reviewed_at', 'updated_at'
+    )
+    for application in applications.iterator():
+        changes = [('', 'applied', application['applied_at'])]
+        if application['status'] != 'applied':
+            moved_at = application['reviewed_at'] or application['updated_at']
+            changes.append(('applied', application['status'], max(moved_at, application['applied_at'])))
+
+        funnel = funnels.setdefault(
+            application['job_id'], JobFunnel(job_id=application['job_id'], stage_durations={})
+        )
+        reached, entered_at = set(), None
+        for from_status, to_status, at in changes:
+            events.append(ApplicationStatusEvent(
+                application_id=application['pk'], job_id=application['job_id'],
+                from_status=from_status, to_status=to_status, created_at=at,
+            ))
+            apply_transition(funnel, reached, from_status, to_status, entered_at, at)
+            entered_at = at
+
+    ApplicationStatusEvent.objects.bulk_create(events, batch_size=500)
+    JobFunnel.objects.bulk_create(funnels.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0009_application_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobFunnel',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='funnel', serialize=False, to='jobs.job')),
+                ('applied_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('interview_count', models.PositiveIntegerField(default=0)),
+                ('offer_count', models.PositiveIntegerField(default=0)),
+                ('closed_count', models.PositiveIntegerField(default=0)),
+                ('stage_durations', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ApplicationStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('applied', 'Applied'), ('review', 'Under Review'), ('interview', 'Interview'), ('offer', 'Offer Extended'), ('closed', 'Closed')], max_length=20)),
+                ('to_status', models.CharField(choices=[('applied', 'Applied'), ('review', 'Under Review'), ('interview', 'Interview'), ('offer', 'Offer Extended'), ('closed', 'Closed')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='jobs.application')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='jobs.job')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.RunPython(backfill_status_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:57
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_application_counters(apps, schema_editor):
+    Application = apps.get_model('jobs', 'Application')
+    Job = apps.get_model('jobs', 'Job')
+
+    statuses = ['applied', 'review', 'interview', 'offer', 'closed']
+    rows = Application.objects.values('job_id').annotate(
+        application_count=Count('pk'),
+        **{f'{status}_count': Count('pk', filter=Q(status=status)) for status in statuses},
+    ).order_by()
+    for row in rows:
+        job_id = row.pop('job_id')
+        Job.objects.filter(pk=job_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0010_application_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='application_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='applied_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='closed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='interview_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='offer_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_application_counters, migrations.RunPython.noop),
+    ]
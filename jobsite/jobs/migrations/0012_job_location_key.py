@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:47
+
+from django.db import migrations, models
+
+
+# Frozen copy of candidates.location_utils.normalize_location as of this migration
+def normalize_location(value):
+    if not value:
+        return ""
+    return " ".join(value.strip().lower().split())
+
+
+def populate_location_keys(apps, schema_editor):
+    """Fill the normalized location column for existing jobs"""
+    Job = apps.get_model('jobs', 'Job')
+    jobs = list(Job.objects.only('pk', 'location'))
+    for job in jobs:
+        job.location_key = normalize_location(job.location)
+    Job.objects.bulk_update(jobs, ['location_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0011_job_application_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='location_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(populate_location_keys, migrations.RunPython.noop),
+    ]
@@ -46,9 +46,30 @@ class Job(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     application_deadline = models.DateField(null=True, blank=True)
+    # Salary histogram buckets, derived from salary_min/salary_max on save
+    salary_low_bucket = models.IntegerField(null=True, blank=True, editable=False)
+    salary_high_bucket = models.IntegerField(null=True, blank=True, editable=False)
+    # Spatial grid cell of the coordinates, derived on save (see jobs.utils.get_spatial_cell)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    # Normalized location, derived on save (see candidates.location_utils.normalize_location)
+    location_key = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
+    # Applications to the job in total and by current status, kept up to date by
+    # jobs.application_counters as applications arrive, move or are deleted
+    application_count = models.PositiveIntegerField(default=0, editable=False)
+    applied_count = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    interview_count = models.PositiveIntegerField(default=0, editable=False)
+    offer_count = models.PositiveIntegerField(default=0, editable=False)
+    closed_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'salary_low_bucket'], name='jobs_job_salary_low_idx'),
+            models.Index(fields=['is_active', 'salary_high_bucket'], name='jobs_job_salary_high_idx'),
+            # Incremental data exports select jobs changed in a time window
+            models.Index(fields=['updated_at'], name='jobs_job_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.company}"
@@ -77,6 +98,26 @@ class Job(models.Model):
         return self.latitude is not None and self.longitude is not None
 
 
+class SalaryBucket(models.Model):
+    """Count of active jobs per salary bucket, job type and experience level.
+
+    ``low_count`` counts jobs whose lowest advertised salary falls in the
+    bucket and ``high_count`` jobs whose highest advertised salary does.
+    """
+    job_type = models.CharField(max_length=20, choices=Job.JOB_TYPES)
+    experience_level = models.CharField(max_length=20, choices=Job.EXPERIENCE_LEVELS)
+    bucket = models.IntegerField()
+    low_count = models.PositiveIntegerField(default=0)
+    high_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['job_type', 'experience_level', 'bucket']
+        ordering = ['bucket']
+    
+    def __str__(self):
+        return f"{self.job_type}/{self.experience_level} bucket {self.bucket}"
+
+
 class Application(models.Model):
     APPLICATION_STATUS = [
         ('applied', 'Applied'),
@@ -100,6 +141,7 @@ class Application(models.Model):
     status = models.CharField(max_length=20, choices=APPLICATION_STATUS, default='applied')
     applied_at = models.DateTimeField(default=timezone.now)
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         unique_together = ['job', 'applicant']  # Prevent duplicate applications
@@ -110,4 +152,38 @@ class Application(models.Model):
     
     def get_status_color(self):
         """Get the Bootstrap color class for the current status"""
-        return self.STATUS_COLORS.get(self.status, 'secondary')
\ No newline at end of file
+        return self.STATUS_COLORS.get(self.status, 'secondary')
+
+class ApplicationStatusEvent(models.Model):
+    """One status change of an application, including its creation. Rows are only ever appended."""
+
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='status_events')
+    # Copied from the application so a job's funnel can be rebuilt from its events alone
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='+')
+    from_status = models.CharField(max_length=20, choices=Application.APPLICATION_STATUS, blank=True)
+    to_status = models.CharField(max_length=20, choices=Application.APPLICATION_STATUS)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"Application {self.application_id}: {self.from_status or 'new'} -> {self.to_status}"
+
+
+class JobFunnel(models.Model):
+    """A job's hiring funnel, updated as its applications change status (see jobs.funnel)."""
+
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='funnel')
+    # Applications that reached each stage, or a later one
+    applied_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    interview_count = models.PositiveIntegerField(default=0)
+    offer_count = models.PositiveIntegerField(default=0)
+    closed_count = models.PositiveIntegerField(default=0)
+    # Histogram of completed stays per stage: {status: [count per jobs.funnel.DURATION_BUCKETS bucket]}
+    stage_durations = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Funnel for job {self.job_id}"
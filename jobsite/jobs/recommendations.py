@@ -7,13 +7,17 @@ def get_recommended_jobs(request, user_location=None):
     
     Args:
         request: The HTTP request object
-        user_location: Dict with 'lat' and 'lng' keys for user's location (optional)
+        user_location: Dict with 'lat' and 'lng' keys for user's location (optional).
+            Defaults to the coordinates stored on the seeker's profile.
     """
     job_seeker_profile = getattr(request.user.profile, "job_seeker_profile", None)
 
     if not job_seeker_profile or not job_seeker_profile.skills:
         return Job.objects.none()
 
+    if not user_location and job_seeker_profile.has_coordinates:
+        user_location = {'lat': job_seeker_profile.latitude, 'lng': job_seeker_profile.longitude}
+
     seeker_skills = set(skill.lower() for skill in job_seeker_profile.skills_list)
 
     # Get jobs the user has already applied to
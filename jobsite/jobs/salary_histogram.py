@@ -0,0 +1,147 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+
+from jobs.models import Job, SalaryBucket
+
+DEFAULT_SALARY_BUCKET_WIDTH = 10000
+
+
+def get_bucket_width():
+    """Return the salary bucket width in dollars (``SALARY_BUCKET_WIDTH`` setting)."""
+    return int(getattr(settings, 'SALARY_BUCKET_WIDTH', DEFAULT_SALARY_BUCKET_WIDTH))
+
+
+def salary_to_bucket(value):
+    """Map a salary amount to its bucket number, or None if no amount is given."""
+    if value is None:
+        return None
+    return int(Decimal(value) // get_bucket_width())
+
+
+def get_salary_buckets(salary_min, salary_max):
+    """
+    Return the (low, high) buckets for a job's advertised salary.
+
+    A job that only gives one end of the range uses it for both ends, so the
+    buckets agree with the null handling of the salary filters.
+    """
+    low = salary_min if salary_min is not None else salary_max
+    high = salary_max if salary_max is not None else salary_min
+    return salary_to_bucket(low), salary_to_bucket(high)
+
+
+def rebuild_salary_histogram(groups=None):
+    """
+    Recompute SalaryBucket rows from the active jobs.
+
+    Args:
+        groups: Iterable of (job_type, experience_level) pairs to rebuild.
+            Rebuilds every group when omitted.
+    """
+    jobs = Job.objects.filter(is_active=True)
+    buckets = SalaryBucket.objects.all()
+    if groups is not None:
+        groups = set(groups)
+        if not groups:
+            return
+        group_query = models.Q()
+        for job_type, experience_level in groups:
+            group_query |= models.Q(job_type=job_type, experience_level=experience_level)
+        jobs = jobs.filter(group_query)
+        buckets = buckets.filter(group_query)
+
+    counts = defaultdict(lambda: {'low_count': 0, 'high_count': 0})
+    for field, counter in (('salary_low_bucket', 'low_count'), ('salary_high_bucket', 'high_count')):
+        rows = (
+            jobs.filter(**{f'{field}__isnull': False})
+            .values('job_type', 'experience_level', field)
+            .annotate(total=models.Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            counts[(row['job_type'], row['experience_level'], row[field])][counter] = row['total']
+
+    with transaction.atomic():
+        buckets.delete()
+        SalaryBucket.objects.bulk_create([
+            SalaryBucket(job_type=job_type, experience_level=experience_level, bucket=bucket, **values)
+            for (job_type, experience_level, bucket), values in counts.items()
+        ])
+
+
+def get_salary_histogram(job_type=None, experience_level=None):
+    """
+    Return histogram bars for the salary slider.
+
+    Each bar has the bucket's dollar range, the number of jobs starting and
+    ending in it, and ``at_least`` / ``at_most`` running totals: how many jobs
+    a min salary filter at the bar's lower edge, or a max salary filter at its
+    upper edge, would keep.
+    """
+    buckets = SalaryBucket.objects.all()
+    if job_type:
+        buckets = buckets.filter(job_type=job_type)
+    if experience_level:
+        buckets = buckets.filter(experience_level=experience_level)
+
+    rows = (
+        buckets.values('bucket')
+        .annotate(low_count=models.Sum('low_count'), high_count=models.Sum('high_count'))
+        .order_by('bucket')
+    )
+
+    width = get_bucket_width()
+    histogram = [
+        {
+            'bucket': row['bucket'],
+            'min': row['bucket'] * width,
+            'max': (row['bucket'] + 1) * width,
+            'low_count': row['low_count'],
+            'high_count': row['high_count'],
+        }
+        for row in rows
+    ]
+
+    running = 0
+    for bar in histogram:
+        running += bar['low_count']
+        bar['at_most'] = running
+    running = 0
+    for bar in reversed(histogram):
+        running += bar['high_count']
+        bar['at_least'] = running
+
+    peak = max((bar['low_count'] for bar in histogram), default=0)
+    for bar in histogram:
+        bar['height'] = round(100 * bar['low_count'] / peak) if peak else 0
+    return histogram
+
+
+def filter_jobs_by_salary(jobs, salary_min=None, salary_max=None):
+    """
+    Filter a Job QuerySet by salary using the indexed bucket columns.
+
+    A job matches a minimum when the top of its range reaches it, and a
+    maximum when the bottom of its range is under it. Only jobs in the
+    boundary bucket need the exact comparison against the salary columns.
+    """
+    if salary_min:
+        bucket = salary_to_bucket(salary_min)
+        jobs = jobs.filter(salary_high_bucket__gte=bucket).filter(
+            models.Q(salary_high_bucket__gt=bucket) |
+            models.Q(salary_min__gte=salary_min) |
+            models.Q(salary_max__gte=salary_min)
+        )
+
+    if salary_max:
+        bucket = salary_to_bucket(salary_max)
+        jobs = jobs.filter(salary_low_bucket__lte=bucket).filter(
+            models.Q(salary_low_bucket__lt=bucket) |
+            models.Q(salary_max__lte=salary_max) |
+            models.Q(salary_min__lte=salary_max)
+        )
+
+    return jobs
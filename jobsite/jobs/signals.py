@@ -0,0 +1,137 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from accounts import notifications
+from candidates.location_utils import normalize_location, seed_coordinates_from_jobs
+from jobs.application_counters import count_application, move_application
+from jobs.funnel import record_status_change, remove_application
+from jobs.models import Application, Job
+from jobs.salary_histogram import get_salary_buckets, rebuild_salary_histogram
+from jobs.utils import get_spatial_cell
+
+
+@receiver(pre_save, sender=Job)
+def set_salary_buckets(sender, instance, **kwargs):
+    """Derive the salary bucket columns from the job's salary range"""
+    instance.salary_low_bucket, instance.salary_high_bucket = get_salary_buckets(
+        instance.salary_min, instance.salary_max
+    )
+
+
+@receiver(pre_save, sender=Job)
+def set_geo_cell(sender, instance, **kwargs):
+    """Derive the spatial cell column from the job's coordinates"""
+    instance.geo_cell = get_spatial_cell(instance.latitude, instance.longitude)
+
+
+@receiver(pre_save, sender=Job)
+def set_location_key(sender, instance, **kwargs):
+    """Derive the normalized location column the coordinate cache is keyed on"""
+    instance.location_key = normalize_location(instance.location)
+
+
+@receiver(pre_save, sender=Job)
+def remember_previous_state(sender, instance, **kwargs):
+    """Remember the job's previously saved values for the post_save handlers"""
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = (
+            Job.objects.filter(pk=instance.pk)
+            .values('job_type', 'experience_level', 'location')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Job)
+def update_salary_histogram(sender, instance, raw=False, **kwargs):
+    """Rebuild the histogram rows of the groups the saved job left or joined"""
+    if raw:
+        return
+    groups = {(instance.job_type, instance.experience_level)}
+    previous_state = getattr(instance, '_previous_state', None)
+    if previous_state:
+        groups.add((previous_state['job_type'], previous_state['experience_level']))
+    rebuild_salary_histogram(groups)
+
+
+@receiver(post_save, sender=Job)
+def seed_location_coordinates(sender, instance, raw=False, **kwargs):
+    """Feed the job's map coordinates into the shared location coordinate cache"""
+    if raw:
+        return
+    locations = [instance.location] if instance.has_coordinates else []
+    previous_state = getattr(instance, '_previous_state', None)
+    if previous_state and previous_state['location'] != instance.location:
+        locations.append(previous_state['location'])
+    if locations:
+        seed_coordinates_from_jobs(locations)
+
+
+@receiver(post_delete, sender=Job)
+def remove_from_salary_histogram(sender, instance, **kwargs):
+    rebuild_salary_histogram({(instance.job_type, instance.experience_level)})
+
+
+@receiver(pre_save, sender=Application)
+def remember_application_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = Application.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Application)
+def count_application_notifications(sender, instance, created, raw=False, **kwargs):
+    """Count new applications for the job's poster and status changes for the applicant"""
+    if raw:
+        return
+    previous_status = None if created else getattr(instance, '_previous_status', None)
+    if not created and previous_status == instance.status:
+        return
+
+    poster_id = Job.objects.filter(pk=instance.job_id).values_list('posted_by_id', flat=True).first()
+    if previous_status == 'applied':
+        notifications.decrement(poster_id, 'new_applications')
+    if instance.status == 'applied':
+        notifications.increment(poster_id, 'new_applications')
+    if not created:
+        notifications.increment(instance.applicant_id, 'application_updates')
+
+
+@receiver(post_save, sender=Application)
+def log_status_change(sender, instance, created, raw=False, **kwargs):
+    """Append new applications and status changes to the event log behind the job's funnel"""
+    if raw:
+        return
+    if created:
+        record_status_change(instance, None, at=instance.applied_at)
+    elif getattr(instance, '_previous_status', None) not in (None, instance.status):
+        record_status_change(instance, instance._previous_status)
+
+
+@receiver(pre_delete, sender=Application)
+def remove_from_funnel(sender, instance, **kwargs):
+    """Take the application out of the job's funnel while its status events still exist"""
+    remove_application(instance)
+
+
+@receiver(post_save, sender=Application)
+def update_job_application_counters(sender, instance, created, raw=False, **kwargs):
+    """Keep the job's total and per-status application counts in step with the application"""
+    if raw:
+        return
+    if created:
+        count_application(instance.job_id, instance.status)
+    elif getattr(instance, '_previous_status', None) not in (None, instance.status):
+        move_application(instance.job_id, instance._previous_status, instance.status)
+
+
+@receiver(post_delete, sender=Application)
+def uncount_job_application(sender, instance, **kwargs):
+    count_application(instance.job_id, instance.status, amount=-1)
+
+
+@receiver(post_delete, sender=Application)
+def uncount_deleted_application(sender, instance, **kwargs):
+    if instance.status == 'applied':
+        poster_id = Job.objects.filter(pk=instance.job_id).values_list('posted_by_id', flat=True).first()
+        notifications.decrement(poster_id, 'new_applications')
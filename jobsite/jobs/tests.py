@@ -1,9 +1,21 @@
 from django.test import TestCase, RequestFactory
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
 
-from jobs.models import Job
-from jobs.utils import filter_jobs_by_distance, calculate_distance
+from jobs.models import Application, ApplicationStatusEvent, Job, JobFunnel, SalaryBucket
+from jobs.application_board import count_applications_by_status, get_job_board
+from jobs.application_counters import COUNTER_FIELDS, recount_job_applications
+from jobs.funnel import median_duration, rebuild_job_funnels
+from jobs.utils import (
+	filter_jobs_by_distance, calculate_distance, get_spatial_cell, points_in_polygon,
+	filter_queryset_by_polygon, filter_queryset_by_centers,
+)
+from jobs.recommendations import get_recommended_jobs
+from candidates.location_utils import clear_coordinate_cache
+from jobs.salary_histogram import filter_jobs_by_salary, get_salary_histogram
 from accounts.models import UserProfile, JobSeekerProfile
 from jobs.views import job_list
 
@@ -96,3 +108,365 @@ class CommuteRadiusTests(TestCase):
 		self.assertIn('Backend Engineer', job_titles)
 		self.assertNotIn('Frontend Engineer', job_titles)
 
+
+
+	def test_profile_location_is_geocoded_from_cache(self):
+		clear_coordinate_cache()
+		self.job_seeker_profile.location = "  oakland, ca "
+		self.job_seeker_profile.save()
+
+		self.assertEqual(self.job_seeker_profile.location_key, "oakland, ca")
+		self.assertAlmostEqual(float(self.job_seeker_profile.latitude), 37.8044, places=4)
+		self.assertEqual(self.job_seeker_profile.geo_cell, get_spatial_cell(37.8044, -122.2711))
+
+	def test_recommendations_use_stored_profile_location(self):
+		clear_coordinate_cache()
+		self.job_seeker_profile.skills = "Python, React"
+		self.job_seeker_profile.location = "Oakland, CA"
+		self.job_seeker_profile.save()
+
+		request = self.factory.get('/')
+		request.user = User.objects.get(pk=self.user.pk)
+		recommended_ids = set(get_recommended_jobs(request).values_list('id', flat=True))
+		self.assertEqual(recommended_ids, {self.job_close.id})
+
+
+class SalaryHistogramTests(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create_user(
+			username="poster", email="poster@example.com", password="pass1234"
+		)
+
+	def create_job(self, title, salary_min=None, salary_max=None, **kwargs):
+		return Job.objects.create(
+			title=title,
+			company="SalaryCo",
+			location="Atlanta, GA",
+			salary_min=salary_min,
+			salary_max=salary_max,
+			description="Description",
+			requirements="Requirements",
+			posted_by=self.poster,
+			**kwargs
+		)
+
+	def test_buckets_follow_salary_on_save(self):
+		job = self.create_job("Only Max", salary_max=85000)
+		self.assertEqual((job.salary_low_bucket, job.salary_high_bucket), (8, 8))
+
+		job.salary_min = 62000
+		job.save()
+		job.refresh_from_db()
+		self.assertEqual((job.salary_low_bucket, job.salary_high_bucket), (6, 8))
+
+	def test_histogram_maintained_on_save_and_delete(self):
+		job = self.create_job("Entry", 50000, 70000, job_type='full-time', experience_level='entry')
+		self.create_job("Senior", 150000, 180000, job_type='full-time', experience_level='senior')
+
+		self.assertEqual(
+			SalaryBucket.objects.get(job_type='full-time', experience_level='entry', bucket=5).low_count, 1
+		)
+
+		job.experience_level = 'mid'
+		job.save()
+		self.assertFalse(SalaryBucket.objects.filter(experience_level='entry').exists())
+		self.assertTrue(SalaryBucket.objects.filter(experience_level='mid', bucket=7, high_count=1).exists())
+
+		histogram = get_salary_histogram(job_type='full-time')
+		self.assertEqual([bar['bucket'] for bar in histogram], [5, 7, 15, 18])
+		self.assertEqual(histogram[0]['at_least'], 2)
+		self.assertEqual(histogram[-1]['at_most'], 2)
+
+		job.delete()
+		self.assertFalse(SalaryBucket.objects.filter(experience_level='mid').exists())
+
+	def test_filter_matches_original_null_handling(self):
+		self.create_job("Range", 60000, 80000)
+		self.create_job("Min Only", salary_min=95000)
+		self.create_job("Max Only", salary_max=71000)
+		self.create_job("Unspecified")
+
+		def titles(**filters):
+			return set(filter_jobs_by_salary(Job.objects.all(), **filters).values_list('title', flat=True))
+
+		self.assertEqual(titles(salary_min=Decimal('71000')), {"Range", "Min Only", "Max Only"})
+		self.assertEqual(titles(salary_min=Decimal('72000')), {"Range", "Min Only"})
+		self.assertEqual(titles(salary_max=Decimal('65000')), {"Range"})
+		self.assertEqual(titles(salary_min=Decimal('75000'), salary_max=Decimal('96000')), {"Range", "Min Only"})
+
+
+class AreaSearchTests(TestCase):
+	def setUp(self):
+		self.poster = User.objects.create_user(
+			username="poster", email="poster@example.com", password="pass1234"
+		)
+		places = {
+			"Atlanta": ("33.7490", "-84.3880"),
+			"Marietta": ("33.9526", "-84.5499"),
+			"Athens": ("33.9519", "-83.3576"),
+			"Boston": ("42.3601", "-71.0589"),
+			"Cambridge": ("42.3736", "-71.1097"),
+			"Denver": ("39.7392", "-104.9903"),
+		}
+		for title, (lat, lon) in places.items():
+			Job.objects.create(
+				title=title, company="MapCo", location=title,
+				latitude=Decimal(lat), longitude=Decimal(lon),
+				description="Description", requirements="Requirements", posted_by=self.poster,
+			)
+		# Metro Atlanta, drawn loosely around Atlanta and Marietta but not Athens
+		self.polygon = [(33.6, -84.7), (34.1, -84.7), (34.1, -84.2), (33.6, -84.2)]
+
+	def titles(self, jobs):
+		return set(jobs.values_list('title', flat=True))
+
+	def test_geo_cell_follows_coordinates(self):
+		job = Job.objects.get(title="Denver")
+		self.assertEqual(job.geo_cell, get_spatial_cell(job.latitude, job.longitude))
+
+		job.latitude = job.longitude = None
+		job.save()
+		self.assertIsNone(job.geo_cell)
+
+	def test_points_in_concave_polygon(self):
+		# A "U" shape: the notch between the arms is outside
+		polygon = [(0, 0), (10, 0), (10, 3), (2, 3), (2, 7), (10, 7), (10, 10), (0, 10)]
+		points = [(5, 1), (5, 5), (5, 9), (1, 5), (11, 5), (5, -1)]
+
+		self.assertEqual(points_in_polygon(points, polygon), [True, False, True, True, False, False])
+
+	def test_polygon_filter(self):
+		jobs = filter_queryset_by_polygon(Job.objects.all(), self.polygon, cell_field='geo_cell')
+		self.assertEqual(self.titles(jobs), {"Atlanta", "Marietta"})
+
+	def test_polygon_filter_matches_point_test_in_one_query(self):
+		polygon = [(0, 0), (10, 0), (10, 3), (2, 3), (2, 7), (10, 7), (10, 10), (0, 10)]
+		points = [(5, 1), (5, 5), (5, 9), (1, 5), (11, 5), (5, -1), (2.5, 4)]
+		for number, (lat, lon) in enumerate(points):
+			Job.objects.create(
+				title=f"Point {number}", company="MapCo", location="Grid",
+				latitude=Decimal(lat), longitude=Decimal(lon),
+				description="Description", requirements="Requirements", posted_by=self.poster,
+			)
+		expected = {f"Point {number}" for number, hit in enumerate(points_in_polygon(points, polygon)) if hit}
+
+		with self.assertNumQueries(1):
+			titles = self.titles(filter_queryset_by_polygon(Job.objects.filter(company="MapCo"), polygon))
+		self.assertEqual(titles, expected)
+
+	def test_multi_center_filter_orders_by_nearest_center(self):
+		centers = [(33.7490, -84.3880), (42.3601, -71.0589)]
+		jobs = filter_queryset_by_centers(Job.objects.all(), centers, 20, cell_field='geo_cell')
+
+		self.assertEqual(self.titles(jobs), {"Atlanta", "Marietta", "Boston", "Cambridge"})
+		self.assertEqual([job.title for job in jobs][:2], ["Atlanta", "Boston"])
+
+	def test_job_list_area_search(self):
+		polygon = ";".join(f"{lat},{lon}" for lat, lon in self.polygon)
+		response = self.client.get(reverse('jobs.list'), {'search_polygon': polygon})
+		self.assertEqual({job.title for job in response.context['template_data']['page_obj']}, {"Atlanta", "Marietta"})
+
+		response = self.client.get(reverse('jobs.list'), {
+			'search_centers': "33.9519,-83.3576;39.7392,-104.9903", 'center_radius': '10',
+		})
+		self.assertEqual({job.title for job in response.context['template_data']['page_obj']}, {"Athens", "Denver"})
+
+		response = self.client.get(reverse('jobs.list'), {'search_polygon': "33.6,-84.7;34.1"})
+		self.assertTrue(response.context['template_data']['search_form'].errors)
+		self.assertEqual(len(response.context['template_data']['page_obj']), 0)
+
+		# A malformed area does not drop the other filters and show every job
+		response = self.client.get(reverse('jobs.list'), {'search': "Denver", 'search_centers': "nowhere"})
+		self.assertIn('search_centers', response.context['template_data']['search_form'].errors)
+		self.assertEqual(len(response.context['template_data']['page_obj']), 0)
+
+
+class JobFunnelTests(TestCase):
+	def setUp(self):
+		self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+		UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+		self.job = Job.objects.create(
+			title="Engineer", company="Acme", location="Atlanta, GA",
+			description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+		)
+		start = timezone.now() - timedelta(days=10)
+		self.applications = []
+		for number in range(4):
+			seeker = User.objects.create_user(username=f"seeker{number}", password="pass1234")
+			self.applications.append(Application.objects.create(
+				job=self.job, applicant=seeker, cover_note="Hi", applied_at=start,
+			))
+
+	def move(self, application, status):
+		application.status = status
+		application.save()
+
+	def test_status_changes_are_logged_and_summarized(self):
+		first, second, third, _ = self.applications
+		self.move(first, 'review')
+		self.move(first, 'interview')
+		# Skipping review still counts as passing through it
+		self.move(second, 'interview')
+		self.move(third, 'closed')
+		# Moving back doesn't count a stage twice
+		self.move(first, 'review')
+		first.save()
+
+		self.assertEqual(
+			list(ApplicationStatusEvent.objects.filter(application=first).values_list('from_status', 'to_status')),
+			[('', 'applied'), ('applied', 'review'), ('review', 'interview'), ('interview', 'review')],
+		)
+		funnel = JobFunnel.objects.get(job=self.job)
+		self.assertEqual(
+			(funnel.applied_count, funnel.review_count, funnel.interview_count, funnel.offer_count, funnel.closed_count),
+			(4, 2, 2, 0, 1),
+		)
+		# Three applications left 'applied' after ten days, which falls in the one to two week bucket
+		self.assertEqual(sum(funnel.stage_durations['applied']), 3)
+		self.assertTrue(timedelta(days=7) <= median_duration(funnel.stage_durations['applied']) < timedelta(days=14))
+
+		self.client.login(username="recruiter", password="pass1234")
+		# Session, user, profile check, then the job and its funnel in one query, plus the navbar counters
+		with self.assertNumQueries(5):
+			response = self.client.get(reverse('jobs.funnel', args=[self.job.id]))
+		stages = {stage['code']: stage for stage in response.context['template_data']['stages']}
+		self.assertEqual(stages['review']['conversion'], 50)
+		self.assertEqual(stages['interview']['conversion'], 100)
+		self.assertEqual(stages['closed']['conversion'], 25)
+		self.assertIsNone(stages['offer']['median_time'])
+
+	def test_rebuild_replays_the_event_log(self):
+		first, second = self.applications[:2]
+		self.move(first, 'review')
+		self.move(first, 'offer')
+		self.move(second, 'closed')
+		funnel = JobFunnel.objects.get(job=self.job)
+		JobFunnel.objects.all().delete()
+
+		self.assertEqual(rebuild_job_funnels(), 1)
+
+		rebuilt = JobFunnel.objects.get(job=self.job)
+		for field in ('applied_count', 'review_count', 'interview_count', 'offer_count', 'closed_count', 'stage_durations'):
+			self.assertEqual(getattr(rebuilt, field), getattr(funnel, field))
+
+	def test_deleting_an_application_takes_it_out_of_the_funnel(self):
+		first, second = self.applications[:2]
+		self.move(first, 'review')
+		self.move(first, 'interview')
+		self.move(second, 'closed')
+
+		first.delete()
+
+		funnel = JobFunnel.objects.get(job=self.job)
+		JobFunnel.objects.all().delete()
+		rebuild_job_funnels()
+		rebuilt = JobFunnel.objects.get(job=self.job)
+		for field in ('applied_count', 'review_count', 'interview_count', 'offer_count', 'closed_count', 'stage_durations'):
+			self.assertEqual(getattr(funnel, field), getattr(rebuilt, field))
+		self.assertEqual((funnel.applied_count, funnel.review_count, funnel.closed_count), (3, 0, 1))
+
+	def test_median_interpolates_within_a_bucket(self):
+		self.assertIsNone(median_duration([]))
+		# Two stays under an hour, two between 1 and 4 hours: the median is at the 1 hour boundary
+		self.assertEqual(median_duration([2, 2]), timedelta(hours=1))
+		self.assertEqual(median_duration([0, 0, 1]), timedelta(hours=8))
+
+
+class ApplicationBoardTests(TestCase):
+	def setUp(self):
+		self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+		UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+		self.job = Job.objects.create(
+			title="Engineer", company="Acme", location="Atlanta, GA",
+			description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+		)
+		for number, status in enumerate(['applied', 'applied', 'review', 'offer']):
+			seeker = User.objects.create_user(username=f"seeker{number}", password="pass1234")
+			UserProfile.objects.create(user=seeker, user_type='job_seeker')
+			Application.objects.create(job=self.job, applicant=seeker, cover_note="Hi", status=status)
+
+	def test_board_groups_applications_in_one_query(self):
+		with self.assertNumQueries(1):
+			board = get_job_board(self.job)
+			groups = {group['code']: group for group in board.status_groups}
+			# The profiles shown on each card come with the applications
+			names = [application.applicant.profile.user_type for application in groups['applied']['applications']]
+		self.assertEqual([group['code'] for group in board.status_groups], [code for code, _ in Application.APPLICATION_STATUS])
+		self.assertEqual(names, ['job_seeker', 'job_seeker'])
+		self.assertEqual(board.counts, {'total': 4, 'applied': 2, 'review': 1, 'interview': 0, 'offer': 1, 'closed': 0})
+
+		with self.assertNumQueries(1):
+			counts = count_applications_by_status(Application.objects.filter(job=self.job))
+		self.assertEqual(counts, board.counts)
+
+	def test_board_page_queries_do_not_grow_with_statuses(self):
+		self.client.login(username="recruiter", password="pass1234")
+		url = reverse('jobs.applications', args=[self.job.id])
+		self.client.get(url)
+		with self.assertNumQueries(6):
+			response = self.client.get(url)
+		self.assertEqual(response.context['template_data']['total_applications'], 4)
+		self.assertEqual(
+			[group['count'] for group in response.context['template_data']['status_groups']], [2, 1, 0, 1, 0]
+		)
+
+
+class ApplicationCounterTests(TestCase):
+	def setUp(self):
+		self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+		UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+		self.jobs = [
+			Job.objects.create(
+				title=f"Engineer {number}", company="Acme", location="Atlanta, GA",
+				description="Work on APIs", requirements="Python", posted_by=self.recruiter,
+			)
+			for number in range(3)
+		]
+		self.seekers = [User.objects.create_user(username=f"seeker{number}", password="pass1234") for number in range(3)]
+
+	def counters(self, job):
+		return Job.objects.filter(pk=job.pk).values(*COUNTER_FIELDS).get()
+
+	def test_counters_follow_applications(self):
+		job = self.jobs[0]
+		applications = [
+			Application.objects.create(job=job, applicant=seeker, cover_note="Hi") for seeker in self.seekers
+		]
+		applications[0].status = 'review'
+		applications[0].save()
+		applications[1].status = 'closed'
+		applications[1].save()
+		# Saving without a status change leaves the counters alone
+		applications[1].save()
+		applications[2].delete()
+
+		self.assertEqual(self.counters(job), {
+			'application_count': 2, 'applied_count': 0, 'review_count': 1,
+			'interview_count': 0, 'offer_count': 0, 'closed_count': 1,
+		})
+
+	def test_recount_repairs_drifted_counters(self):
+		Application.objects.create(job=self.jobs[0], applicant=self.seekers[0], cover_note="Hi")
+		Application.objects.create(job=self.jobs[1], applicant=self.seekers[0], cover_note="Hi", status='offer')
+		expected = [self.counters(job) for job in self.jobs]
+		# Bulk writes skip the signals
+		Application.objects.filter(job=self.jobs[0]).update(status='interview')
+		Job.objects.update(application_count=7, applied_count=3)
+
+		self.assertEqual(recount_job_applications(), 3)
+
+		expected[0].update(applied_count=0, interview_count=1)
+		self.assertEqual([self.counters(job) for job in self.jobs], expected)
+
+	def test_my_jobs_reads_the_counters(self):
+		for seeker in self.seekers:
+			Application.objects.create(job=self.jobs[0], applicant=seeker, cover_note="Hi")
+		self.client.login(username="recruiter", password="pass1234")
+		url = reverse('jobs.my_jobs')
+		self.client.get(url)
+		# Session, user and profile, the jobs, then the navbar counters; nothing per job
+		with self.assertNumQueries(5):
+			response = self.client.get(url)
+		jobs = {job.pk: job for job in response.context['template_data']['jobs']}
+		self.assertEqual((jobs[self.jobs[0].pk].application_count, jobs[self.jobs[0].pk].applied_count), (3, 3))
+		self.assertEqual(jobs[self.jobs[1].pk].application_count, 0)
@@ -10,5 +10,6 @@ urlpatterns = [
     path('<int:job_id>/edit/', views.edit_job, name='jobs.edit'),
     path('<int:job_id>/apply/', views.apply_to_job, name='jobs.apply'),
     path('<int:job_id>/applications/', views.job_applications, name='jobs.applications'),
+    path('<int:job_id>/funnel/', views.job_funnel, name='jobs.funnel'),
     path('applications/<int:application_id>/update-status/', views.update_application_status, name='jobs.update_application_status'),
 ]
@@ -1,5 +1,80 @@
 import math
+import operator
+from bisect import bisect_left
 from decimal import Decimal
+from functools import reduce
+
+from django.db.models import Case, ExpressionWrapper, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import ASin, Cast, Cos, Least, Mod, Power, Radians, Sin, Sqrt
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+
+# Size of a spatial grid cell in degrees (about 35 miles north-south).
+# Stored cell ids depend on it, so changing it means recomputing them.
+SPATIAL_CELL_DEGREES = 0.5
+_CELL_COLUMNS = int(360 / SPATIAL_CELL_DEGREES)
+_CELL_ROWS = int(180 / SPATIAL_CELL_DEGREES)
+
+# Radius of earth in miles
+EARTH_RADIUS_MILES = 3959
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+# Above this many grid cells the cell list costs more than the bounding box saves
+MAX_PREFILTER_CELLS = 200
+
+# Limits on user-drawn search areas
+MAX_POLYGON_VERTICES = 100
+MAX_SEARCH_CENTERS = 10
+
+
+def _cell_row(lat):
+    return min(max(int(math.floor((lat + 90) / SPATIAL_CELL_DEGREES)), 0), _CELL_ROWS - 1)
+
+
+def _cell_column(lon):
+    return int(math.floor((lon + 180) / SPATIAL_CELL_DEGREES)) % _CELL_COLUMNS
+
+
+def get_spatial_cell(lat, lon):
+    """
+    Return the id of the fixed-size grid cell containing a point,
+    or None if either coordinate is missing.
+    """
+    if lat is None or lon is None:
+        return None
+    return _cell_row(float(lat)) * _CELL_COLUMNS + _cell_column(float(lon))
+
+
+def get_bounding_box(lat, lon, radius_miles):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) enclosing a circle of
+    radius_miles around a point. Longitudes may extend past +/-180.
+    """
+    lat = float(lat)
+    lon = float(lon)
+    lat_delta = float(radius_miles) / MILES_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6 or abs(lat) + lat_delta >= 90:
+        lon_delta = 180.0
+    else:
+        lon_delta = min(lat_delta / max(math.cos(math.radians(abs(lat) + lat_delta)), 1e-6), 180.0)
+    return (
+        max(lat - lat_delta, -90.0),
+        min(lat + lat_delta, 90.0),
+        lon - lon_delta,
+        lon + lon_delta,
+    )
+
+
+def get_cells_for_bounding_box(min_lat, max_lat, min_lon, max_lon):
+    """Return the ids of all grid cells overlapping a bounding box"""
+    rows = range(_cell_row(min_lat), _cell_row(max_lat) + 1)
+    if max_lon - min_lon >= 360:
+        columns = range(_CELL_COLUMNS)
+    else:
+        first = int(math.floor((min_lon + 180) / SPATIAL_CELL_DEGREES))
+        last = int(math.floor((max_lon + 180) / SPATIAL_CELL_DEGREES))
+        columns = sorted({column % _CELL_COLUMNS for column in range(first, last + 1)})
+    return [row * _CELL_COLUMNS + column for row in rows for column in columns]
 
 
 def calculate_distance(lat1, lon1, lat2, lon2):
@@ -18,10 +93,178 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
     c = 2 * math.asin(math.sqrt(a))
     
-    # Radius of earth in miles
-    r = 3959
+    return c * EARTH_RADIUS_MILES
+
+
+def distance_expression(lat, lon, lat_field='latitude', lon_field='longitude'):
+    """
+    Build a database expression for the Haversine distance in miles between
+    a point and each row's coordinate fields.
+    """
+    center_lat = math.radians(float(lat))
+    center_lon = math.radians(float(lon))
+    row_lat = Radians(Cast(F(lat_field), FloatField()))
+    row_lon = Radians(Cast(F(lon_field), FloatField()))
+
+    a = (
+        Power(Sin((row_lat - Value(center_lat)) / Value(2.0)), 2) +
+        Value(math.cos(center_lat)) * Cos(row_lat) *
+        Power(Sin((row_lon - Value(center_lon)) / Value(2.0)), 2)
+    )
+    # Clamp rounding error so ASIN stays in its domain
+    return Value(2.0 * EARTH_RADIUS_MILES) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+def filter_queryset_by_radius(queryset, lat, lon, radius_miles, lat_field='latitude',
+                              lon_field='longitude', cell_field=None):
+    """
+    Narrow a queryset to rows within radius_miles of a point, in the database.
+    
+    Rows are prefiltered by bounding box (and spatial cell, when the model
+    stores one) so the indexes do the work, then checked against the exact
+    distance. The result has a `distance` annotation and is ordered by it.
+    """
+    return filter_queryset_by_centers(queryset, [(lat, lon)], radius_miles, lat_field, lon_field, cell_field)
+
+
+def filter_queryset_by_centers(queryset, centers, radius_miles, lat_field='latitude',
+                               lon_field='longitude', cell_field=None):
+    """
+    Narrow a queryset to rows within radius_miles of any of several points.
+    
+    Works like filter_queryset_by_radius with the union of the centers'
+    bounding boxes and cells as the prefilter. `distance` is the distance
+    to the nearest center.
+    """
+    box_query = Q()
+    cells = set()
+    for lat, lon in centers:
+        min_lat, max_lat, min_lon, max_lon = get_bounding_box(lat, lon, radius_miles)
+        center_box = Q(**{f'{lat_field}__range': (min_lat, max_lat)})
+        # Boxes that cross the antimeridian are left to the cell and exact checks
+        if min_lon >= -180 and max_lon <= 180:
+            center_box &= Q(**{f'{lon_field}__range': (min_lon, max_lon)})
+        box_query |= center_box
+        cells.update(get_cells_for_bounding_box(min_lat, max_lat, min_lon, max_lon))
+
+    queryset = queryset.filter(**{
+        f'{lat_field}__isnull': False,
+        f'{lon_field}__isnull': False,
+    }).filter(box_query)
+    if cell_field and len(cells) <= MAX_PREFILTER_CELLS:
+        queryset = queryset.filter(**{f'{cell_field}__in': sorted(cells)})
+
+    distances = [distance_expression(lat, lon, lat_field, lon_field) for lat, lon in centers]
+    distance = distances[0] if len(distances) == 1 else Least(*distances)
+    return (
+        queryset
+        .annotate(distance=distance)
+        .filter(distance__lte=float(radius_miles))
+        .order_by('distance')
+    )
+
+
+def parse_coordinate_list(value):
+    """
+    Parse "lat,lon;lat,lon;..." into a list of (lat, lon) float pairs.
+    
+    Raises ValueError for malformed pairs or out-of-range coordinates.
+    """
+    points = []
+    for pair in (value or '').split(';'):
+        if not pair.strip():
+            continue
+        lat, lon = (float(part) for part in pair.split(','))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Coordinates out of range: {pair}")
+        points.append((lat, lon))
+    return points
+
+
+def points_in_polygon(points, polygon):
+    """
+    Return whether each (lat, lon) point lies inside a polygon, as a list of bools.
     
-    return c * r
+    Uses the even-odd rule on plain latitude/longitude, which is accurate
+    enough for city- and region-sized areas; polygons crossing the
+    antimeridian are not supported. The test runs edge by edge over all
+    points at once: points are sorted by latitude so each edge only looks
+    at the band of points its latitude range spans.
+    """
+    order = sorted(range(len(points)), key=lambda index: float(points[index][0]))
+    lats = [float(points[index][0]) for index in order]
+    lons = [float(points[index][1]) for index in order]
+    inside = [False] * len(points)
+
+    for (lat1, lon1), (lat2, lon2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if lat1 == lat2:
+            # Edges parallel to the ray never cross it
+            continue
+        slope = (lon2 - lon1) / (lat2 - lat1)
+        # A ray eastward from the point crosses the edge when the point's
+        # latitude is in [low, high) and it lies west of the edge
+        for position in range(bisect_left(lats, min(lat1, lat2)), bisect_left(lats, max(lat1, lat2))):
+            if lons[position] < lon1 + (lats[position] - lat1) * slope:
+                index = order[position]
+                inside[index] = not inside[index]
+
+    return inside
+
+
+def polygon_crossings(polygon, lat_field='latitude', lon_field='longitude'):
+    """
+    A database expression counting how many polygon edges a ray eastward from
+    each row's point crosses; the point is inside when the count is odd.
+
+    The same even-odd test as `points_in_polygon`, one CASE per edge, so the
+    filter runs in the database without loading candidate rows.
+    """
+    lat = Cast(lat_field, FloatField())
+    lon = Cast(lon_field, FloatField())
+    crossings = []
+    for (lat1, lon1), (lat2, lon2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if lat1 == lat2:
+            continue
+        slope = (lon2 - lon1) / (lat2 - lat1)
+        edge_lon = ExpressionWrapper(
+            Value(float(lon1)) + (lat - Value(float(lat1))) * Value(float(slope)), output_field=FloatField()
+        )
+        crossings.append(Case(
+            When(
+                GreaterThanOrEqual(lat, float(min(lat1, lat2))) & LessThan(lat, float(max(lat1, lat2)))
+                & LessThan(lon, edge_lon),
+                then=Value(1),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    return reduce(operator.add, crossings, Value(0))
+
+
+def filter_queryset_by_polygon(queryset, polygon, lat_field='latitude', lon_field='longitude', cell_field=None):
+    """
+    Narrow a queryset to rows whose coordinates fall inside a polygon of (lat, lon) vertices.
+    
+    The polygon's bounding box (and spatial cells, when the model stores
+    them) narrows the candidates through the indexes, and the exact
+    point-in-polygon test runs in the same query (see `polygon_crossings`).
+    """
+    min_lat = min(lat for lat, _ in polygon)
+    max_lat = max(lat for lat, _ in polygon)
+    min_lon = min(lon for _, lon in polygon)
+    max_lon = max(lon for _, lon in polygon)
+    candidates = queryset.filter(**{
+        f'{lat_field}__range': (min_lat, max_lat),
+        f'{lon_field}__range': (min_lon, max_lon),
+    })
+    if cell_field:
+        cells = get_cells_for_bounding_box(min_lat, max_lat, min_lon, max_lon)
+        if len(cells) <= MAX_PREFILTER_CELLS:
+            candidates = candidates.filter(**{f'{cell_field}__in': cells})
+
+    return candidates.alias(polygon_parity=Mod(polygon_crossings(polygon, lat_field, lon_field), 2)).filter(
+        polygon_parity=1
+    )
 
 
 def filter_jobs_by_distance(jobs, user_lat, user_lon, max_distance_miles):
@@ -8,9 +8,18 @@ from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.conf import settings
 
+from accounts import notifications
+from jobs.application_board import get_applicant_board, get_job_board
+from jobs.funnel import get_funnel_stages
 from jobs.recommendations import get_recommended_jobs
-from jobs.utils import filter_jobs_by_distance, get_jobs_with_distances
-from .models import Job, Application
+from jobs.utils import (
+    filter_jobs_by_distance,
+    filter_queryset_by_centers,
+    filter_queryset_by_polygon,
+    get_jobs_with_distances,
+)
+from jobs.salary_histogram import filter_jobs_by_salary, get_salary_histogram
+from .models import Job, Application, JobFunnel
 from .forms import JobForm, JobSearchForm
 
 def job_list(request):
@@ -83,42 +92,58 @@ def job_list(request):
         salary_min = search_form.cleaned_data.get('salary_min')
         salary_max = search_form.cleaned_data.get('salary_max')
         
-        if salary_min:
-            # Jobs where salary_min >= user's min OR salary_max >= user's min
-            jobs = jobs.filter(
-                models.Q(salary_min__gte=salary_min) |
-                models.Q(salary_max__gte=salary_min) |
-                models.Q(salary_min__isnull=True, salary_max__gte=salary_min)
-            )
-        
-        if salary_max:
-            # Jobs where salary_max <= user's max OR salary_min <= user's max
-            jobs = jobs.filter(
-                models.Q(salary_max__lte=salary_max) |
-                models.Q(salary_min__lte=salary_max) |
-                models.Q(salary_max__isnull=True, salary_min__lte=salary_max)
-            )
+        # Indexed bucket lookup, exact comparison only in the boundary bucket
+        jobs = filter_jobs_by_salary(jobs, salary_min, salary_max)
         
         # Visa sponsorship filter
         visa_sponsorship = search_form.cleaned_data.get('visa_sponsorship')
         if visa_sponsorship:
             jobs = jobs.filter(visa_sponsorship=True)
+        
+        # Map search areas: inside the drawn polygon and/or near any of the chosen centers
+        search_polygon = search_form.cleaned_data.get('search_polygon')
+        if search_polygon:
+            jobs = filter_queryset_by_polygon(jobs, search_polygon, cell_field='geo_cell')
+        
+        search_centers = search_form.cleaned_data.get('search_centers')
+        if search_centers:
+            center_radius = search_form.cleaned_data.get('center_radius') or '20'
+            jobs = filter_queryset_by_centers(jobs, search_centers, center_radius, cell_field='geo_cell')
+    else:
+        # A malformed filter (e.g. a bad map area) shows its error and no jobs, not every job
+        jobs = jobs.none()
+    
+    # Salary slider histogram for the selected job type and experience level
+    salary_histogram = []
+    if search_form.is_valid():
+        salary_histogram = get_salary_histogram(
+            search_form.cleaned_data.get('job_type'),
+            search_form.cleaned_data.get('experience_level'),
+        )
     
     # Distance filtering (applied after other filters)
     distance_radius = None
     user_commute_preference = None
     
+    job_seeker_profile = None
+    
     # Check if user is authenticated and has a job seeker profile with commute preference
     if request.user.is_authenticated:
         try:
             if request.user.profile.is_job_seeker:
-                user_commute_preference = request.user.profile.job_seeker_profile.commute_radius
+                job_seeker_profile = request.user.profile.job_seeker_profile
+                user_commute_preference = job_seeker_profile.commute_radius
         except:
             pass
     
     if search_form.is_valid():
         distance_radius = search_form.cleaned_data.get('distance_radius')
     
+    # Without a browser location, measure a chosen distance from the seeker's geocoded profile location
+    if distance_radius and not (user_lat and user_lon) and job_seeker_profile and job_seeker_profile.has_coordinates:
+        user_lat = job_seeker_profile.latitude
+        user_lon = job_seeker_profile.longitude
+    
     # Auto-apply user's commute preference if they have location but no distance filter set
     if user_lat and user_lon and not distance_radius and user_commute_preference:
         distance_radius = str(user_commute_preference)
@@ -171,6 +196,7 @@ def job_list(request):
         'user_location': {'lat': user_lat, 'lng': user_lon} if user_lat and user_lon else None,
         'user_commute_preference': user_commute_preference,
         'using_commute_preference': bool(user_lat and user_lon and distance_radius and str(distance_radius) == str(user_commute_preference)),
+        'salary_histogram': salary_histogram,
     }
     
     return render(request, 'jobs/job_list.html', {
@@ -247,13 +273,9 @@ def my_jobs(request):
         messages.error(request, 'Profile not found. Please contact support.')
         return redirect('home.index')
     
+    # Application counts are columns on the job (see jobs.application_counters)
     jobs = Job.objects.filter(posted_by=request.user).order_by('-created_at')
     
-    # Add application counts to each job
-    for job in jobs:
-        job.application_count = Application.objects.filter(job=job).count()
-        job.new_applications_count = Application.objects.filter(job=job, status='applied').count()
-    
     template_data = {
         'title': 'My Job Postings',
         'jobs': jobs,
@@ -343,31 +365,49 @@ def job_applications(request, job_id):
         return redirect('home.index')
     
     job = get_object_or_404(Job, id=job_id, posted_by=request.user)
-    applications = Application.objects.filter(job=job).select_related('applicant', 'applicant__profile', 'applicant__profile__job_seeker_profile')
-    
-    # Group applications by status for board layout (ordered)
-    status_groups = []
-    for status_code, status_name in Application.APPLICATION_STATUS:
-        status_applications = applications.filter(status=status_code)
-        status_groups.append({
-            'code': status_code,
-            'name': status_name,
-            'applications': status_applications,
-            'color': Application.STATUS_COLORS.get(status_code, 'secondary'),
-            'count': status_applications.count()
-        })
+    # One query for the applications, grouped by status for the board layout (ordered)
+    board = get_job_board(job)
     
     template_data = {
         'title': f'Applications for {job.title}',
         'job': job,
-        'applications': applications,
-        'status_groups': status_groups,
-        'total_applications': applications.count(),
+        'applications': board.applications,
+        'status_groups': board.status_groups,
+        'total_applications': board.total,
     }
     
     return render(request, 'jobs/job_applications.html', {'template_data': template_data})
 
 
+@login_required
+def job_funnel(request, job_id):
+    """Show a job's hiring funnel: conversion and median time per stage (recruiters only)"""
+    # Check if user is a recruiter
+    try:
+        if not request.user.profile.is_recruiter:
+            messages.error(request, 'Only recruiters can view hiring funnels.')
+            return redirect('jobs.list')
+    except:
+        messages.error(request, 'Profile not found. Please contact support.')
+        return redirect('home.index')
+    
+    # The funnel summary is kept up to date as applications move, so this is one lookup
+    job = get_object_or_404(Job.objects.select_related('funnel'), id=job_id, posted_by=request.user)
+    try:
+        funnel = job.funnel
+    except JobFunnel.DoesNotExist:
+        funnel = None
+    
+    template_data = {
+        'title': f'Hiring Funnel for {job.title}',
+        'job': job,
+        'stages': get_funnel_stages(funnel),
+        'total_applications': funnel.applied_count if funnel else 0,
+    }
+    
+    return render(request, 'jobs/job_funnel.html', {'template_data': template_data})
+
+
 @login_required
 def my_applications(request):
     """Display job applications for the current job seeker"""
@@ -380,25 +420,17 @@ def my_applications(request):
         messages.error(request, 'Profile not found. Please contact support.')
         return redirect('home.index')
     
-    applications = Application.objects.filter(applicant=request.user).select_related('job')
-    
-    # Group applications by status for board layout (ordered)
-    status_groups = []
-    for status_code, status_name in Application.APPLICATION_STATUS:
-        status_applications = applications.filter(status=status_code)
-        status_groups.append({
-            'code': status_code,
-            'name': status_name,
-            'applications': status_applications,
-            'color': Application.STATUS_COLORS.get(status_code, 'secondary'),
-            'count': status_applications.count()
-        })
+    # The seeker is looking at their applications, so status changes are no longer new
+    notifications.reset(request.user, 'application_updates')
+
+    # One query for the applications, grouped by status for the board layout (ordered)
+    board = get_applicant_board(request.user)
     
     template_data = {
         'title': 'My Applications',
-        'applications': applications,
-        'status_groups': status_groups,
-        'total_applications': applications.count(),
+        'applications': board.applications,
+        'status_groups': board.status_groups,
+        'total_applications': board.total,
     }
     
     return render(request, 'jobs/my_applications.html', {'template_data': template_data})
@@ -3,6 +3,12 @@ ASGI config for jobsite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to hold the live message stream open without
+tying up a worker per browser tab, and set MESSAGE_STREAM_ENABLED=True:
+
+    pip install uvicorn
+    MESSAGE_STREAM_ENABLED=True uvicorn jobsite.asgi:application --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
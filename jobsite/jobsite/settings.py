@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'candidates.middleware.GeocodingBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'jobsite.urls'
@@ -72,6 +73,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.notification_counts',
+                'messaging.context_processors.message_updates',
             ],
         },
     },
@@ -149,3 +152,56 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', '')
+
+# Job salary histogram bucket width in dollars
+# Run `python manage.py rebuild_salary_histogram` after changing it
+SALARY_BUCKET_WIDTH = int(os.environ.get('SALARY_BUCKET_WIDTH', '10000'))
+
+# Candidate location geocoding
+# Lookups run in `python manage.py process_geocoding_queue`, never inside a request
+GEOCODING_BACKEND = os.environ.get('GEOCODING_BACKEND', 'candidates.location_utils._fetch_coordinates_from_api')
+GEOCODING_RATE_LIMIT = float(os.environ.get('GEOCODING_RATE_LIMIT', '1'))  # requests per second
+GEOCODING_MAX_ATTEMPTS = int(os.environ.get('GEOCODING_MAX_ATTEMPTS', '5'))
+GEOCODING_CACHE_SIZE = int(os.environ.get('GEOCODING_CACHE_SIZE', '2048'))  # per-process LRU entries
+GEOCODING_CACHE_TTL = int(os.environ.get('GEOCODING_CACHE_TTL', '600'))  # seconds
+GEOCODING_NEGATIVE_CACHE_TTL = int(os.environ.get('GEOCODING_NEGATIVE_CACHE_TTL', '120'))  # seconds
+
+# Offline gazetteer consulted before the remote geocoder
+# Build it with `python manage.py build_gazetteer [cities.csv]`; set
+# GEOCODING_BACKEND to 'candidates.gazetteer.lookup' to never leave the network
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(BASE_DIR, 'candidates', 'data', 'gazetteer.idx'))
+
+# Circuit breaker and time budgets around the remote geocoder
+# State and counters are served to superusers at /candidates/geocoder/metrics/
+GEOCODING_TIMEOUT = float(os.environ.get('GEOCODING_TIMEOUT', '10'))  # seconds per call
+GEOCODING_REQUEST_BUDGET = float(os.environ.get('GEOCODING_REQUEST_BUDGET', '2'))  # seconds per web request
+GEOCODER_BREAKER_THRESHOLD = int(os.environ.get('GEOCODER_BREAKER_THRESHOLD', '5'))  # consecutive failures
+GEOCODER_BREAKER_COOLDOWN = int(os.environ.get('GEOCODER_BREAKER_COOLDOWN', '60'))  # seconds before a probe
+
+# Live message stream (server-sent events)
+# Only enable it when the site is served by an ASGI server, e.g.
+#   pip install uvicorn && uvicorn jobsite.asgi:application --workers 2
+# Under WSGI (runserver, gunicorn's sync workers) each open stream would hold a
+# worker, so pages instead poll messaging:poll every MESSAGE_POLL_INTERVAL
+# seconds. Stream connections are woken in-process on new messages and poll
+# the database for events from other workers every MESSAGE_STREAM_POLL_INTERVAL seconds
+MESSAGE_STREAM_ENABLED = os.environ.get('MESSAGE_STREAM_ENABLED', 'False') == 'True'
+MESSAGE_POLL_INTERVAL = float(os.environ.get('MESSAGE_POLL_INTERVAL', '30'))
+MESSAGE_STREAM_POLL_INTERVAL = float(os.environ.get('MESSAGE_STREAM_POLL_INTERVAL', '5'))
+MESSAGE_STREAM_KEEPALIVE = float(os.environ.get('MESSAGE_STREAM_KEEPALIVE', '15'))
+MESSAGE_STREAM_MAX_DURATION = float(os.environ.get('MESSAGE_STREAM_MAX_DURATION', '300'))
+MESSAGE_EVENT_RETENTION_DAYS = int(os.environ.get('MESSAGE_EVENT_RETENTION_DAYS', '2'))
+
+# Recipient autocomplete: matches returned per lookup and seconds each prefix stays cached
+USER_AUTOCOMPLETE_LIMIT = int(os.environ.get('USER_AUTOCOMPLETE_LIMIT', '10'))
+USER_AUTOCOMPLETE_CACHE_TTL = int(os.environ.get('USER_AUTOCOMPLETE_CACHE_TTL', '30'))
+
+# Most candidates one bulk message from candidate search may go to
+BULK_MESSAGE_MAX_RECIPIENTS = int(os.environ.get('BULK_MESSAGE_MAX_RECIPIENTS', '500'))
+
+# Background data exports (python manage.py run_data_exports --loop)
+# Finished files are kept in DATA_EXPORT_ROOT, which is not served publicly;
+# superusers download them through the admin dashboard
+DATA_EXPORT_ROOT = os.environ.get('DATA_EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+DATA_EXPORT_SNAPSHOT_LAG = int(os.environ.get('DATA_EXPORT_SNAPSHOT_LAG', '60'))  # seconds left for in-flight writes
+DATA_EXPORT_STALE_AFTER = int(os.environ.get('DATA_EXPORT_STALE_AFTER', '21600'))  # seconds before a running export is failed
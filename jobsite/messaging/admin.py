@@ -1,4 +1,7 @@
 from django.contrib import admin
-from .models import Message
+from .models import Message, Thread, ThreadParticipant, UserDirectoryEntry
 
-admin.site.register(Message)
\ No newline at end of file
+admin.site.register(Message)
+admin.site.register(Thread)
+admin.site.register(ThreadParticipant)
+admin.site.register(UserDirectoryEntry)
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    """A migration that made SQLite rebuild the messages table drops the search index's triggers"""
+    from messaging.search import ensure_search_triggers
+    ensure_search_triggers(connections[using])
 
 
 class MessagingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'messaging'
+
+    def ready(self):
+        from messaging import signals  # noqa: F401
+        post_migrate.connect(restore_search_triggers, sender=self)
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+DEFAULT_MESSAGE_POLL_INTERVAL = 30
+
+
+def message_updates(request):
+    """Tell the base template whether to open the live message stream or poll for new messages."""
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'message_updates': {
+            'stream': getattr(settings, 'MESSAGE_STREAM_ENABLED', False),
+            'poll_interval_ms': int(getattr(settings, 'MESSAGE_POLL_INTERVAL', DEFAULT_MESSAGE_POLL_INTERVAL) * 1000),
+        }
+    }
@@ -0,0 +1,191 @@
+"""
+Recipient autocomplete over the UserDirectoryEntry token index.
+
+Every active user has one row per normalized name token, so a typed prefix
+becomes an indexed range scan on ``token`` that stops at a small limit.
+Matches the searching user has recently corresponded with are listed
+first, and both the shared prefix matches and each user's correspondents
+are cached for a short time, since autocomplete asks again on every
+keystroke.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef
+
+from .models import ThreadParticipant, UserDirectoryEntry
+
+User = get_user_model()
+
+DEFAULT_USER_AUTOCOMPLETE_LIMIT = 10
+DEFAULT_USER_AUTOCOMPLETE_CACHE_TTL = 30
+RECENT_CORRESPONDENT_LIMIT = 50
+# Rows fetched per correspondent lookup before collapsing users in several threads
+CANDIDATE_MULTIPLIER = 3
+TOKEN_MAX_LENGTH = UserDirectoryEntry._meta.get_field('token').max_length
+
+
+def normalize_token(value):
+    return (value or '').strip().casefold()[:TOKEN_MAX_LENGTH]
+
+
+def user_tokens(user):
+    """Return the normalized name tokens a user can be found by."""
+    tokens = {normalize_token(user.username)}
+    for name in (user.first_name, user.last_name):
+        tokens.update(normalize_token(part) for part in (name or '').split())
+    tokens.discard('')
+    return tokens
+
+
+def sync_user_directory(user):
+    """Bring a user's directory tokens in line with their current names."""
+    tokens = user_tokens(user) if user.is_active else set()
+    existing = set(UserDirectoryEntry.objects.filter(user=user).values_list('token', flat=True))
+    with transaction.atomic():
+        if existing - tokens:
+            UserDirectoryEntry.objects.filter(user=user, token__in=existing - tokens).delete()
+        UserDirectoryEntry.objects.bulk_create(
+            [UserDirectoryEntry(user=user, token=token) for token in tokens - existing],
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_user_directory(batch_size=2000):
+    """Recreate the whole directory from the user table and return the number of tokens."""
+    UserDirectoryEntry.objects.all().delete()
+    total = 0
+    batch = []
+    for user in User.objects.filter(is_active=True).only('id', 'username', 'first_name', 'last_name').iterator(chunk_size=batch_size):
+        batch.extend(UserDirectoryEntry(user_id=user.pk, token=token) for token in user_tokens(user))
+        if len(batch) >= batch_size:
+            UserDirectoryEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    UserDirectoryEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    return total + len(batch)
+
+
+def get_autocomplete_limit():
+    return int(getattr(settings, 'USER_AUTOCOMPLETE_LIMIT', DEFAULT_USER_AUTOCOMPLETE_LIMIT))
+
+
+def get_autocomplete_cache_ttl():
+    return int(getattr(settings, 'USER_AUTOCOMPLETE_CACHE_TTL', DEFAULT_USER_AUTOCOMPLETE_CACHE_TTL))
+
+
+def _prefix_filter(prefix):
+    # A range rather than startswith, so the token index is used regardless of
+    # how the database implements case-insensitive LIKE
+    return {'token__gte': prefix, 'token__lt': prefix + '\U0010ffff'}
+
+
+def _cache_key(kind, value):
+    digest = hashlib.md5(str(value).encode('utf-8')).hexdigest()
+    return f'messaging:directory:{kind}:{digest}'
+
+
+def _user_label(user):
+    full_name = f"{user['first_name']} {user['last_name']}".strip()
+    return f"{full_name} ({user['username']})" if full_name else user['username']
+
+
+def _serialize_users(user_ids):
+    users = User.objects.filter(pk__in=user_ids, is_active=True).values('id', 'username', 'first_name', 'last_name')
+    by_id = {user['id']: user for user in users}
+    return [
+        {
+            'id': by_id[user_id]['id'],
+            'label': _user_label(by_id[user_id]),
+            'value': by_id[user_id]['username'],
+        }
+        for user_id in user_ids if user_id in by_id
+    ]
+
+
+def _matching_entries(words):
+    """
+    Directory rows for the longest word's prefix whose user also has a token
+    for every other word, so the whole term is matched in SQL before any limit.
+    """
+    lead = max(words, key=len)
+    entries = UserDirectoryEntry.objects.filter(**_prefix_filter(lead))
+    others = list(words)
+    others.remove(lead)
+    for word in others:
+        entries = entries.filter(Exists(
+            UserDirectoryEntry.objects.filter(user_id=OuterRef('user_id'), **_prefix_filter(word))
+        ))
+    return entries
+
+
+def _prefix_matches(words, limit):
+    """Return the first ``limit`` users matching every word, in token order, cached per term."""
+    key = _cache_key('prefix', (tuple(words), limit))
+    matches = cache.get(key)
+    if matches is None:
+        rows = (
+            _matching_entries(words).values('user_id').annotate(first_token=Min('token'))
+            .order_by('first_token', 'user_id')[:limit]
+        )
+        matches = _serialize_users([row['user_id'] for row in rows])
+        cache.set(key, matches, get_autocomplete_cache_ttl())
+    return matches
+
+
+def get_recent_correspondents(user):
+    """Return the ids of the users ``user`` most recently exchanged messages with, newest first."""
+    key = _cache_key('correspondents', user.pk)
+    correspondents = cache.get(key)
+    if correspondents is None:
+        rows = (
+            ThreadParticipant.objects.filter(thread__participants__user=user)
+            .exclude(user=user)
+            .order_by('-last_message_at')
+            .values_list('user_id', flat=True)[:RECENT_CORRESPONDENT_LIMIT * CANDIDATE_MULTIPLIER]
+        )
+        correspondents = []
+        for user_id in rows:
+            if user_id not in correspondents:
+                correspondents.append(user_id)
+        correspondents = correspondents[:RECENT_CORRESPONDENT_LIMIT]
+        cache.set(key, correspondents, get_autocomplete_cache_ttl())
+    return correspondents
+
+
+def _correspondent_matches(words, correspondents):
+    if not correspondents:
+        return []
+    matched = set(_matching_entries(words).filter(user_id__in=correspondents).values_list('user_id', flat=True))
+    return _serialize_users([user_id for user_id in correspondents if user_id in matched])
+
+
+def search_users(user, term, limit=None):
+    """
+    Return up to ``limit`` autocomplete entries for users matching ``term``.
+
+    Each word of the term must prefix-match one of the user's name tokens.
+    Recent correspondents come first, then other matches in token order.
+    """
+    limit = limit or get_autocomplete_limit()
+    words = [normalize_token(word) for word in term.split()]
+    words = [word for word in words if word]
+    if not words:
+        return []
+
+    # One extra match in case the searching user is among them
+    candidates = _correspondent_matches(words, get_recent_correspondents(user)) + _prefix_matches(words, limit + 1)
+
+    results = []
+    seen = {user.pk}
+    for candidate in candidates:
+        if candidate['id'] in seen:
+            continue
+        seen.add(candidate['id'])
+        results.append(candidate)
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,87 @@
+"""
+Live message events for the per-user server-sent events stream.
+
+Events are rows in `MessageEvent`, so every worker can read them. Publishing
+also wakes any stream connections for those users in this process, so they
+don't wait for their next database poll.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import MessageEvent
+
+
+class EventBroker:
+    """In-process wake-ups for stream connections, keyed by user id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = defaultdict(set)
+
+    def subscribe(self, user_id):
+        """Register the running event loop's listener and return it; await ``listener[1].wait()``."""
+        listener = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._listeners[user_id].add(listener)
+        return listener
+
+    def unsubscribe(self, user_id, listener):
+        with self._lock:
+            listeners = self._listeners.get(user_id)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[user_id]
+
+    def notify(self, user_ids):
+        """Wake the listeners of the given users. Safe to call from any thread."""
+        with self._lock:
+            listeners = [listener for user_id in user_ids for listener in self._listeners.get(user_id, ())]
+        for loop, waiter in listeners:
+            try:
+                loop.call_soon_threadsafe(waiter.set)
+            except RuntimeError:
+                # The connection's event loop has already shut down
+                pass
+
+
+broker = EventBroker()
+
+
+def publish_events(events):
+    """
+    Store (user_id, kind, payload) events and wake their listeners once the transaction commits.
+    """
+    events = list(events)
+    if not events:
+        return
+    MessageEvent.objects.bulk_create([
+        MessageEvent(user_id=user_id, kind=kind, payload=payload) for user_id, kind, payload in events
+    ])
+    user_ids = {user_id for user_id, _, _ in events}
+    transaction.on_commit(lambda: broker.notify(user_ids))
+
+
+def get_latest_event_id(user_id):
+    return MessageEvent.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def get_events_after(user_id, event_id, limit=100):
+    return list(
+        MessageEvent.objects.filter(user_id=user_id, id__gt=event_id).order_by('id')
+        .values('id', 'kind', 'payload')[:limit]
+    )
+
+
+def format_sse(kind, payload, event_id=None):
+    """Format one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(payload)}")
+    return "\n".join(lines) + "\n\n"
@@ -1,5 +1,11 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from accounts.models import JobSeekerProfile, UserProfile
+from candidates.models import SavedCandidateSearch
+from candidates.utils import perform_candidate_search
 from .models import Message
 
 User = get_user_model()
@@ -32,4 +38,66 @@ class MessageForm(forms.ModelForm):
         else:
             self.fields['recipient'].required = True
             self.fields['recipient'].widget = forms.HiddenInput()
-            self.fields['recipient'].queryset = User.objects.exclude(id=self.initial.get('sender_id'))
\ No newline at end of file
+            self.fields['recipient'].queryset = User.objects.exclude(id=self.initial.get('sender_id'))
+
+DEFAULT_BULK_MESSAGE_MAX_RECIPIENTS = 500
+
+
+def get_bulk_message_max_recipients():
+    return int(getattr(settings, 'BULK_MESSAGE_MAX_RECIPIENTS', DEFAULT_BULK_MESSAGE_MAX_RECIPIENTS))
+
+
+def get_bulk_recipients(recruiter, candidates=(), saved_search=None):
+    """
+    Return the users behind a selection of candidates and/or the current matches of a saved search.
+
+    Only public profiles are included, and never the recruiter themselves.
+    """
+    profiles = JobSeekerProfile.objects.filter(profile_visibility='public')
+    selection = Q(job_seeker_profile__in=profiles.filter(pk__in=[candidate.pk for candidate in candidates]))
+    if saved_search is not None:
+        matches = perform_candidate_search(
+            saved_search.search_input, saved_search.skills, saved_search.location, saved_search.projects
+        )
+        selection |= Q(job_seeker_profile__in=matches.order_by().values('pk'))
+    user_profiles = UserProfile.objects.filter(selection)
+    return User.objects.filter(profile__in=user_profiles, is_active=True).exclude(pk=recruiter.pk)
+
+
+class BulkMessageForm(forms.Form):
+    """A message sent as a separate thread to each selected candidate or saved search match."""
+    candidates = forms.ModelMultipleChoiceField(
+        queryset=JobSeekerProfile.objects.filter(profile_visibility='public'),
+        required=False,
+        widget=forms.MultipleHiddenInput(),
+    )
+    saved_search = forms.ModelChoiceField(
+        queryset=SavedCandidateSearch.objects.none(),
+        required=False,
+        widget=forms.HiddenInput(),
+    )
+    subject = forms.CharField(max_length=255, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    body = forms.CharField(widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 5}))
+
+    def __init__(self, *args, recruiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recruiter = recruiter
+        self.fields['saved_search'].queryset = SavedCandidateSearch.objects.filter(recruiter__user=recruiter)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        candidates = cleaned_data.get('candidates') or []
+        saved_search = cleaned_data.get('saved_search')
+        if not candidates and saved_search is None:
+            raise forms.ValidationError("Select at least one candidate or a saved search.")
+
+        recipients = list(get_bulk_recipients(self.recruiter, candidates, saved_search))
+        max_recipients = get_bulk_message_max_recipients()
+        if not recipients:
+            raise forms.ValidationError("None of the selected candidates can be messaged.")
+        if len(recipients) > max_recipients:
+            raise forms.ValidationError(
+                f"A bulk message can go to at most {max_recipients} candidates; {len(recipients)} are selected."
+            )
+        cleaned_data['recipients'] = recipients
+        return cleaned_data
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from messaging.models import MessageEvent
+
+
+class Command(BaseCommand):
+    help = "Delete live message stream events older than MESSAGE_EVENT_RETENTION_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Keep events from this many days (defaults to MESSAGE_EVENT_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'MESSAGE_EVENT_RETENTION_DAYS', 2)
+        deleted, _ = MessageEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} message event(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from messaging.search import install_search_index, search_available
+
+
+class Command(BaseCommand):
+    help = "Recreate the message full-text search index and its triggers"
+
+    def handle(self, *args, **options):
+        if not search_available():
+            self.stdout.write(self.style.WARNING("Message search needs SQLite FTS5; nothing to do."))
+            return
+        install_search_index()
+        self.stdout.write(self.style.SUCCESS("Message search index rebuilt."))
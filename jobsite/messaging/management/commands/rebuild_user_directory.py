@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from messaging.directory import rebuild_user_directory
+
+
+class Command(BaseCommand):
+    help = "Recreate the recipient autocomplete directory from the user table"
+
+    def handle(self, *args, **options):
+        total = rebuild_user_directory()
+        self.stdout.write(self.style.SUCCESS(f"User directory rebuilt with {total} tokens."))
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_threads(apps, schema_editor):
+    """Group existing messages into threads by their root message and fill in the summaries"""
+    Message = apps.get_model('messaging', 'Message')
+    Thread = apps.get_model('messaging', 'Thread')
+    ThreadParticipant = apps.get_model('messaging', 'ThreadParticipant')
+
+    messages = list(Message.objects.order_by('timestamp', 'id'))
+    parents = {message.id: message.parent_message_id for message in messages}
+
+    def root_id(message_id):
+        while parents.get(message_id):
+            message_id = parents[message_id]
+        return message_id
+
+    by_root = {}
+    for message in messages:
+        by_root.setdefault(root_id(message.id), []).append(message)
+
+    subjects = {message.id: message.subject for message in messages}
+    for root, thread_messages in by_root.items():
+        last_message = thread_messages[-1]
+        thread = Thread.objects.create(
+            subject=subjects.get(root, last_message.subject),
+            last_message=last_message,
+            last_message_at=last_message.timestamp,
+            message_count=len(thread_messages),
+        )
+        Message.objects.filter(id__in=[message.id for message in thread_messages]).update(thread=thread)
+
+        participants = {}
+        for message in thread_messages:
+            sender = participants.setdefault(message.sender_id, ThreadParticipant(thread=thread, user_id=message.sender_id))
+            sender.has_sent = True
+            recipient = participants.setdefault(
+                message.recipient_id, ThreadParticipant(thread=thread, user_id=message.recipient_id)
+            )
+            if message.recipient_id != message.sender_id:
+                recipient.has_received = True
+                if not message.is_read:
+                    recipient.unread_count += 1
+        for participant in participants.values():
+            participant.last_message_at = last_message.timestamp
+        ThreadParticipant.objects.bulk_create(participants.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thread',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='messaging.thread'),
+        ),
+        migrations.CreateModel(
+            name='ThreadParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('has_sent', models.BooleanField(default=False)),
+                ('has_received', models.BooleanField(default=False)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='messaging.thread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_threads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'has_received', '-last_message_at'], name='messaging_received_idx'), models.Index(fields=['user', 'has_sent', '-last_message_at'], name='messaging_sent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('thread', 'user'), name='messaging_unique_thread_participant')],
+            },
+        ),
+        migrations.RunPython(build_threads, migrations.RunPython.noop),
+    ]
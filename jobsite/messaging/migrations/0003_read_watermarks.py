@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_read_watermarks(apps, schema_editor):
+    """Place each participant's watermark just before the first message they have not read"""
+    Message = apps.get_model('messaging', 'Message')
+    ThreadParticipant = apps.get_model('messaging', 'ThreadParticipant')
+
+    messages_by_thread = {}
+    for message in Message.objects.exclude(thread=None).order_by('id'):
+        messages_by_thread.setdefault(message.thread_id, []).append(message)
+
+    participants = list(ThreadParticipant.objects.all())
+    for participant in participants:
+        watermark = None
+        for message in messages_by_thread.get(participant.thread_id, []):
+            if message.recipient_id == participant.user_id and message.sender_id != participant.user_id \
+                    and not message.is_read:
+                break
+            watermark = message
+        participant.last_read_message_id = watermark.id if watermark else None
+        participant.last_read_at = watermark.timestamp if watermark else None
+    ThreadParticipant.objects.bulk_update(participants, ['last_read_message', 'last_read_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.RunPython(set_read_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='threadparticipant',
+            name='unread_count',
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:05
+
+from django.db import migrations
+
+# Frozen copy of the index and trigger SQL as of this migration; the runtime
+# copy in messaging.search may change without changing what this installs
+FTS_TABLE = 'messaging_message_fts'
+PARTICIPANTS_SQL = "'u' || {row}.sender_id || ' u' || {row}.recipient_id"
+
+INSTALL_SQL = [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"subject, body, participants, tokenize = 'unicode61 remove_diacritics 2')",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON messaging_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, subject, body, participants) "
+    f"VALUES (new.id, new.subject, new.body, {PARTICIPANTS_SQL.format(row='new')}); END",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF subject, body, sender_id, recipient_id "
+    f"ON messaging_message BEGIN "
+    f"UPDATE {FTS_TABLE} SET subject = new.subject, body = new.body, "
+    f"participants = {PARTICIPANTS_SQL.format(row='new')} WHERE rowid = old.id; END",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON messaging_message BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+    f"INSERT INTO {FTS_TABLE}(rowid, subject, body, participants) "
+    f"SELECT id, subject, body, {PARTICIPANTS_SQL.format(row='messaging_message')} FROM messaging_message",
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only; other databases go without message search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_message_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(INSTALL_SQL), run_sql(UNINSTALL_SQL)),
+    ]
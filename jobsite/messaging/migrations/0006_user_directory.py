@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_user_directory(apps, schema_editor):
+    """Index the name tokens of every active user for recipient autocomplete"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserDirectoryEntry = apps.get_model('messaging', 'UserDirectoryEntry')
+
+    max_length = UserDirectoryEntry._meta.get_field('token').max_length
+    entries = []
+    for user in User.objects.filter(is_active=True).iterator():
+        tokens = {(user.username or '').strip().casefold()}
+        for name in (user.first_name, user.last_name):
+            tokens.update(part.casefold() for part in (name or '').split())
+        tokens.discard('')
+        entries.extend(UserDirectoryEntry(user_id=user.pk, token=token[:max_length]) for token in tokens)
+    UserDirectoryEntry.objects.bulk_create(entries, batch_size=2000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_message_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDirectoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=150)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='directory_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'user'), name='messaging_unique_directory_token')],
+            },
+        ),
+        migrations.RunPython(build_user_directory, migrations.RunPython.noop),
+    ]
@@ -3,14 +3,108 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class Thread(models.Model):
+    """A conversation: a root message and its replies, with a summary of the latest message."""
+    subject = models.CharField(max_length=255)
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.subject
+
+
+class ThreadParticipant(models.Model):
+    """
+    A user's view of a thread: which inbox tabs it belongs in and how far they have read.
+
+    The thread is unread while its last message is newer than the
+    participant's ``last_read_message`` watermark.
+    """
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_threads')
+    has_sent = models.BooleanField(default=False)
+    has_received = models.BooleanField(default=False)
+    last_read_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    # Copy of Thread.last_message_at so the inbox is one indexed query per user
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['thread', 'user'], name='messaging_unique_thread_participant'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'has_received', '-last_message_at'], name='messaging_received_idx'),
+            models.Index(fields=['user', 'has_sent', '-last_message_at'], name='messaging_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.thread}"
+
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     parent_message = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
+    thread = models.ForeignKey(Thread, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
     subject = models.CharField(max_length=255)
     body = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of a thread, newest first
+            models.Index(fields=['thread', '-timestamp', '-id'], name='messaging_thread_time_idx'),
+            # Incremental analytics exports select messages sent in a time window
+            models.Index(fields=['timestamp'], name='messaging_message_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"From {self.sender} to {self.recipient}: {self.subject}"
+
+
+class MessageEvent(models.Model):
+    """
+    A change pushed to one user's live message stream.
+
+    Stream connections are woken in-process when events are published, and
+    also poll this table so events published by other workers still arrive.
+    """
+    KIND_CHOICES = [
+        ('message', 'New message'),
+        ('unread', 'Unread count changed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='messaging_event_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user}"
+
+
+class UserDirectoryEntry(models.Model):
+    """
+    One normalized name token (username, first or last name) of an active user.
+
+    Recipient autocomplete matches prefixes against the indexed ``token``
+    column instead of scanning the user table with ``icontains``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='directory_entries')
+    token = models.CharField(max_length=150)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'user'], name='messaging_unique_directory_token'),
+        ]
 
     def __str__(self):
-        return f"From {self.sender} to {self.recipient}: {self.subject}"
\ No newline at end of file
+        return f"{self.token} -> {self.user}"
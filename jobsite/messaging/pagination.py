@@ -0,0 +1,81 @@
+"""
+Keyset pagination for message lists.
+
+Pages walk backwards through a ``(timestamp, id)`` ordering. A cursor names
+the last row a client has seen, so fetching the next page is an indexed
+range query whose cost does not grow with how far back the user has
+scrolled, unlike OFFSET pagination.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(timestamp, pk):
+    value = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(timestamp, id)`` pair in a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        timestamp, pk = value.rsplit('|', 1)
+        timestamp = datetime.fromisoformat(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, timezone.utc)
+    return timestamp, pk
+
+
+class KeysetPage:
+    """One page of rows, newest first, and the cursor for the page after it."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def keyset_paginate(queryset, time_field, cursor=None, per_page=20):
+    """
+    Return the page of ``queryset`` after ``cursor``, newest first.
+
+    Rows are ordered by ``time_field`` then primary key, both descending,
+    which should match an index on the filtered queryset. Rows with no
+    timestamp are never listed.
+    """
+    queryset = queryset.filter(**{f'{time_field}__isnull': False}).order_by(f'-{time_field}', '-pk')
+    position = decode_cursor(cursor)
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__lt': timestamp}) | Q(**{time_field: timestamp, 'pk__lt': pk})
+        )
+
+    # One extra row tells us whether there is another page without a COUNT
+    rows = list(queryset[:per_page + 1])
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, time_field), last.pk)
+    return KeysetPage(items, next_cursor)
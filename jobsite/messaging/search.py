@@ -0,0 +1,233 @@
+"""
+Full-text search over a user's messages.
+
+Messages are indexed in an SQLite FTS5 table kept current by triggers on
+``messaging_message``, so every save, update and delete is reflected
+without application code. Each row also indexes its participants as
+``u<user id>`` tokens, so a search is scoped to the user inside the index
+and never scans the messages table.
+
+SQLite rebuilds a table when a migration alters it, which drops its
+triggers. `ensure_search_triggers` runs after every ``migrate`` and puts
+missing triggers back, reindexing the messages when it had to.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'messaging_message_fts'
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+_PARTICIPANTS_SQL = "'u' || {row}.sender_id || ' u' || {row}.recipient_id"
+
+TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON messaging_message BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, subject, body, participants) "
+        f"VALUES (new.id, new.subject, new.body, {_PARTICIPANTS_SQL.format(row='new')}); END"
+    ),
+    f'{FTS_TABLE}_update': (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF subject, body, sender_id, recipient_id "
+        f"ON messaging_message BEGIN "
+        f"UPDATE {FTS_TABLE} SET subject = new.subject, body = new.body, "
+        f"participants = {_PARTICIPANTS_SQL.format(row='new')} WHERE rowid = old.id; END"
+    ),
+    f'{FTS_TABLE}_delete': (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON messaging_message BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+}
+
+REINDEX_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"INSERT INTO {FTS_TABLE}(rowid, subject, body, participants) "
+    f"SELECT id, subject, body, {_PARTICIPANTS_SQL.format(row='messaging_message')} FROM messaging_message",
+]
+
+INSTALL_SQL = [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"subject, body, participants, tokenize = 'unicode61 remove_diacritics 2')",
+    *[f"DROP TRIGGER IF EXISTS {name}" for name in TRIGGERS],
+    *TRIGGERS.values(),
+    *REINDEX_SQL,
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def search_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install_search_index(using=connection):
+    """(Re)create the FTS table and its triggers and index every existing message."""
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def missing_search_triggers(using=connection):
+    """Names of the index's sync triggers that aren't in the database."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'messaging_message'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+    return [name for name in TRIGGERS if name not in existing]
+
+
+def ensure_search_triggers(using=connection):
+    """
+    Recreate any sync triggers a table rebuild dropped, and reindex the
+    messages since the index may have missed changes meanwhile.
+
+    Does nothing until the search migration has created the index. Returns
+    the names of the triggers it recreated.
+    """
+    if not search_available(using) or FTS_TABLE not in using.introspection.table_names():
+        return []
+    missing = missing_search_triggers(using)
+    if missing:
+        with using.cursor() as cursor:
+            for name in missing:
+                cursor.execute(TRIGGERS[name])
+            for statement in REINDEX_SQL:
+                cursor.execute(statement)
+    return missing
+
+
+def uninstall_search_index(using=connection):
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in UNINSTALL_SQL:
+            cursor.execute(statement)
+
+
+def build_match_query(user_id, text):
+    """
+    Turn free text into an FTS5 query limited to one participant, or None if there are no terms.
+
+    Every word must appear, and the last one may be a prefix so results
+    follow the user's typing.
+    """
+    terms = re.findall(r'\w+', text or '')[:10]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return f'participants:u{int(user_id)} AND {{subject body}}: ({" ".join(quoted)})'
+
+
+def highlight(snippet):
+    """Escape a snippet and mark the matched terms."""
+    return mark_safe(
+        escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+    )
+
+
+class ThreadSearchResults:
+    """
+    Ranked thread hits for a search, one per thread, sliceable for Paginator.
+
+    Each hit is the best-ranked matching message in its thread, with a
+    highlighted snippet of its body (or subject, when only that matched).
+    """
+
+    def __init__(self, user, text):
+        self.match = build_match_query(user.pk, text) if search_available() else None
+        self._count = None
+
+    def count(self):
+        if self.match is None:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT COUNT(DISTINCT m.thread_id) FROM {FTS_TABLE} f "
+                    f"JOIN messaging_message m ON m.id = f.rowid WHERE {FTS_TABLE} MATCH %s",
+                    [self.match],
+                )
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if self.match is None:
+            return []
+        start = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count()) - start
+        if limit <= 0:
+            return []
+
+        # snippet() only works in a plain FTS query, so pick each thread's best
+        # message first and highlight just that page of messages afterwards.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH hits AS (
+                    SELECT rowid AS message_id, bm25({FTS_TABLE}, 4.0, 1.0, 0.0) AS rank
+                    FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                )
+                SELECT thread_id, message_id, thread_subject FROM (
+                    SELECT m.thread_id, hits.message_id, t.subject AS thread_subject, hits.rank,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY m.thread_id ORDER BY hits.rank, hits.message_id DESC
+                           ) AS thread_rank
+                    FROM hits
+                    JOIN messaging_message m ON m.id = hits.message_id
+                    JOIN messaging_thread t ON t.id = m.thread_id
+                )
+                WHERE thread_rank = 1
+                ORDER BY rank, message_id DESC
+                LIMIT %s OFFSET %s
+                """,
+                [self.match, limit, start],
+            )
+            rows = cursor.fetchall()
+            snippets = self._snippets(cursor, [message_id for _, message_id, _ in rows])
+
+        return [
+            {
+                'thread_id': thread_id,
+                'message_id': message_id,
+                'subject': subject,
+                'snippet': snippets.get(message_id, ''),
+            }
+            for thread_id, message_id, subject in rows
+        ]
+
+    def _snippets(self, cursor, message_ids):
+        if not message_ids:
+            return {}
+        snippet_args = f"'{SNIPPET_START}', '{SNIPPET_END}', '…', 16"
+        placeholders = ', '.join(['%s'] * len(message_ids))
+        cursor.execute(
+            f"SELECT rowid, snippet({FTS_TABLE}, 1, {snippet_args}), snippet({FTS_TABLE}, 0, {snippet_args}) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})",
+            [self.match, *message_ids],
+        )
+        return {
+            message_id: highlight(body_snippet if SNIPPET_START in body_snippet else subject_snippet)
+            for message_id, body_snippet, subject_snippet in cursor.fetchall()
+        }
+
+
+def search_threads(user, text):
+    """Return the user's threads matching ``text``, best match first."""
+    return ThreadSearchResults(user, text)
@@ -0,0 +1,204 @@
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import notifications
+from home import rollups
+
+from .events import publish_events
+from .models import Message, Thread, ThreadParticipant
+
+
+def get_root_message(message):
+    """Return the message that started the thread a message belongs to."""
+    while message.parent_message_id:
+        message = message.parent_message
+    return message
+
+
+@transaction.atomic
+def send_message(sender, recipient, subject, body, parent_message=None):
+    """
+    Create a message and update its thread summary in one transaction.
+
+    A reply joins the thread of its parent and takes the thread's subject;
+    any other message starts a new thread.
+    """
+    if parent_message is not None:
+        root_message = get_root_message(parent_message)
+        # Lock the thread so concurrent replies apply their summaries in order
+        thread = Thread.objects.select_for_update().get(pk=root_message.thread_id)
+        subject = thread.subject
+        # Participants whose unread thread count already includes this thread
+        unread_user_ids = set(
+            ThreadParticipant.objects.filter(unread_condition(), thread=thread, has_received=True)
+            .values_list('user_id', flat=True)
+        )
+    else:
+        root_message = None
+        thread = Thread.objects.create(subject=subject)
+        unread_user_ids = set()
+
+    message = Message.objects.create(
+        sender=sender,
+        recipient=recipient,
+        parent_message=root_message,
+        thread=thread,
+        subject=subject,
+        body=body,
+    )
+
+    Thread.objects.filter(pk=thread.pk).update(
+        last_message=message,
+        last_message_at=message.timestamp,
+        message_count=F('message_count') + 1,
+    )
+
+    existing_user_ids = set(
+        ThreadParticipant.objects.filter(thread=thread, user_id__in=[sender.pk, recipient.pk])
+        .values_list('user_id', flat=True)
+    )
+    ThreadParticipant.objects.bulk_create([
+        ThreadParticipant(thread=thread, user_id=user_id)
+        for user_id in {sender.pk, recipient.pk} - existing_user_ids
+    ])
+
+    # The sender has read everything up to their own message
+    ThreadParticipant.objects.filter(thread=thread, user=sender).update(
+        has_sent=True, last_message_at=message.timestamp,
+        last_read_message=message, last_read_at=message.timestamp,
+    )
+    if recipient.pk != sender.pk:
+        ThreadParticipant.objects.filter(thread=thread, user=recipient).update(
+            has_received=True, last_message_at=message.timestamp,
+        )
+
+    if sender.pk in unread_user_ids:
+        notifications.decrement(sender, 'unread_messages')
+    if recipient.pk != sender.pk and recipient.pk not in unread_user_ids:
+        notifications.increment(recipient, 'unread_messages')
+    rollups.record('messages_sent', day=rollups.event_day(message.timestamp))
+
+    payload = message_event_payload(message)
+    events = [(sender.pk, 'message', payload)]
+    if recipient.pk != sender.pk:
+        events += [
+            (recipient.pk, 'message', payload),
+            (recipient.pk, 'unread', {'unread_threads': count_unread_threads(recipient)}),
+        ]
+    publish_events(events)
+
+    return message
+
+
+@transaction.atomic
+def send_bulk_messages(sender, recipients, subject, body, batch_size=500):
+    """
+    Start a new thread with each recipient in a fixed number of queries.
+
+    Threads, messages and participants are inserted with ``bulk_create``
+    rather than one ``send_message`` per recipient, and the recipients'
+    stream notifications are queued as a single batch of events that their
+    live connections pick up after the transaction commits. Returns the
+    created messages.
+    """
+    recipients = list({recipient.pk: recipient for recipient in recipients if recipient.pk != sender.pk}.values())
+    if not recipients:
+        return []
+
+    threads = Thread.objects.bulk_create(
+        [Thread(subject=subject, message_count=1) for _ in recipients], batch_size=batch_size
+    )
+    messages = Message.objects.bulk_create(
+        [
+            Message(sender=sender, recipient=recipient, thread=thread, subject=subject, body=body)
+            for recipient, thread in zip(recipients, threads)
+        ],
+        batch_size=batch_size,
+    )
+
+    for thread, message in zip(threads, messages):
+        thread.last_message = message
+        thread.last_message_at = message.timestamp
+    Thread.objects.bulk_update(threads, ['last_message', 'last_message_at'], batch_size=batch_size)
+
+    participants = []
+    for message in messages:
+        participants += [
+            # The sender has read everything up to their own message
+            ThreadParticipant(
+                thread_id=message.thread_id, user=sender, has_sent=True, last_message_at=message.timestamp,
+                last_read_message=message, last_read_at=message.timestamp,
+            ),
+            ThreadParticipant(
+                thread_id=message.thread_id, user_id=message.recipient_id, has_received=True,
+                last_message_at=message.timestamp,
+            ),
+        ]
+    ThreadParticipant.objects.bulk_create(participants, batch_size=batch_size)
+    notifications.increment(recipients, 'unread_messages')
+    rollups.record('messages_sent', amount=len(messages))
+
+    unread_counts = dict(
+        ThreadParticipant.objects.filter(unread_condition(), has_received=True, user__in=recipients)
+        .values('user').annotate(total=Count('id')).values_list('user', 'total')
+    )
+    events = []
+    for message in messages:
+        payload = message_event_payload(message)
+        events += [
+            (sender.pk, 'message', payload),
+            (message.recipient_id, 'message', payload),
+            (message.recipient_id, 'unread', {'unread_threads': unread_counts.get(message.recipient_id, 0)}),
+        ]
+    publish_events(events)
+
+    return messages
+
+
+def message_event_payload(message):
+    """Return what live clients need to show a new message without reloading."""
+    return {
+        'thread_id': message.thread_id,
+        'message_id': message.id,
+        'subject': message.subject,
+        'sender': message.sender.username,
+        'recipient': message.recipient.username,
+        'body': message.body,
+        'timestamp': message.timestamp.isoformat(),
+        'url': reverse('messaging:view_message', args=[message.id]),
+    }
+
+
+def unread_condition(prefix=''):
+    """Q matching ThreadParticipant rows whose thread has a message past their read watermark."""
+    return Q(**{f'{prefix}thread__last_message_id__gt': Coalesce(F(f'{prefix}last_read_message_id'), 0)})
+
+
+def with_unread_flag(participants):
+    """Annotate a ThreadParticipant QuerySet with an ``is_unread`` boolean."""
+    return participants.annotate(is_unread=ExpressionWrapper(unread_condition(), output_field=BooleanField()))
+
+
+def count_unread_threads(user):
+    """Return how many of a user's received threads have unread messages."""
+    return ThreadParticipant.objects.filter(unread_condition(), user=user, has_received=True).count()
+
+
+def mark_thread_read(thread, user):
+    """
+    Move a user's read watermark up to the thread's last message.
+
+    A single UPDATE, which only touches the row when the watermark moves
+    forward, so concurrent opens never move it back.
+    """
+    if thread.last_message_id is None:
+        return
+    updated = ThreadParticipant.objects.filter(thread=thread, user=user).filter(
+        Q(last_read_message_id__isnull=True) | Q(last_read_message_id__lt=thread.last_message_id)
+    ).update(last_read_message_id=thread.last_message_id, last_read_at=timezone.now())
+    if updated:
+        notifications.decrement(user, 'unread_messages')
+        publish_events([(user.pk, 'unread', {'unread_threads': count_unread_threads(user)})])
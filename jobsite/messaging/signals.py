@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .directory import sync_user_directory
+
+User = get_user_model()
+
+DIRECTORY_FIELDS = {'username', 'first_name', 'last_name', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def update_user_directory(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the user's autocomplete tokens in step with their names"""
+    if raw:
+        return
+    # Logins save only last_login, which never changes the tokens
+    if update_fields is not None and not DIRECTORY_FIELDS.intersection(update_fields):
+        return
+    sync_user_directory(instance)
@@ -1,3 +1,430 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import JobSeekerProfile, UserProfile
+from candidates.models import SavedCandidateSearch
+from messaging.directory import search_users
+from messaging.pagination import decode_cursor, encode_cursor
+from messaging.events import broker
+from messaging.search import FTS_TABLE, missing_search_triggers, search_threads
+from messaging.models import Message, MessageEvent, Thread, ThreadParticipant, UserDirectoryEntry
+from messaging.services import count_unread_threads, mark_thread_read, send_bulk_messages, send_message
+
+
+class ThreadSummaryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.bob = User.objects.create_user(username="bob", password="pass1234")
+
+    def test_compose_and_reply_update_thread_summary(self):
+        first = send_message(self.alice, self.bob, "Interview", "Are you free Monday?")
+        send_message(self.alice, self.bob, "Interview", "Or Tuesday?", parent_message=first)
+        reply = send_message(self.bob, self.alice, "ignored", "Tuesday works", parent_message=first)
+
+        thread = Thread.objects.get()
+        self.assertEqual(thread.subject, "Interview")
+        self.assertEqual(thread.last_message, reply)
+        self.assertEqual(thread.message_count, 3)
+        self.assertEqual(reply.subject, "Interview")
+        self.assertEqual(reply.parent_message, first)
+
+        alice = ThreadParticipant.objects.get(user=self.alice)
+        bob = ThreadParticipant.objects.get(user=self.bob)
+        self.assertEqual((alice.has_sent, alice.has_received), (True, True))
+        self.assertEqual((bob.has_sent, bob.has_received), (True, True))
+        self.assertEqual(bob.last_message_at, reply.timestamp)
+        # Sending moves the sender's read watermark to their own message
+        self.assertEqual(bob.last_read_message, reply)
+        self.assertEqual(count_unread_threads(self.alice), 1)
+        self.assertEqual(count_unread_threads(self.bob), 0)
+
+    def test_inbox_lists_threads_newest_first(self):
+        older = send_message(self.alice, self.bob, "Older", "Hello")
+        send_message(self.alice, self.bob, "Newer", "Hello again")
+        send_message(self.bob, self.alice, "", "Replying", parent_message=older)
+
+        self.client.login(username="bob", password="pass1234")
+        # No COUNT queries: each tab is a single keyset page, and the navbar reads the notification counters
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('messaging:inbox'))
+            received = [participant.thread.subject for participant in response.context['received_threads']]
+            sent = [participant.thread.subject for participant in response.context['sent_threads']]
+
+        self.assertEqual(received, ["Older", "Newer"])
+        self.assertEqual(sent, ["Older"])
+
+    def test_opening_thread_moves_read_watermark(self):
+        message = send_message(self.alice, self.bob, "Offer", "Good news")
+        self.assertEqual(count_unread_threads(self.bob), 1)
+
+        self.client.login(username="bob", password="pass1234")
+        response = self.client.get(reverse('messaging:view_message', args=[message.id]))
+
+        self.assertEqual([msg.body for msg in response.context['thread_messages']], ["Good news"])
+        self.assertEqual(ThreadParticipant.objects.get(user=self.bob).last_read_message, message)
+        self.assertEqual(count_unread_threads(self.bob), 0)
+
+        response = self.client.post(reverse('messaging:view_message', args=[message.id]), {'body': "Thanks!"})
+        self.assertRedirects(response, reverse('messaging:view_message', args=[message.id]))
+        self.assertEqual(Message.objects.filter(thread=message.thread).count(), 2)
+        self.assertEqual(count_unread_threads(self.alice), 1)
+
+    def test_watermark_never_moves_back(self):
+        first = send_message(self.alice, self.bob, "Offer", "Good news")
+        stale_thread = Thread.objects.get()
+        send_message(self.alice, self.bob, "", "More news", parent_message=first)
+        mark_thread_read(Thread.objects.get(), self.bob)
+
+        with self.assertNumQueries(1):
+            mark_thread_read(stale_thread, self.bob)
+
+        self.assertEqual(ThreadParticipant.objects.get(user=self.bob).last_read_message, Thread.objects.get().last_message)
+
+
+@override_settings(MESSAGE_STREAM_ENABLED=True, MESSAGE_STREAM_POLL_INTERVAL=0.05, MESSAGE_STREAM_MAX_DURATION=0.2)
+class MessageStreamTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.bob = User.objects.create_user(username="bob", password="pass1234")
+
+    def read_stream(self, **headers):
+        self.client.login(username="bob", password="pass1234")
+        response = self.client.get(reverse('messaging:stream'), **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return async_to_sync(self.collect)(response.streaming_content)
+
+    @staticmethod
+    async def collect(streaming_content):
+        return b"".join([chunk async for chunk in streaming_content]).decode()
+
+    def test_sending_publishes_events_and_wakes_listeners(self):
+        woken = []
+        broker.notify = woken.append
+        self.addCleanup(lambda: delattr(broker, 'notify'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_message(self.alice, self.bob, "Hello", "Hi Bob")
+
+        self.assertEqual(
+            sorted(MessageEvent.objects.values_list('user__username', 'kind')),
+            [("alice", "message"), ("bob", "message"), ("bob", "unread")],
+        )
+        self.assertEqual(MessageEvent.objects.get(user=self.bob, kind='unread').payload, {'unread_threads': 1})
+        self.assertEqual(woken, [{self.alice.pk, self.bob.pk}])
+
+    def test_stream_replays_events_after_last_event_id(self):
+        message = send_message(self.alice, self.bob, "Hello", "Hi Bob")
+        first_event = MessageEvent.objects.filter(user=self.bob).order_by('id').first()
+
+        stream = self.read_stream(HTTP_LAST_EVENT_ID=str(first_event.id - 1))
+
+        self.assertIn('event: unread\ndata: {"unread_threads": 1}', stream)
+        self.assertIn(f"id: {first_event.id}\nevent: message", stream)
+        self.assertIn(f'"message_id": {message.id}', stream)
+
+    def test_new_connection_starts_after_existing_events(self):
+        send_message(self.alice, self.bob, "Hello", "Hi Bob")
+
+        stream = self.read_stream()
+
+        self.assertIn("event: unread", stream)
+        self.assertNotIn("event: message", stream)
+
+    @override_settings(MESSAGE_STREAM_ENABLED=False, MESSAGE_STREAM_MAX_DURATION=300, MESSAGE_POLL_INTERVAL=30)
+    def test_stream_answers_once_when_not_enabled(self):
+        message = send_message(self.alice, self.bob, "Hello", "Hi Bob")
+        first_event = MessageEvent.objects.filter(user=self.bob).order_by('id').first()
+
+        started = time.monotonic()
+        stream = self.read_stream(HTTP_LAST_EVENT_ID=str(first_event.id - 1))
+
+        # Under WSGI the connection must not hold a worker for MESSAGE_STREAM_MAX_DURATION
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(stream.startswith("retry: 30000"))
+        self.assertIn(f'"message_id": {message.id}', stream)
+
+    @override_settings(MESSAGE_STREAM_ENABLED=False)
+    def test_pages_poll_when_stream_is_not_enabled(self):
+        self.client.login(username="bob", password="pass1234")
+        response = self.client.get(reverse('messaging:poll'))
+        self.assertEqual(response.json(), {'events': [], 'last_event_id': 0})
+
+        send_message(self.alice, self.bob, "Hello", "Hi Bob")
+        events = self.client.get(reverse('messaging:poll'), {'after': 0}).json()['events']
+        self.assertEqual(sorted(event['kind'] for event in events), ["message", "unread"])
+        last_event_id = max(event['id'] for event in events)
+        self.assertEqual(
+            self.client.get(reverse('messaging:poll'), {'after': last_event_id}).json(),
+            {'events': [], 'last_event_id': last_event_id},
+        )
+
+        page = self.client.get(reverse('messaging:inbox'))
+        self.assertContains(page, reverse('messaging:poll'))
+        self.assertNotContains(page, "new EventSource")
+        with self.settings(MESSAGE_STREAM_ENABLED=True):
+            self.assertContains(self.client.get(reverse('messaging:inbox')), "new EventSource")
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.bob = User.objects.create_user(username="bob", password="pass1234")
+        self.carol = User.objects.create_user(username="carol", password="pass1234")
+
+    def test_results_are_ranked_per_thread_and_scoped_to_participant(self):
+        interview = send_message(self.alice, self.bob, "Interview schedule", "Can we meet on Monday?")
+        send_message(self.bob, self.alice, "", "Monday at 10 works for the interview", parent_message=interview)
+        lunch = send_message(self.alice, self.bob, "Lunch", "Team lunch after the Monday standup")
+        send_message(self.alice, self.carol, "Interview", "Your interview is on Monday")
+
+        hits = search_threads(self.bob, "interview mond")
+
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0:10][0]["thread_id"], interview.thread_id)
+        self.assertIn("<mark>", hits[0:1][0]["snippet"])
+
+        self.assertEqual(
+            {hit["thread_id"] for hit in search_threads(self.bob, "monday")[0:10]},
+            {interview.thread_id, lunch.thread_id},
+        )
+        self.assertEqual(len(search_threads(self.carol, "lunch")), 0)
+
+    def test_index_follows_edits_and_deletes(self):
+        message = send_message(self.alice, self.bob, "Offer", "Salary details attached")
+        Message.objects.filter(pk=message.pk).update(body="Benefits details attached")
+
+        self.assertEqual(len(search_threads(self.bob, "salary")), 0)
+        self.assertEqual(len(search_threads(self.bob, "benefits")), 1)
+
+        message.delete()
+        self.assertEqual(len(search_threads(self.bob, "benefits")), 0)
+
+    def test_sync_triggers_are_installed(self):
+        self.assertEqual(missing_search_triggers(), [])
+
+    def test_migrate_restores_triggers_dropped_by_a_table_rebuild(self):
+        message = send_message(self.alice, self.bob, "Offer", "Salary details attached")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {FTS_TABLE}_update")
+        Message.objects.filter(pk=message.pk).update(body="Benefits details attached")
+        self.assertEqual(len(search_threads(self.bob, "benefits")), 0)
+
+        messaging = apps.get_app_config('messaging')
+        post_migrate.send(
+            sender=messaging, app_config=messaging, verbosity=0, interactive=False, using='default', apps=apps, plan=[]
+        )
+
+        self.assertEqual(missing_search_triggers(), [])
+        # Changes made while the trigger was gone are picked up by the reindex
+        self.assertEqual(len(search_threads(self.bob, "benefits")), 1)
+        Message.objects.filter(pk=message.pk).update(body="Relocation details attached")
+        self.assertEqual(len(search_threads(self.bob, "relocation")), 1)
+
+    def test_search_endpoint_escapes_snippets(self):
+        send_message(self.alice, self.bob, "Question", "Is <b>remote</b> work possible?")
+        self.client.login(username="bob", password="pass1234")
+
+        data = self.client.get(reverse('messaging:search_messages'), {'q': 'remote', 'format': 'json'}).json()
+
+        self.assertEqual(data["count"], 1)
+        self.assertIn("&lt;b&gt;<mark>remote</mark>&lt;/b&gt;", data["results"][0]["snippet"])
+        self.assertEqual(self.client.get(reverse('messaging:search_messages'), {'q': '"*'}).status_code, 200)
+
+
+class UserAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.jordan = User.objects.create_user(username="jordan", first_name="Jordan", last_name="Lee", password="pass1234")
+        self.jo = User.objects.create_user(username="jo_smith", first_name="Jo", last_name="Smith", password="pass1234")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_directory_tracks_user_names(self):
+        self.assertEqual(
+            set(UserDirectoryEntry.objects.filter(user=self.jordan).values_list('token', flat=True)),
+            {"jordan", "lee"},
+        )
+        self.jordan.last_name = "Park"
+        self.jordan.save()
+        self.assertEqual(
+            set(UserDirectoryEntry.objects.filter(user=self.jordan).values_list('token', flat=True)),
+            {"jordan", "park"},
+        )
+        self.jordan.is_active = False
+        self.jordan.save()
+        self.assertFalse(UserDirectoryEntry.objects.filter(user=self.jordan).exists())
+
+    def test_prefix_matches_are_limited_and_rank_correspondents_first(self):
+        for number in range(5):
+            User.objects.create_user(username=f"joe{number}", password="pass1234")
+        send_message(self.alice, self.jo, "Hello", "Hi Jo")
+
+        results = search_users(self.alice, "JO", limit=3)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], {"id": self.jo.id, "label": "Jo Smith (jo_smith)", "value": "jo_smith"})
+        self.assertEqual([result["value"] for result in search_users(self.alice, "jo le")], ["jordan"])
+        self.assertEqual(search_users(self.alice, "ali"), [])
+
+    def test_every_word_is_matched_before_the_limit(self):
+        for number in range(12):
+            User.objects.create_user(username=f"smith{number:02d}", last_name="Smith", password="pass1234")
+        john = User.objects.create_user(username="zz_john", first_name="John", last_name="Smith", password="pass1234")
+
+        # More than limit * 3 users share the "smith" token ahead of John's
+        self.assertEqual([result["id"] for result in search_users(self.alice, "jo smith", limit=3)], [self.jo.id, john.id])
+
+    def test_endpoint_returns_cached_prefix_matches(self):
+        self.client.login(username="alice", password="pass1234")
+        url = reverse('messaging:search_users')
+
+        self.assertEqual([user["value"] for user in self.client.get(url, {'term': 'smi'}).json()], ["jo_smith"])
+        with self.assertNumQueries(2):
+            # Session and user lookups only; the prefix and correspondents come from the cache
+            self.client.get(url, {'term': 'smi'})
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass1234")
+        self.bob = User.objects.create_user(username="bob", password="pass1234")
+        self.client.login(username="bob", password="pass1234")
+
+    def test_cursor_round_trip_and_garbage(self):
+        message = send_message(self.alice, self.bob, "Hi", "Hello")
+        self.assertEqual(decode_cursor(encode_cursor(message.timestamp, message.id)), (message.timestamp, message.id))
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+
+    @mock.patch('messaging.views.INBOX_PAGE_SIZE', 2)
+    def test_inbox_pages_follow_cursor(self):
+        for number in range(5):
+            send_message(self.alice, self.bob, f"Thread {number}", "Hello")
+
+        seen = []
+        url = reverse('messaging:inbox') + '?format=json'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(thread["subject"] for thread in data["threads"])
+            url = data["next"]
+        self.assertEqual(seen, [f"Thread {number}" for number in range(4, -1, -1)])
+
+        response = self.client.get(reverse('messaging:inbox'))
+        older_url = response.context['received_older_url']
+        fragment = self.client.get(older_url + '&fragment=1')
+        self.assertContains(fragment, "Thread 2")
+        self.assertNotContains(fragment, "Thread 4")
+        self.assertTrue(fragment['X-Next-Page'])
+
+    @mock.patch('messaging.views.THREAD_PAGE_SIZE', 2)
+    def test_thread_shows_newest_messages_and_loads_older(self):
+        first = send_message(self.alice, self.bob, "Long thread", "Message 0")
+        for number in range(1, 5):
+            send_message(self.alice, self.bob, "", f"Message {number}", parent_message=first)
+
+        response = self.client.get(reverse('messaging:view_message', args=[first.id]))
+        self.assertEqual([message.body for message in response.context['thread_messages']], ["Message 3", "Message 4"])
+
+        fragment = self.client.get(response.context['older_messages_url'] + '&fragment=1')
+        self.assertEqual([message.body for message in fragment.context['thread_messages']], ["Message 1", "Message 2"])
+
+        data = self.client.get(fragment['X-Next-Page'].replace('?', '?format=json&', 1)).json()
+        self.assertEqual([message["body"] for message in data["messages"]], ["Message 0"])
+        self.assertIsNone(data["next"])
+
+
+class BulkMessageTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create_user(username="recruiter", password="pass1234")
+        UserProfile.objects.create(user=self.recruiter, user_type='recruiter')
+        self.candidates = [self.create_candidate(f"seeker{number}", "Atlanta, GA") for number in range(3)]
+        self.private = self.create_candidate("private", "Atlanta, GA", profile_visibility='private')
+        self.client.login(username="recruiter", password="pass1234")
+
+    def create_candidate(self, username, location, **fields):
+        user = User.objects.create_user(username=username, password="pass1234")
+        user_profile = UserProfile.objects.create(user=user, user_type='job_seeker')
+        return JobSeekerProfile.objects.create(user_profile=user_profile, location=location, **fields)
+
+    def test_bulk_send_uses_constant_queries(self):
+        recipients = [candidate.user_profile.user for candidate in self.candidates]
+        seeker = recipients[0]
+        send_message(self.recruiter, seeker, "Earlier", "Hello")
+
+        # Threads, messages, thread summaries, participants, unread counts, the daily rollup and events,
+        # in a savepoint, plus creating the notification counters of the two candidates who didn't have one yet
+        with self.assertNumQueries(13):
+            sent = send_bulk_messages(self.recruiter, recipients + [self.recruiter], "Opening", "We are hiring")
+
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(Thread.objects.filter(subject="Opening", message_count=1).count(), 3)
+        thread = sent[0].thread
+        thread.refresh_from_db()
+        self.assertEqual(thread.last_message, sent[0])
+        self.assertEqual(count_unread_threads(seeker), 2)
+        self.assertEqual(count_unread_threads(self.recruiter), 0)
+        self.assertEqual(
+            MessageEvent.objects.filter(user=seeker, kind='unread').latest('id').payload, {'unread_threads': 2}
+        )
+
+    def test_bulk_compose_sends_to_selection_and_saved_search(self):
+        other = self.create_candidate("faraway", "Boston, MA")
+        saved_search = SavedCandidateSearch.objects.create(
+            recruiter=self.recruiter.profile, search_input="", location="Atlanta"
+        )
+        url = reverse('messaging:bulk_compose')
+
+        response = self.client.get(url, {'saved_search': saved_search.id, 'candidates': [other.id]})
+        self.assertEqual(response.context['recipient_count'], 4)
+
+        response = self.client.post(url, {
+            'saved_search': saved_search.id,
+            'candidates': [other.id, self.private.id],
+            'subject': "Opening",
+            'body': "We are hiring",
+        })
+        # Private profiles can't be picked
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('candidates', response.context['form'].errors)
+
+        # A failed send still shows how many candidates the rest of the selection reaches
+        response = self.client.post(url, {'saved_search': saved_search.id, 'candidates': [other.id], 'body': "Hi"})
+        self.assertIn('subject', response.context['form'].errors)
+        self.assertEqual(response.context['recipient_count'], 4)
+
+        response = self.client.post(url, {
+            'saved_search': saved_search.id,
+            'candidates': [other.id],
+            'subject': "Opening",
+            'body': "We are hiring",
+        })
+        self.assertRedirects(response, reverse('messaging:inbox') + '?tab=sent')
+        self.assertEqual(
+            set(Message.objects.filter(subject="Opening").values_list('recipient__username', flat=True)),
+            {"seeker0", "seeker1", "seeker2", "faraway"},
+        )
+
+    @override_settings(BULK_MESSAGE_MAX_RECIPIENTS=2)
+    def test_bulk_compose_limits_recipients(self):
+        response = self.client.post(reverse('messaging:bulk_compose'), {
+            'candidates': [candidate.id for candidate in self.candidates],
+            'subject': "Opening",
+            'body': "We are hiring",
+        })
+        self.assertContains(response, "at most 2 candidates")
+        self.assertFalse(Message.objects.exists())
+
+    def test_only_recruiters_can_bulk_message(self):
+        self.client.login(username="seeker0", password="pass1234")
+        response = self.client.get(reverse('messaging:bulk_compose'))
+        self.assertRedirects(response, reverse('home.index'), fetch_redirect_response=False)
@@ -6,7 +6,11 @@ app_name = 'messaging'
 urlpatterns = [
     path('inbox/', views.inbox, name='inbox'),
     path('compose/', views.compose_message, name='compose_message'),
+    path('compose/bulk/', views.bulk_compose, name='bulk_compose'),
     path('compose/<int:recipient_id>/', views.compose_message, name='compose_message'),
     path('view/<int:message_id>/', views.view_message, name='view_message'),
+    path('search/', views.search_messages, name='search_messages'),
     path('search_users/', views.search_users, name='search_users'),
+    path('stream/', views.message_stream, name='stream'),
+    path('poll/', views.poll_messages, name='poll'),
 ]
\ No newline at end of file
@@ -1,61 +1,92 @@
+import asyncio
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.http import JsonResponse
-from .models import Message
-from .forms import MessageForm
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from .models import Message, ThreadParticipant
+from . import directory
+from .context_processors import DEFAULT_MESSAGE_POLL_INTERVAL
+from .forms import BulkMessageForm, MessageForm, get_bulk_message_max_recipients, get_bulk_recipients
+from .events import broker, format_sse, get_events_after, get_latest_event_id
+from .pagination import keyset_paginate
+from .search import search_threads
+from .services import (
+    count_unread_threads, mark_thread_read, message_event_payload, send_bulk_messages, send_message,
+    with_unread_flag,
+)
 
 User = get_user_model()
 
+DEFAULT_MESSAGE_STREAM_POLL_INTERVAL = 5
+DEFAULT_MESSAGE_STREAM_KEEPALIVE = 15
+DEFAULT_MESSAGE_STREAM_MAX_DURATION = 300
+
+INBOX_PAGE_SIZE = 20
+THREAD_PAGE_SIZE = 30
+
+def _older_url(request, cursor, **params):
+    """URL of the next keyset page, or None on the last page."""
+    if cursor is None:
+        return None
+    return f"{request.path}?{urlencode({**params, 'before': cursor})}"
+
+def _paged_response(request, page, template_name, context, **params):
+    """Render a "load older" fragment, pointing at the page after it in a header."""
+    response = render(request, template_name, context)
+    response['X-Next-Page'] = _older_url(request, page.next_cursor, **params) or ''
+    return response
+
 @login_required
 def inbox(request):
-    # Get all messages where the user is either sender or recipient
-    all_messages = Message.objects.filter(Q(recipient=request.user) | Q(sender=request.user)).order_by('-timestamp')
-
-    # Group messages by thread (root message)
-    threads = {}
-    for message in all_messages:
-        root_message = message.parent_message if message.parent_message else message
-        
-        if root_message.id not in threads:
-            threads[root_message.id] = {
-                'root_subject': root_message.subject,
-                'messages': [],
-                'sent_by_user': False,
-                'received_by_user': False
-            }
-        threads[root_message.id]['messages'].append(message)
-        if message.sender == request.user:
-            threads[root_message.id]['sent_by_user'] = True
-        if message.recipient == request.user:
-            threads[root_message.id]['received_by_user'] = True
-    
-    # For each thread, get the most recent message and categorize
-    sent_threads_data = []
-    received_threads_data = []
-
-    for thread_data in threads.values():
-        messages = thread_data['messages']
-        latest_message_in_thread = max(messages, key=lambda m: m.timestamp)
-        
-        thread_info = {
-            'latest_message': latest_message_in_thread,
-            'root_subject': thread_data['root_subject']
-        }
-
-        if thread_data['sent_by_user']:
-            sent_threads_data.append(thread_info)
-        if thread_data['received_by_user']:
-            received_threads_data.append(thread_info)
-    
-    # Sort latest messages by timestamp for both categories
-    sent_threads_data.sort(key=lambda x: x['latest_message'].timestamp, reverse=True)
-    received_threads_data.sort(key=lambda x: x['latest_message'].timestamp, reverse=True)
+    # One indexed query per tab over the user's thread summaries
+    threads = with_unread_flag(ThreadParticipant.objects.filter(user=request.user)).select_related(
+        'thread__last_message__sender', 'thread__last_message__recipient'
+    )
+    tabs = {'received': threads.filter(has_received=True), 'sent': threads.filter(has_sent=True)}
+    active_tab = 'sent' if request.GET.get('tab') == 'sent' else 'received'
+    before = request.GET.get('before')
 
+    if request.GET.get('format') == 'json' or request.GET.get('fragment'):
+        page = keyset_paginate(tabs[active_tab], 'last_message_at', before, INBOX_PAGE_SIZE)
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'tab': active_tab,
+                'next': _older_url(request, page.next_cursor, tab=active_tab, format='json'),
+                'threads': [
+                    {
+                        **message_event_payload(participant.thread.last_message),
+                        'subject': participant.thread.subject,
+                        'message_count': participant.thread.message_count,
+                        'unread': participant.is_unread,
+                    }
+                    for participant in page
+                ],
+            })
+        return _paged_response(request, page, 'messaging/inbox_threads.html', {
+            'threads': page,
+            'tab': active_tab,
+        }, tab=active_tab)
+
+    pages = {
+        tab: keyset_paginate(queryset, 'last_message_at', before if tab == active_tab else None, INBOX_PAGE_SIZE)
+        for tab, queryset in tabs.items()
+    }
     return render(request, 'messaging/inbox.html', {
-        'sent_threads_data': sent_threads_data,
-        'received_threads_data': received_threads_data,
+        'received_threads': pages['received'],
+        'sent_threads': pages['sent'],
+        'received_older_url': _older_url(request, pages['received'].next_cursor, tab='received'),
+        'sent_older_url': _older_url(request, pages['sent'].next_cursor, tab='sent'),
+        'active_tab': active_tab,
+        'is_older_page': bool(before),
     })
 
 @login_required
@@ -67,65 +98,228 @@ def compose_message(request, recipient_id=None):
     if request.method == 'POST':
         form = MessageForm(request.POST)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.sender = request.user
-            message.recipient = recipient if recipient else form.cleaned_data['recipient']
-            message.save()
+            send_message(
+                sender=request.user,
+                recipient=recipient if recipient else form.cleaned_data['recipient'],
+                subject=form.cleaned_data['subject'],
+                body=form.cleaned_data['body'],
+            )
             return redirect('messaging:inbox')
     else:
         form = MessageForm(initial={'recipient': recipient})
     return render(request, 'messaging/compose_message.html', {'form': form, 'recipient': recipient})
 
+def _count_selected_recipients(recruiter, form, data):
+    """How many candidates the submitted selection and saved search reach, whether or not the form is valid."""
+    saved_search_id = data.get('saved_search', '')
+    saved_search = form.fields['saved_search'].queryset.filter(
+        pk=saved_search_id if saved_search_id.isdigit() else None
+    ).first()
+    candidates = form.fields['candidates'].queryset.filter(pk__in=[
+        candidate for candidate in data.getlist('candidates') if candidate.isdigit()
+    ])
+    return get_bulk_recipients(recruiter, candidates, saved_search).count()
+
+@login_required
+def bulk_compose(request):
+    """Send one message to many candidates, picked from search results or a saved search."""
+    if not request.user.profile.is_recruiter:
+        messages.error(request, 'Access denied.')
+        return redirect('home.index')
+
+    if request.method == 'POST':
+        form = BulkMessageForm(request.POST, recruiter=request.user)
+        if form.is_valid():
+            sent = send_bulk_messages(
+                sender=request.user,
+                recipients=form.cleaned_data['recipients'],
+                subject=form.cleaned_data['subject'],
+                body=form.cleaned_data['body'],
+            )
+            messages.success(request, f'Message sent to {len(sent)} candidate(s).')
+            return redirect(f"{reverse('messaging:inbox')}?tab=sent")
+        selection = request.POST
+    else:
+        form = BulkMessageForm(initial={
+            'candidates': request.GET.getlist('candidates'),
+            'saved_search': request.GET.get('saved_search'),
+        }, recruiter=request.user)
+        selection = request.GET
+
+    return render(request, 'messaging/bulk_compose.html', {
+        'form': form,
+        'recipient_count': _count_selected_recipients(request.user, form, selection),
+        'max_recipients': get_bulk_message_max_recipients(),
+    })
+
 @login_required
 def view_message(request, message_id):
-    message = get_object_or_404(Message, (Q(recipient=request.user) | Q(sender=request.user)), id=message_id)
-    if message.recipient == request.user and not message.is_read:
-        message.is_read = True
-        message.save()
-    
-    # Find the root message of the thread
-    root_message = message.parent_message if message.parent_message else message
+    message = get_object_or_404(
+        Message.objects.select_related('thread', 'sender', 'recipient'),
+        (Q(recipient=request.user) | Q(sender=request.user)), id=message_id
+    )
+    thread = message.thread
+    before = request.GET.get('before')
 
-    # Get all messages in the thread, including the root and all its replies, ordered by newest first
-    thread_messages_set = set()
+    # The newest messages of the thread, older ones are fetched a page at a time
+    page = keyset_paginate(
+        thread.messages.select_related('sender', 'recipient'), 'timestamp', before, THREAD_PAGE_SIZE
+    )
+    thread_messages = page.items[::-1]
 
-    thread_messages_set.add(root_message)
-    for reply in root_message.replies.all():
-        thread_messages_set.add(reply)
-    
-    thread_messages = sorted(list(thread_messages_set), key=lambda m: m.timestamp)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'thread_id': thread.id,
+            'subject': thread.subject,
+            'next': _older_url(request, page.next_cursor, format='json'),
+            'messages': [message_event_payload(thread_message) for thread_message in thread_messages],
+        })
+    if request.GET.get('fragment'):
+        return _paged_response(request, page, 'messaging/thread_messages.html', {
+            'thread_messages': thread_messages,
+        })
+
+    if before is None:
+        mark_thread_read(thread, request.user)
 
     initial_recipient = message.recipient if message.sender == request.user else message.sender
     
     # Handle reply functionality
     if request.method == 'POST':
-        reply_form = MessageForm(request.POST, parent_message=message)
+        reply_form = MessageForm(request.POST, initial={'recipient': initial_recipient}, parent_message=message)
         if reply_form.is_valid():
-            reply_message_instance = reply_form.save(commit=False)
-            reply_message_instance.sender = request.user
-            reply_message_instance.recipient = initial_recipient
-            reply_message_instance.subject = root_message.subject
-            reply_message_instance.parent_message = root_message
-            reply_message_instance.save()
+            reply = send_message(
+                sender=request.user,
+                recipient=initial_recipient,
+                subject=thread.subject,
+                body=reply_form.cleaned_data['body'],
+                parent_message=message,
+            )
             
-            return redirect('messaging:view_message', message_id=root_message.id)
+            return redirect('messaging:view_message', message_id=reply.parent_message_id)
     else:
         reply_form = MessageForm(initial={'recipient': initial_recipient}, parent_message=message)
 
     return render(request, 'messaging/view_message.html', {
         'message': message,
         'thread_messages': thread_messages,
-        'root_subject': root_message.subject,
+        'root_subject': thread.subject,
         'reply_form': reply_form,
         'initial_recipient': initial_recipient,
+        'older_messages_url': _older_url(request, page.next_cursor),
+    })
+
+@login_required
+def search_messages(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(search_threads(request.user, query), 20).get_page(request.GET.get('page'))
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'count': page_obj.paginator.count,
+            'page': page_obj.number,
+            'has_next': page_obj.has_next(),
+            'results': [
+                {
+                    'thread_id': hit['thread_id'],
+                    'message_id': hit['message_id'],
+                    'subject': hit['subject'],
+                    'snippet': str(hit['snippet']),
+                    'url': reverse('messaging:view_message', args=[hit['message_id']]),
+                }
+                for hit in page_obj
+            ],
+        })
+
+    return render(request, 'messaging/search.html', {
+        'query': query,
+        'page_obj': page_obj,
     })
 
 @login_required
 def search_users(request):
-    query = request.GET.get('term', '')
+    return JsonResponse(directory.search_users(request.user, request.GET.get('term', '')), safe=False)
 
-    users_filter = Q(username__icontains=query) | Q(first_name__icontains=query) | Q(last_name__icontains=query)
-    users = User.objects.filter(users_filter).exclude(id=request.user.id).values('id', 'username', 'first_name', 'last_name')
-    
-    results = [{'id': user['id'], 'label': f"{user['first_name']} {user['last_name']} ({user['username']})", 'value': user['username']} for user in users]
-    return JsonResponse(results, safe=False)
+@login_required
+def poll_messages(request):
+    """
+    Short-poll fallback for the message stream, used when it isn't enabled:
+    the user's events after ``after`` as JSON. Without ``after`` it only
+    returns where the user's events currently end.
+    """
+    try:
+        after = int(request.GET['after'])
+    except (KeyError, ValueError):
+        return JsonResponse({'events': [], 'last_event_id': get_latest_event_id(request.user.pk)})
+    events = get_events_after(request.user.pk, after)
+    return JsonResponse({'events': events, 'last_event_id': events[-1]['id'] if events else after})
+
+@login_required
+async def message_stream(request):
+    """
+    Server-sent events stream of the user's new messages and unread count.
+
+    Held open only when MESSAGE_STREAM_ENABLED says an ASGI server is in
+    front; otherwise each connection gets one round of events and closes.
+    """
+    user = await request.auser()
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    live = getattr(settings, 'MESSAGE_STREAM_ENABLED', False)
+    response = StreamingHttpResponse(_event_stream(user, last_event_id, live), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _event_stream(user, last_event_id, live=True):
+    poll_interval = getattr(settings, 'MESSAGE_STREAM_POLL_INTERVAL', DEFAULT_MESSAGE_STREAM_POLL_INTERVAL)
+    keepalive = getattr(settings, 'MESSAGE_STREAM_KEEPALIVE', DEFAULT_MESSAGE_STREAM_KEEPALIVE)
+    max_duration = getattr(settings, 'MESSAGE_STREAM_MAX_DURATION', DEFAULT_MESSAGE_STREAM_MAX_DURATION)
+    if not live:
+        # Under WSGI a held stream ties up a worker; answer once and have the browser come back later
+        max_duration = 0
+        retry = int(getattr(settings, 'MESSAGE_POLL_INTERVAL', DEFAULT_MESSAGE_POLL_INTERVAL) * 1000)
+    else:
+        retry = 3000
+
+    listener = broker.subscribe(user.pk)
+    _, waiter = listener
+    try:
+        started = last_sent = time.monotonic()
+        yield f'retry: {retry}\n\n'
+        unread_threads = await sync_to_async(count_unread_threads)(user)
+        yield format_sse('unread', {'unread_threads': unread_threads})
+        if last_event_id is None:
+            last_event_id = await sync_to_async(get_latest_event_id)(user.pk)
+
+        # Close after max_duration; the browser reconnects with Last-Event-ID
+        while True:
+            # Clear before reading so a publish during the query still wakes the next wait
+            waiter.clear()
+            events = await sync_to_async(get_events_after)(user.pk, last_event_id)
+            for event in events:
+                last_event_id = event['id']
+                yield format_sse(event['kind'], event['payload'], event['id'])
+            remaining = max_duration - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            if events:
+                last_sent = time.monotonic()
+                continue
+            if time.monotonic() - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+
+            # Woken at once for events published in this process; the poll
+            # interval covers events published by other workers
+            try:
+                await asyncio.wait_for(waiter.wait(), timeout=min(poll_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        broker.unsubscribe(user.pk, listener)